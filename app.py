@@ -1,17 +1,21 @@
 import json
+import asyncio
 import chainlit as cl
+from chainlit.types import ThreadDict
 from typing import Dict, Any, List, Optional
 import traceback
 import re
+import time
 
 # Backend Imports
-from backend.core.model_client import ModelClient
+from backend.core.model_client import ModelClient, describe_call
 from backend.core.rag import RAGManager
-from backend.ingestion.ingestor import UniversalIngestor
 from backend.database.db import Database
+from backend.core import resources
+from backend.core.json_stream import StreamingDecisionParser, is_decision
+from backend.core.context import ContextBuilder, summarize_history
 
 # Tools Imports
-from backend.tools.web_search import WebSearchTool
 from backend.tools.data_analyst import DataAnalystTool
 from backend.tools.file_writer import FileWriterTool
 from backend.tools.image_analysis import ImageAnalysisTool
@@ -20,6 +24,11 @@ from backend.tools.image_analysis import ImageAnalysisTool
 MODEL_NAME = "glm4.7-flash:latest"  
 VISION_MODEL = "qwen3-vl:2b" 
 RETRY_COUNT = 3
+INGEST_WAIT_SECONDS = 15       # Cevaplamadan önce eklerin bitmesi için beklenecek en uzun süre
+INGEST_PROGRESS_INTERVAL = 1.0 # İşleme mesajının güncellenme aralığı
+RAG_RESULTS = 5                # Aday RAG parçası; bütçeye sığmayanlar ContextBuilder'da düşer
+MAX_PARALLEL_TOOLS = 4         # Tek adımda eşzamanlı çalıştırılacak en fazla tool çağrısı
+RESUME_HISTORY_MESSAGES = 50   # Resume edilen sohbette DB'den geri yüklenen son mesaj sayısı
 
 # --- System Prompt (GÜÇLENDİRİLMİŞ) ---
 SYSTEM_PROMPT = """You are a capable AI assistant with access to tools.
@@ -34,7 +43,9 @@ TOOL DEFINITIONS & ARGUMENTS:
 2. 'file_writer': Use to save reports, code, or texts to a permanent file.
    Args: {"filename": "example.txt", "content": "text_content_here"}
 3. 'web_search': Search the internet for real-time information.
-   Args: {"query": "search_term_here"}
+   Args: {"query": "search_term_here", "fetch_pages": true}
+   "fetch_pages" (optional): also download the top result pages into your memory (RAG).
+   Use it when you need page details beyond the snippets; later questions about these pages are answered from the context.
 4. 'image_analysis': Use to analyze uploaded images (photos, charts, screenshots).
    Args: {"image_path": "path_to_image", "prompt": "question_about_image"}
 
@@ -45,17 +56,34 @@ OUTPUT FORMAT (Strict JSON):
     "tool_args": { ... },
     "final_answer": "Answer to user (MUST BE NULL IF TOOL_NAME IS USED)"
 }
+
+PARALLEL TOOLS:
+If you need several INDEPENDENT tools (e.g. a web search AND a data analysis), request them
+all in one step instead of "tool_name"/"tool_args". They run at the same time:
+{
+    "thought": "...",
+    "tool_calls": [
+        {"tool_name": "web_search", "tool_args": {"query": "..."}},
+        {"tool_name": "data_analyst", "tool_args": {"code": "..."}}
+    ],
+    "final_answer": null
+}
+Do NOT put a call in "tool_calls" if it needs the output of another call in the same list.
 """
 
 # --- Tools Helper ---
-def run_tool(name: str, args: Dict, session_tools: Dict) -> str:
+async def run_tool(name: str, args: Dict, session_tools: Dict) -> str:
+    # Tool'lar event loop dışında (thread/process havuzu) timeout ve eşzamanlılık limitiyle çalışır
+    executor = resources.get_tool_executor()
+
     if name == "web_search":
-        tool = WebSearchTool()
-        return str(tool.run(query=args.get("query", "")))
+        tool = resources.get_web_search()
+        # fetch modunda sonuç sayfaları oturumun RAG koleksiyonuna eklenir
+        return str(await executor.run(tool, query=args.get("query", ""), fetch_pages=args.get("fetch_pages"), rag=cl.user_session.get("rag")))
     
     elif name == "file_writer":
         tool = FileWriterTool()
-        return tool.run(filename=args.get("filename"), content=args.get("content"))
+        return str(await executor.run(tool, filename=args.get("filename"), content=args.get("content")))
     
     elif name == "image_analysis":
         tool = ImageAnalysisTool(model_name=VISION_MODEL)
@@ -68,17 +96,51 @@ def run_tool(name: str, args: Dict, session_tools: Dict) -> str:
         if (not img_path or not os.path.exists(img_path)) and cl.user_session.get("last_image_path"):
             img_path = cl.user_session.get("last_image_path")
             
-        return tool.run(image_path=img_path, prompt=args.get("prompt", "Describe this image."))
+        return str(await executor.run(tool, image_path=img_path, prompt=args.get("prompt", "Describe this image."), session_id=cl.user_session.get("id")))
     
     elif name == "data_analyst":
         tool = session_tools.get("data_analyst")
         if tool:
-            return tool.run(code=args.get("code", ""))
+            return str(await executor.run(tool, code=args.get("code", "")))
         else:
             return "Error: Data Analyst tool not initialized."
             
     return "Tool not found."
 
+def get_tool_calls(decision: Dict) -> List[Dict]:
+    """Karardaki tool çağrılarını listeye çevirir (tek 'tool_name' veya 'tool_calls' listesi)."""
+    calls = []
+    raw_calls = decision.get("tool_calls")
+    if isinstance(raw_calls, list):
+        for call in raw_calls[:MAX_PARALLEL_TOOLS]:
+            if isinstance(call, dict) and call.get("tool_name"):
+                args = call.get("tool_args")
+                calls.append({"tool_name": call["tool_name"], "tool_args": args if isinstance(args, dict) else {}})
+    if not calls and decision.get("tool_name"):
+        args = decision.get("tool_args")
+        calls.append({"tool_name": decision["tool_name"], "tool_args": args if isinstance(args, dict) else {}})
+    return calls
+
+async def run_tool_step(call: Dict, session_tools: Dict) -> str:
+    """Tek bir tool çağrısını kendi Step'i içinde çalıştırır; grafik çıktısını kullanıcıya gösterir."""
+    tool_name, tool_args = call["tool_name"], call["tool_args"]
+    async with cl.Step(name=f"Tool: {tool_name}", type="tool") as tool_step:
+        tool_step.input = str(tool_args)
+        try:
+            result = await run_tool(tool_name, tool_args, session_tools)
+        except Exception as e:
+            result = f"Error: {tool_name} failed: {e}"
+
+        if "[IMAGE_GENERATED]:" in result:
+            text_part, img_path = result.split("[IMAGE_GENERATED]:")
+            img_path = img_path.strip()
+            image = cl.Image(path=img_path, name="analysis_plot", display="inline")
+            await cl.Message(content="📊 Grafik oluşturuldu:", elements=[image]).send()
+            tool_step.output = text_part
+        else:
+            tool_step.output = result
+    return result
+
 def extract_json(text: str) -> Optional[Dict]:
     """JSON veya Python Code Block yakalar."""
     text = text.strip()
@@ -115,75 +177,157 @@ def extract_json(text: str) -> Optional[Dict]:
         
     return None
 
+async def update_summary(model: ModelClient, upto: int):
+    """history[summary_upto:upto] aralığını rolling özete katlar (arka planda çalışır)."""
+    history = cl.user_session.get("history")
+    offset = cl.user_session.get("summary_upto") or 0
+    if upto <= offset:
+        return
+    summary = await summarize_history(model, cl.user_session.get("summary") or "", history[offset:upto])
+    if summary is None:
+        print("⚠️ Geçmiş özetlenemedi, sonraki turda tekrar denenecek.")
+        return
+    cl.user_session.set("summary", summary)
+    cl.user_session.set("summary_upto", upto)
+    print(f"📝 Geçmiş özeti güncellendi: {upto - offset} mesaj katlandı ({upto} mesaja kadar)")
+
+async def report_ingestion(processing_msg: cl.Message, jobs: List, analysis_path: str):
+    """İşler bitene kadar ilerlemeyi 'Dosyalar işleniyor' mesajına yansıtır."""
+    while True:
+        done = all(job.finished for job in jobs)
+        if done:
+            header = f"✅ {len(jobs)} dosya okundu. (Analiz için: `{analysis_path}`)"
+        else:
+            header = "📂 Dosyalar işleniyor..."
+        processing_msg.content = "\n".join([header] + [job.describe() for job in jobs])
+        try: await processing_msg.update()
+        except Exception as e: print(f"⚠️ İlerleme mesajı güncellenemedi: {e}")
+        if done:
+            break
+        await asyncio.sleep(INGEST_PROGRESS_INTERVAL)
+
 # --- App Lifecycle ---
 
-@cl.on_chat_start
-async def start():
-    model = ModelClient(model_name=MODEL_NAME)
-    rag = RAGManager()
-    ingestor = UniversalIngestor()
-    db = Database()
-    data_analyst = DataAnalystTool() 
+async def _open_session(conv_id: Optional[int] = None) -> None:
+    """
+    Oturum kaynaklarını hazırlar. conv_id verilirse (resume) aynı sohbet kaydı,
+    RAG koleksiyonu ve geçmiş yeniden açılır; yoksa yeni sohbet oluşturulur.
+    """
+    # Ağır kaynaklar (embedding modeli, parser motorları, ollama client, DB)
+    # süreç genelinde paylaşılır; ilk oturum 'cold', sonrakiler 'warm' başlar.
+    with resources.POOL.track_session_start():
+        # session_id: LLM zamanlayıcısı oturumlar arasında sırayla (round-robin) hak verir
+        # pinned: RAM bütçesinde ana sohbet modeli vision modelinden önce yerleşir
+        model = ModelClient(model_name=MODEL_NAME, session_id=cl.user_session.get("id"), pinned=True)
+        residency = resources.get_residency_manager()
+        residency.register(VISION_MODEL)
+        await residency.refresh_sizes()
+        ingestor = await cl.make_async(resources.get_ingestor)()
+        db = resources.get_database()
+        # Yedek kernel'ler ilk oturumda başlatılır (spawn + pandas/matplotlib import'u arka planda)
+        await cl.make_async(resources.get_kernel_manager)()
+        # Her oturumun kendi kalıcı Python kernel'i var (değişkenler turlar arasında korunur)
+        data_analyst = DataAnalystTool(session_id=cl.user_session.get("id"))
+
+        history: List[Dict] = []
+        try:
+            if conv_id and db.get_conversation(conv_id):
+                history = [
+                    {"role": row["role"], "content": row["content"]}
+                    for row in db.get_messages(conv_id, limit=RESUME_HISTORY_MESSAGES)
+                ]
+            else:
+                conv_id = db.create_conversation(title="New Chat")
+        except Exception as e:
+            print(f"DB Init Error: {e}")
+            conv_id = conv_id or 0
+
+        # RAG hafızası sohbete özel namespace'te tutulur; global koleksiyon
+        # artık silinmez, diğer oturumların indeksi korunur.
+        rag = await cl.make_async(RAGManager)(conversation_id=conv_id)
 
     cl.user_session.set("model", model)
     cl.user_session.set("rag", rag)
     cl.user_session.set("ingestor", ingestor)
     cl.user_session.set("db", db)
     cl.user_session.set("tools", {"data_analyst": data_analyst})
-    
-    try:
-        conv_id = db.create_conversation(title="New Chat")
-        cl.user_session.set("conversation_id", conv_id)
-    except Exception as e:
-        print(f"DB Init Error: {e}")
-        cl.user_session.set("conversation_id", 0)
-    
-    cl.user_session.set("history", [])
-    rag.clear_memory()
+    cl.user_session.set("conversation_id", conv_id)
+    cl.user_session.set("history", history)
+    # Pencereye sığmayan eski turların özeti ve özete katlanan mesaj sayısı
+    cl.user_session.set("summary", "")
+    cl.user_session.set("summary_upto", 0)
+    # Önceki turda geçmişin başladığı indeks (prompt önekini sabit tutmak için)
+    cl.user_session.set("history_start", None)
 
+@cl.on_chat_start
+async def start():
+    await _open_session()
     await cl.Message(content=f"👋 **Lokal Agent Hazır!**\nModel: `{MODEL_NAME}`\nToollar: `Data Analyst`, `File Writer`, `Web Search`").send()
 
+@cl.on_chat_resume
+async def resume(thread: ThreadDict):
+    # Chainlit user_session'ı thread metadata'sında saklar; conversation_id oradan okunur
+    metadata = thread.get("metadata") or {}
+    if isinstance(metadata, str):
+        try: metadata = json.loads(metadata)
+        except ValueError: metadata = {}
+    await _open_session(metadata.get("conversation_id"))
+
+@cl.on_stop
+async def stop():
+    # Kullanıcı durdurdu: oturumun kernel'inde çalışan kod kesilir (değişkenler korunur)
+    resources.get_kernel_manager().interrupt(cl.user_session.get("id"))
+
+@cl.on_chat_end
+async def end():
+    # Oturum kapandı: kernel süreci ve sohbetin bellekteki BM25 indeksi serbest bırakılır,
+    # boş kalan RAG koleksiyonu silinir
+    await cl.make_async(resources.get_kernel_manager().release)(cl.user_session.get("id"))
+    rag: RAGManager = cl.user_session.get("rag")
+    if rag is not None:
+        await cl.make_async(rag.release)()
+
 @cl.on_message
 async def main(message: cl.Message):
     model: ModelClient = cl.user_session.get("model")
     rag: RAGManager = cl.user_session.get("rag")
-    ingestor: UniversalIngestor = cl.user_session.get("ingestor")
     db: Database = cl.user_session.get("db")
     tools_map = cl.user_session.get("tools")
     conv_id = cl.user_session.get("conversation_id")
     history: List[Dict] = cl.user_session.get("history")
+    turn_started = time.perf_counter()
 
     try: db.add_message(conv_id, "user", message.content)
     except: pass
 
-    # Ingestion
+    # Ingestion (process havuzunda, event loop'u bloklamadan)
+    pending_jobs = []
     if message.elements:
-        processing_msg = cl.Message(content="📂 Dosyalar işleniyor...", author="System")
-        await processing_msg.send()
-        count = 0
-        for element in message.elements:
-            path = element.path
-            if path:
-                # Resim dosyalarını RAG'e (ingestor) sokma
-                ext = path.lower().split('.')[-1]
-                if ext in ['png', 'jpg', 'jpeg', 'webp']:
-                    continue
+        doc_elements = [
+            element for element in message.elements
+            # Resim dosyalarını RAG'e (ingestor) sokma
+            if element.path and element.path.lower().split('.')[-1] not in ['png', 'jpg', 'jpeg', 'webp']
+        ]
+        if doc_elements:
+            processing_msg = cl.Message(content="📂 Dosyalar işleniyor...", author="System")
+            await processing_msg.send()
 
-                markdown_text = ingestor.ingest_file(path)
-                if markdown_text:
-                    chunks = await cl.make_async(rag.add_document)(markdown_text, source=element.name)
-                    count += chunks
-                    try: db.add_file(conv_id, path, ftype="file", summary=f"Imported {element.name}")
+            async def on_ingested(job):
+                if job.status == "done":
+                    try: db.add_file(conv_id, job.path, ftype="file", summary=f"Imported {job.name}")
                     except: pass
-        processing_msg.content = f"✅ {len(message.elements)} dosya okundu. (Analiz için: `{message.elements[0].path}`)"
-        await processing_msg.update()
+
+            job_manager = resources.get_ingestion_jobs()
+            jobs = [job_manager.submit(element.path, element.name, rag, on_done=on_ingested) for element in doc_elements]
+            asyncio.create_task(report_ingestion(processing_msg, jobs, message.elements[0].path))
+
+            # Kısa süre bekle; bitmeyen dosyalar arka planda işlenmeye devam eder,
+            # sohbet o ana kadar bitenlerden cevap verir.
+            await job_manager.wait(jobs, timeout=INGEST_WAIT_SECONDS)
+            pending_jobs = [job for job in jobs if not job.finished]
 
     # RAG Context
-    context_chunks = await cl.make_async(rag.search)(message.content, n_results=3)
-    context_str = "\n---\n".join(context_chunks)
-    
-    current_messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    current_messages.extend(history[-5:])
+    context_chunks = await cl.make_async(rag.search)(message.content, n_results=RAG_RESULTS)
     
     file_hint = ""
     if message.elements:
@@ -192,12 +336,32 @@ async def main(message: cl.Message):
         if ext in ['png', 'jpg', 'jpeg', 'webp']:
              # UUID hatasını (hallucination) önlemek için session'a kaydet
              cl.user_session.set("last_image_path", element.path)
+             # Model cevabı düşünürken vision modeli belleğe alınsın (tool çağrısı soğuk yüklemeyle beklemesin)
+             resources.get_residency_manager().preload(VISION_MODEL, session_id=cl.user_session.get("id"))
              file_hint = f"\n[SYSTEM HINT]: An image was uploaded at '{element.path}'. Use 'image_analysis' tool to understand it."
         else:
              file_hint = f"\n[SYSTEM HINT]: Last uploaded file path is: '{element.path}'. Use this path for tools if needed."
+        if pending_jobs:
+             pending_names = ", ".join(job.name for job in pending_jobs)
+             file_hint += f"\n[SYSTEM HINT]: Still processing (not yet in context): {pending_names}."
 
-    user_content = f"User Query: {message.content}{file_hint}\n\nContext from Files (RAG):\n{context_str}"
-    current_messages.append({"role": "user", "content": user_content})
+    # Prompt token bütçesine göre kurulur: geçmiş en yeniden eskiye, RAG kırpılarak
+    builder = ContextBuilder()
+    current_messages, allocation = builder.build(
+        SYSTEM_PROMPT,
+        history,
+        query=f"User Query: {message.content}{file_hint}",
+        rag_chunks=context_chunks,
+        summary=cl.user_session.get("summary") or "",
+        history_offset=cl.user_session.get("summary_upto") or 0,
+        previous_start=cl.user_session.get("history_start"),
+    )
+    cl.user_session.set("history_start", allocation["history_start"])
+    # Turun sorgu (+ RAG) mesajı; tool adımları bunun arkasına eklenir
+    query_index = len(current_messages) - 1
+    # Bu turdaki tüm LLM çağrılarının telemetrisi (messages.meta -> llm_calls)
+    llm_calls: List[Dict] = []
+    print(f"📐 Context: {builder.describe(allocation)}")
 
     MAX_STEPS = 5
     cur_step = 0
@@ -210,6 +374,17 @@ async def main(message: cl.Message):
             
             decision = None
             response_str = ""
+            # Stream sırasında erken başlatılan tool çağrıları ve görevleri
+            started_calls: List[Dict] = []
+            tool_tasks: List[asyncio.Task] = []
+            # final_answer üretilirken doğrudan kullanıcıya akan mesaj
+            answer_msg: Optional[cl.Message] = None
+            first_token_at = None
+            step_calls: List[Dict] = []
+
+            def dispatch(call: Dict):
+                started_calls.append(call)
+                tool_tasks.append(asyncio.create_task(run_tool_step(call, tools_map)))
             
             for attempt in range(RETRY_COUNT):
                 use_json_mode = (attempt == 0)
@@ -217,69 +392,146 @@ async def main(message: cl.Message):
                 print(f"🔄 Attempt {attempt+1} ({mode_str})...")
 
                 response_str = ""
+                if answer_msg is not None:
+                    # Önceki deneme yarım kaldı; kısmi cevabı kaldır
+                    await answer_msg.remove()
+                    answer_msg, first_token_at = None, None
                 generator = await model.generate(
                     current_messages, 
                     stream=True, 
                     json_mode=use_json_mode
                 )
+                # Kayıt stream bitince/iptal edilince yerinde doldurulur
+                llm_call = model.last_call
+                llm_call.update(step=cur_step, attempt=attempt)
+                step_calls.append(llm_call)
                 
                 if isinstance(generator, str):
                     response_str = generator
                     await step.stream_token(response_str)
                 else:
+                    parser = StreamingDecisionParser()
                     async for chunk in generator:
                         response_str += chunk
-                        await step.stream_token(chunk)
+                        parser.feed(chunk)
+
+                        # Cevap kısmı Thinking'e değil, kullanıcı mesajına akar
+                        answer_delta = parser.take_answer()
+                        if answer_delta:
+                            if answer_msg is None:
+                                answer_msg = cl.Message(content="")
+                                first_token_at = time.perf_counter()
+                            await answer_msg.stream_token(answer_delta)
+                        elif not parser.stream_started:
+                            await step.stream_token(chunk)
+
+                        # tool_calls listesinin her elemanı kapandığı anda çalışmaya başlar
+                        for tool_call in parser.calls[len(started_calls):MAX_PARALLEL_TOOLS]:
+                            dispatch(tool_call)
+
+                        if parser.tool_calls_ready():
+                            if not started_calls:
+                                dispatch(get_tool_calls(parser.fields)[0])
+                            # Karar belli: kalan token'lar için ödeme yapma.
+                            # Bu önek kararın tamamını içerdiği için yanıt önbelleğine yazılabilir.
+                            llm_call["partial_ok"] = True
+                            await generator.aclose()
+                            print(f"⚡ Tool çağrısı stream içinde yakalandı, üretim iptal edildi ({len(response_str)} karakter)")
+                            break
+
+                    decision = parser.decision()
+                    if not is_decision(decision):
+                        # Kod bloğundaki sıradan bir sözlük karar değildir; extract_json'a bırak
+                        decision = None
+                    if started_calls:
+                        decision = decision or dict(parser.fields)
+                        decision.pop("tool_name", None)
+                        decision.pop("tool_args", None)
+                        decision["tool_calls"] = list(started_calls)
+                        break
                 
                 print(f"DEBUG Output: {response_str[:100]}...")
                 
                 if not response_str:
                     continue
                 
-                decision = extract_json(response_str)
+                decision = decision or extract_json(response_str)
                 if decision:
                     break
+
+            generation_done = time.perf_counter()
+            llm_calls.extend(step_calls)
+            step.metadata = {"llm_calls": step_calls}
+            if step_calls and "prompt_eval_count" in step_calls[-1]:
+                # Tahmini prompt'a karşı gerçekte yeniden değerlendirilen (KV cache dışı) token'lar
+                prompt_estimate = builder.prompt_budget - builder.remaining(current_messages)
+                print(f"♻️ Prompt ~{prompt_estimate} token, yeniden değerlendirilen: {step_calls[-1]['prompt_eval_count']}")
             
             if not decision:
+                if answer_msg is not None:
+                    await answer_msg.remove()
                 step.output = "Failed to parse model decision."
                 await cl.Message(content=f"❌ Model karar veremedi (JSON parse hatası).").send()
                 break
 
             thought = decision.get("thought", "")
-            tool_name = decision.get("tool_name")
-            tool_args = decision.get("tool_args", {})
+            tool_calls = get_tool_calls(decision)
             final_answer = decision.get("final_answer")
 
             # Step çıktısını sadece thought ile güncelle (temizlik için)
             step.output = thought or "Decision made."
+            if step_calls:
+                step.output += "\n\n" + " | ".join(f"`{describe_call(call)}`" for call in step_calls)
 
         # Action Handling
-        if tool_name:
-            async with cl.Step(name=f"Tool: {tool_name}", type="tool") as tool_step:
-                tool_step.input = str(tool_args)
-                result = run_tool(tool_name, tool_args, tools_map)
-                
-                if "[IMAGE_GENERATED]:" in result:
-                    text_part, img_path = result.split("[IMAGE_GENERATED]:")
-                    img_path = img_path.strip()
-                    image = cl.Image(path=img_path, name="analysis_plot", display="inline")
-                    await cl.Message(content="📊 Grafik oluşturuldu:", elements=[image]).send()
-                    tool_step.output = text_part
-                else:
-                    tool_step.output = result
-            
+        if tool_calls:
+            if answer_msg is not None:
+                await answer_msg.remove()
+            # Bağımsız çağrılar aynı anda çalışır; toplam süre en yavaş tool kadardır.
+            # Stream sırasında başlatılanlar zaten çalışıyor, sadece beklenir.
+            if tool_tasks:
+                tool_calls = started_calls
+            else:
+                tool_tasks = [asyncio.create_task(run_tool_step(call, tools_map)) for call in tool_calls]
+            results = await asyncio.gather(*tool_tasks)
+
+            if len(tool_calls) == 1:
+                tool_output = f"Tool Output: {results[0]}"
+            else:
+                tool_output = "\n\n".join(
+                    f"Tool Output [{i}] ({call['tool_name']}): {result}"
+                    for i, (call, result) in enumerate(zip(tool_calls, results), start=1)
+                )
+
             current_messages.append({"role": "assistant", "content": json.dumps(decision)})
-            current_messages.append({"role": "user", "content": f"Tool Output: {result}"})
+            # Tool çıktısı pencereye sığdırılır; yer yoksa önceki adım çıktıları ve RAG bağlamı kırpılır
+            tool_output = builder.fit_step_output(current_messages, tool_output, query_index)
+            current_messages.append({"role": "user", "content": tool_output})
         
         elif final_answer:
-            await cl.Message(content=final_answer).send()
+            if answer_msg is not None:
+                # Stream edilen metni çözülmüş tam cevapla eşitle ve mesajı tamamla
+                answer_msg.content = final_answer
+                await answer_msg.send()
+            else:
+                await cl.Message(content=final_answer).send()
+                first_token_at = generation_done
+            print(
+                f"⏱️ İlk görünen token: {first_token_at - turn_started:.2f}s "
+                f"(tam üretim sonu: {generation_done - turn_started:.2f}s)"
+            )
             
             history.append({"role": "user", "content": message.content})
             history.append({"role": "assistant", "content": final_answer})
             cl.user_session.set("history", history)
             
-            try: db.add_message(conv_id, "assistant", final_answer, meta={"thought": thought})
+            try: db.add_message(conv_id, "assistant", final_answer, meta={"thought": thought, "context": allocation, "llm_calls": llm_calls})
             except: pass
+
+            # Bu turda pencereye sığmayan eski mesajlar arka planda özete katlanır
+            summary_task = cl.user_session.get("summary_task")
+            if allocation["history_start"] > (cl.user_session.get("summary_upto") or 0) and not (summary_task and not summary_task.done()):
+                cl.user_session.set("summary_task", asyncio.create_task(update_summary(model, allocation["history_start"])))
             break
         
         else:
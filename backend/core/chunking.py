@@ -0,0 +1,277 @@
+"""
+Markdown yapısını ve embedding token limitini gözeten parçalayıcı (chunker).
+
+Docling/Excel çıktısı önce bloklara ayrılır (başlık, tablo, liste, kod,
+paragraf); bloklar embedding tokenizer'ına göre sayılıp token bütçesine
+kadar birleştirilir. Bütçeyi aşan tablolar başlık satırı tekrarlanarak,
+listeler madde madde, paragraflar cümle cümle bölünür. Her blok bir kez
+sayıldığı için toplam maliyet metin uzunluğunda doğrusaldır.
+
+Parser'lar kendi anlamlı parçalarını (ör. Excel satır grupları) zaten
+üretebiliyorsa aralarına CHUNK_BOUNDARY koyar; parçalayıcı bu işaretlerin
+üzerinden asla birleştirme yapmaz.
+"""
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+CHUNK_BOUNDARY = "\n\n<!-- chunk -->\n\n"
+
+# all-MiniLM-L6-v2 en fazla 256 word-piece görür ([CLS]/[SEP] dahil); fazlası sessizce kesilir
+DEFAULT_MAX_TOKENS = 240
+# Başlık değişiminde bundan küçük parçalar bir sonraki bölümle birleştirilir
+DEFAULT_MIN_TOKENS = 48
+# Bir önceki parçanın son paragrafı bu kadar kısaysa bir sonraki parçanın başına tekrar eklenir
+DEFAULT_OVERLAP_TOKENS = 40
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+\S")
+_LIST_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}")
+_SENTENCE_RE = re.compile(r"(?<=[.!?:;])\s+")
+
+
+def split_on_boundaries(text: str) -> List[str]:
+    """Metni parser'ın koyduğu sert sınırlardan böler (boş parçalar atılır)."""
+    return [part.strip() for part in text.split(CHUNK_BOUNDARY.strip()) if part.strip()]
+
+
+def approximate_token_counter(texts: List[str]) -> List[int]:
+    """
+    Tokenizer yüklenemezse kaba tahmin: uzun kelimeler birden çok word-piece'e bölünür.
+    Kelime başına hesaplandığı için toplanabilirdir (boşlukla birleştirilen blokların
+    sayısı toplamlarına eşit); parça bütçesi birleştirmeden sonra da aşılmaz.
+    """
+    return [sum(1 + len(word) // 5 for word in text.split()) for text in texts]
+
+
+def make_token_counter(tokenizer) -> TokenCounter:
+    """HuggingFace tokenizer'ını toplu (batch) çalışan bir sayaca çevirir."""
+    def count(texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = tokenizer(texts, add_special_tokens=False, truncation=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+    return count
+
+
+class Block:
+    __slots__ = ("kind", "text", "tokens", "level")
+
+    def __init__(self, kind: str, text: str, level: int = 0):
+        self.kind = kind      # heading | table | list | code | paragraph
+        self.text = text
+        self.tokens = 0
+        self.level = level    # sadece başlıklar için (# sayısı)
+
+
+class MarkdownChunker:
+    def __init__(
+        self,
+        token_counter: Optional[TokenCounter] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        min_tokens: int = DEFAULT_MIN_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+        counter_name: str = "approx",
+    ):
+        self.count = token_counter or approximate_token_counter
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.overlap_tokens = overlap_tokens
+        # Önbellek anahtarının parçası: ayarlar veya algoritma değişirse güncellenmeli
+        self.config_key = f"md:{counter_name}:{max_tokens}:{min_tokens}:{overlap_tokens}:v4"
+
+    def split(self, text: str) -> List[str]:
+        if not text or not text.strip():
+            return []
+        chunks: List[str] = []
+        for part in split_on_boundaries(text):
+            chunks.extend(self._split_part(part))
+        return chunks
+
+    # --- 1. Bloklara ayırma ---
+
+    def _parse_blocks(self, text: str) -> List[Block]:
+        blocks: List[Block] = []
+        lines = text.split("\n")
+        i, n = 0, len(lines)
+
+        while i < n:
+            line = lines[i]
+            stripped = line.strip()
+
+            if not stripped:
+                i += 1
+                continue
+
+            heading = _HEADING_RE.match(stripped)
+            if heading:
+                blocks.append(Block("heading", stripped, level=len(heading.group(1))))
+                i += 1
+                continue
+
+            if stripped.startswith("```"):
+                start = i
+                i += 1
+                while i < n and not lines[i].strip().startswith("```"):
+                    i += 1
+                i = min(i + 1, n)
+                blocks.append(Block("code", "\n".join(lines[start:i])))
+                continue
+
+            if stripped.startswith("|"):
+                start = i
+                while i < n and lines[i].strip().startswith("|"):
+                    i += 1
+                blocks.append(Block("table", "\n".join(l.strip() for l in lines[start:i])))
+                continue
+
+            if _LIST_RE.match(line):
+                start = i
+                i += 1
+                # Girintili devam satırları aynı listeye aittir
+                while i < n and lines[i].strip() and (_LIST_RE.match(lines[i]) or lines[i][:1] in (" ", "\t")):
+                    i += 1
+                blocks.append(Block("list", "\n".join(lines[start:i])))
+                continue
+
+            start = i
+            i += 1
+            while i < n:
+                nxt = lines[i].strip()
+                if not nxt or _HEADING_RE.match(nxt) or nxt.startswith(("|", "```")) or _LIST_RE.match(lines[i]):
+                    break
+                i += 1
+            blocks.append(Block("paragraph", "\n".join(lines[start:i])))
+
+        for block, tokens in zip(blocks, self.count([b.text for b in blocks])):
+            block.tokens = tokens
+        return blocks
+
+    # --- 2. Birleştirme ---
+
+    def _split_part(self, text: str) -> List[str]:
+        blocks = self._parse_blocks(text)
+        chunks: List[str] = []
+        current: List[Block] = []
+        current_tokens = 0
+        headings: List[Block] = []  # Aktif başlık yolu (h1 > h2 > ...)
+        carried = False             # current sadece önceki parçadan taşınan örtüşmeden mi ibaret?
+
+        def flush():
+            nonlocal current, current_tokens, carried
+            if any(b.kind != "heading" for b in current):
+                chunks.append("\n\n".join(b.text for b in current))
+                # Kısa son paragraf bir sonraki parçada bağlam olarak tekrar edilir
+                last = current[-1]
+                if last.kind == "paragraph" and last.tokens <= self.overlap_tokens:
+                    current, current_tokens, carried = [last], last.tokens, True
+                    return
+            current, current_tokens, carried = [], 0, False
+
+        def context_prefix() -> List[Block]:
+            # Yeni parça başlık ortasından başlıyorsa en yakın başlığı taşı
+            return headings[-1:] if headings else []
+
+        for block in blocks:
+            if block.kind == "heading":
+                # Yeni bölüm önceki bölümün örtüşmesini taşımaz
+                if current_tokens >= self.min_tokens or carried:
+                    if not carried:
+                        flush()
+                    current, current_tokens, carried = [], 0, False
+                headings = [h for h in headings if h.level < block.level] + [block]
+                current.append(block)
+                current_tokens += block.tokens
+                continue
+
+            pieces = [block] if block.tokens <= self.max_tokens else self._split_block(block)
+            for piece in pieces:
+                if current_tokens + piece.tokens > self.max_tokens and current:
+                    flush()
+                    prefix = [b for b in context_prefix() if b not in current]
+                    current = prefix + current
+                    current_tokens = sum(b.tokens for b in current)
+                    if current_tokens + piece.tokens > self.max_tokens:
+                        prefix_tokens = sum(b.tokens for b in prefix)
+                        fits = prefix_tokens + piece.tokens <= self.max_tokens
+                        current = prefix if fits else []
+                        current_tokens = prefix_tokens if fits else 0
+                current.append(piece)
+                current_tokens += piece.tokens
+                carried = False
+
+        if current and not carried and all(b.kind == "heading" for b in current) and not chunks:
+            # Sadece başlıklardan oluşan kısa metin
+            chunks.append("\n\n".join(b.text for b in current))
+        elif not carried:
+            flush()
+        return chunks
+
+    # --- 3. Bütçeyi aşan bloklar ---
+
+    def _split_block(self, block: Block) -> List[Block]:
+        budget = self.max_tokens - self.overlap_tokens // 2
+        if block.kind == "table":
+            return self._split_table(block, budget)
+        if block.kind == "list":
+            units = re.split(r"\n(?=\s*(?:[-*+]|\d+[.)])\s)", block.text)
+        else:
+            units = _SENTENCE_RE.split(block.text)
+        return self._pack_units(block.kind, units, budget, separator="\n" if block.kind == "list" else " ")
+
+    def _split_table(self, block: Block, budget: int) -> List[Block]:
+        """Tabloyu satır gruplarına böler; her grup başlık satırlarını tekrarlar."""
+        rows = block.text.split("\n")
+        header_len = 2 if len(rows) > 1 and _TABLE_SEPARATOR_RE.match(rows[1]) else 1
+        header, body = rows[:header_len], rows[header_len:]
+        if not body:
+            return self._pack_units("table", rows, budget, separator="\n")
+
+        header_text = "\n".join(header)
+        header_tokens = self.count([header_text])[0]
+        pieces = self._pack_units("table", body, max(budget - header_tokens, 1), separator="\n")
+        for piece in pieces:
+            piece.text = f"{header_text}\n{piece.text}"
+            piece.tokens += header_tokens
+        return pieces
+
+    def _pack_units(self, kind: str, units: List[str], budget: int, separator: str) -> List[Block]:
+        units = [u for u in units if u.strip()]
+        pieces: List[Block] = []
+        text_parts: List[str] = []
+        tokens = 0
+
+        for unit, unit_tokens in zip(units, self.count(units)):
+            if unit_tokens > budget:
+                # Tek cümle/satır bile sığmıyorsa kelime sınırından sert kes
+                for word_chunk, word_tokens in self._split_words(unit, unit_tokens, budget):
+                    if text_parts:
+                        pieces.append(self._make(kind, separator.join(text_parts), tokens))
+                        text_parts, tokens = [], 0
+                    pieces.append(self._make(kind, word_chunk, word_tokens))
+                continue
+            if tokens + unit_tokens > budget and text_parts:
+                pieces.append(self._make(kind, separator.join(text_parts), tokens))
+                text_parts, tokens = [], 0
+            text_parts.append(unit)
+            tokens += unit_tokens
+
+        if text_parts:
+            pieces.append(self._make(kind, separator.join(text_parts), tokens))
+        return pieces
+
+    def _split_words(self, text: str, tokens: int, budget: int) -> List[Tuple[str, int]]:
+        words = text.split()
+        # Kelime başına ortalama token'a göre pencere (tek sayım, doğrusal)
+        per_word = max(tokens / max(len(words), 1), 1.0)
+        window = max(int(budget / per_word), 1)
+        parts = [" ".join(words[i:i + window]) for i in range(0, len(words), window)]
+        return list(zip(parts, self.count(parts)))
+
+    @staticmethod
+    def _make(kind: str, text: str, tokens: int) -> Block:
+        block = Block(kind, text)
+        block.tokens = tokens
+        return block
@@ -0,0 +1,279 @@
+"""
+Token bütçeli prompt (context) kurucu.
+
+Prompt eskiden system + history[-5:] + RAG + sorgu şeklinde sayılmadan
+kuruluyordu; uzun turlarda num_ctx sessizce taşıyor (Ollama baştan
+kırpıyor), kısa turlarda ise pencere boşa gidiyordu. ContextBuilder her
+parçayı sayar ve pencereyi şu sırayla dağıtır:
+
+  1. Yanıt payı (modelin üreteceği token'lar) ve system prompt
+  2. Kullanıcı sorgusu + ipuçları (her zaman girer)
+  3. RAG bağlamı (bütçeye göre kırpılır)
+  4. Eski turların rolling özeti
+  5. Geçmiş mesajlar: en yeniden eskiye, sığdığı kadar
+
+Sığmayan eski turlar summarize_history ile arka planda özete katlanır.
+Tur içindeki tool adımları için fit_step_output, yeni çıktıya yer kalmadığında
+önceki adım çıktılarını ve RAG bağlamını işaretle değiştirerek yer açar.
+
+Ollama, önceki istekle ortak olan prompt önekinin KV cache'ini yeniden
+kullanır. Bu yüzden sıra sabittir (system, özet, geçmiş, en sonda RAG +
+sorgu) ve geçmişin başlangıcı her turda kaydırılmaz: önceki turun
+başlangıcı hâlâ sığıyorsa korunur, taşınca pencere bir seferde
+HISTORY_REFILL_RATIO'ya kadar boşaltılır (histerezis); böylece sonraki
+birkaç tur yine aynı öneki kullanır.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.core.model_client import NUM_CTX
+from backend.core.scheduler import BACKGROUND
+
+# Modelin cevabı için ayrılan pay
+RESPONSE_RESERVE_TOKENS = int(os.getenv("CONTEXT_RESPONSE_TOKENS", "1024"))
+# Yanıt payı ve sabit kısımlar düştükten sonra RAG'e verilebilecek en büyük oran
+RAG_BUDGET_RATIO = float(os.getenv("CONTEXT_RAG_RATIO", "0.4"))
+SUMMARY_MAX_TOKENS = 512
+# Geçmiş taşınca, bütçenin bu oranına kadar yeniden doldurulur (kalan pay sonraki turlara)
+HISTORY_REFILL_RATIO = float(os.getenv("CONTEXT_HISTORY_REFILL_RATIO", "0.6"))
+# Chat şablonu her mesaja rol etiketi vb. ekler
+MESSAGE_OVERHEAD_TOKENS = 4
+# Türkçe metin İngilizceden daha fazla token'a bölünür; tahmin bilerek cömert
+CHARS_PER_TOKEN = 3.2
+
+# Tool çıktısına, gerekirse önceki adımlar ve RAG bağlamı kırpılarak açılan en az yer
+STEP_OUTPUT_MIN_TOKENS = int(os.getenv("CONTEXT_TOOL_OUTPUT_MIN_TOKENS", "1024"))
+
+RAG_SEPARATOR = "\n---\n"
+RAG_HEADER = "\n\nContext from Files (RAG):\n"
+
+# Yer açmak için çıkarılan içeriğin yerine modele gösterilen işaretler
+SHED_STEP_MARKER = "[SYSTEM HINT]: This earlier tool output was removed to fit the context window."
+SHED_RAG_MARKER = "[SYSTEM HINT]: File context was removed to make room for tool outputs."
+DROPPED_OUTPUT_MARKER = "[SYSTEM HINT]: The tool output did not fit into the context window and was dropped."
+
+SUMMARY_PROMPT = """Summarize the conversation below for your own future reference.
+Keep facts, numbers, file names, decisions and open questions. Drop greetings and filler.
+Write at most {max_words} words in the language of the conversation. Output only the summary."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer'sız kaba token tahmini (kelime ve karakter sayısından büyüğü)."""
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / CHARS_PER_TOKEN), len(text.split()) * 4 // 3)
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def trim_to_tokens(text: str, max_tokens: int, marker: str = " …[kırpıldı]") -> str:
+    """Metni tahmini token bütçesine sığacak şekilde sondan kırpar."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    cut = int(max_tokens * CHARS_PER_TOKEN) - len(marker)
+    while cut > 0 and estimate_tokens(text[:cut] + marker) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:max(cut, 0)] + marker
+
+
+class ContextBuilder:
+    def __init__(
+        self,
+        num_ctx: int = NUM_CTX,
+        response_reserve: int = RESPONSE_RESERVE_TOKENS,
+        rag_ratio: float = RAG_BUDGET_RATIO,
+    ) -> None:
+        self.num_ctx = num_ctx
+        self.response_reserve = response_reserve
+        self.rag_ratio = rag_ratio
+
+    @property
+    def prompt_budget(self) -> int:
+        return self.num_ctx - self.response_reserve
+
+    def build(
+        self,
+        system_prompt: str,
+        history: List[Dict[str, str]],
+        query: str,
+        rag_chunks: List[str],
+        summary: str = "",
+        history_offset: int = 0,
+        previous_start: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Bütçeye sığan mesaj listesini ve token dağılımı raporunu döner.
+
+        history_offset: history'nin özete zaten katlanmış kısmı (bu mesajlar
+        tekrar eklenmez). Rapordaki history_start, pakete giren en eski
+        mesajın history içindeki indeksidir; offset ile arasındakiler özete
+        katlanmayı bekler. previous_start önceki turun history_start'ıdır;
+        hâlâ sığıyorsa aynen kullanılır (prompt öneki değişmez).
+        """
+        system_msg = {"role": "system", "content": system_prompt}
+        system_tokens = message_tokens(system_msg)
+        query_tokens = estimate_tokens(query) + MESSAGE_OVERHEAD_TOKENS
+        remaining = self.prompt_budget - system_tokens - query_tokens
+
+        # RAG: en alakalı parçalardan başlayarak bütçe dolana kadar
+        rag_budget = max(int(remaining * self.rag_ratio), 0)
+        rag_parts: List[str] = []
+        rag_tokens = 0
+        if rag_chunks:
+            rag_tokens = estimate_tokens(RAG_HEADER)
+            for chunk in rag_chunks:
+                cost = estimate_tokens(chunk) + estimate_tokens(RAG_SEPARATOR)
+                if rag_tokens + cost > rag_budget:
+                    # İlk parça bile sığmıyorsa kırpılmış halini koy; boş bağlamdan iyidir
+                    if not rag_parts and rag_budget - rag_tokens > 64:
+                        piece = trim_to_tokens(chunk, rag_budget - rag_tokens)
+                        rag_parts.append(piece)
+                        rag_tokens += estimate_tokens(piece)
+                    break
+                rag_parts.append(chunk)
+                rag_tokens += cost
+            if not rag_parts:
+                rag_tokens = 0
+        remaining -= rag_tokens
+
+        summary_msg = None
+        summary_tokens = 0
+        if summary:
+            summary_msg = {"role": "system", "content": f"CONVERSATION SUMMARY (older turns):\n{summary}"}
+            summary_msg["content"] = trim_to_tokens(summary_msg["content"], min(SUMMARY_MAX_TOKENS, max(remaining, 0)))
+            summary_tokens = message_tokens(summary_msg) if summary_msg["content"] else 0
+            if not summary_tokens:
+                summary_msg = None
+            remaining -= summary_tokens
+
+        # Geçmiş: önceki başlangıç hâlâ sığıyorsa onu koru (KV cache öneki aynı kalır)
+        history_start = None
+        history_tokens = 0
+        if previous_start is not None and history_offset <= previous_start <= len(history):
+            kept_tokens = sum(message_tokens(message) for message in history[previous_start:])
+            if kept_tokens <= remaining:
+                history_start, history_tokens = previous_start, kept_tokens
+
+        if history_start is None:
+            # Taştı (veya ilk tur): en yeniden geriye, ilk sığmayan mesajda dur.
+            # Önceki bir başlangıç varsa pencerenin bir kısmı sonraki turlara boş bırakılır.
+            limit = remaining if previous_start is None else int(remaining * HISTORY_REFILL_RATIO)
+            history_start = len(history)
+            for index in range(len(history) - 1, history_offset - 1, -1):
+                cost = message_tokens(history[index])
+                if history_tokens + cost > limit:
+                    break
+                history_tokens += cost
+                history_start = index
+        packed = history[history_start:]
+
+        messages = [system_msg]
+        if summary_msg:
+            messages.append(summary_msg)
+        messages.extend(packed)
+        user_content = query
+        if rag_parts:
+            user_content += RAG_HEADER + RAG_SEPARATOR.join(rag_parts)
+        messages.append({"role": "user", "content": user_content})
+
+        total = system_tokens + summary_tokens + history_tokens + rag_tokens + query_tokens
+        report = {
+            "num_ctx": self.num_ctx,
+            "response_reserve": self.response_reserve,
+            "system": system_tokens,
+            "summary": summary_tokens,
+            "history": history_tokens,
+            "history_messages": len(packed),
+            "history_start": history_start,
+            "rag": rag_tokens,
+            "rag_chunks": f"{len(rag_parts)}/{len(rag_chunks)}",
+            "query": query_tokens,
+            "total": total,
+            "free": self.prompt_budget - total,
+        }
+        return messages, report
+
+    def remaining(self, messages: List[Dict[str, str]]) -> int:
+        """Mevcut mesajlardan sonra yanıt payı hariç kalan token sayısı."""
+        return self.prompt_budget - sum(message_tokens(message) for message in messages)
+
+    def fit_step_output(
+        self,
+        messages: List[Dict[str, str]],
+        output: str,
+        query_index: int,
+        min_tokens: int = STEP_OUTPUT_MIN_TOKENS,
+    ) -> str:
+        """
+        Tool çıktısını pencerede kalan yere sığdırır. Çıktıya en az min_tokens
+        (çıktı daha kısaysa kendi boyu) yer kalmadıysa önce önceki adımların
+        tool çıktıları (eskiden yeniye), sonra turun RAG bağlamı işaretle
+        değiştirilir; messages yerinde güncellenir. query_index, build()'in
+        döndürdüğü kullanıcı sorgusu mesajının indeksidir.
+
+        Çıktı hiç sığmazsa boş string yerine bir işaret döner.
+        """
+        def room() -> int:
+            return self.remaining(messages) - MESSAGE_OVERHEAD_TOKENS
+
+        needed = min(estimate_tokens(output), min_tokens)
+        shed = []
+        for index in range(query_index + 1, len(messages)):
+            if room() >= needed:
+                break
+            message = messages[index]
+            if message["role"] == "user" and message["content"] != SHED_STEP_MARKER:
+                messages[index] = {"role": "user", "content": SHED_STEP_MARKER}
+                shed.append(f"adım çıktısı #{index}")
+
+        query = messages[query_index]
+        if room() < needed and RAG_HEADER in query["content"]:
+            head = query["content"].split(RAG_HEADER, 1)[0]
+            messages[query_index] = {"role": query["role"], "content": f"{head}\n{SHED_RAG_MARKER}"}
+            shed.append("RAG bağlamı")
+
+        if shed:
+            print(f"✂️ Tool çıktısına yer açmak için kırpıldı: {', '.join(shed)}")
+        fitted = trim_to_tokens(output, room())
+        return fitted or DROPPED_OUTPUT_MARKER
+
+    @staticmethod
+    def describe(report: Dict[str, Any]) -> str:
+        return (
+            f"system {report['system']} + özet {report['summary']} + "
+            f"geçmiş {report['history']} ({report['history_messages']} mesaj) + "
+            f"RAG {report['rag']} ({report['rag_chunks']} parça) + sorgu {report['query']} = "
+            f"{report['total']}/{report['num_ctx']} (yanıt payı {report['response_reserve']}, boş {report['free']})"
+        )
+
+
+async def summarize_history(model, summary: str, messages: List[Dict[str, str]], max_words: int = 250) -> Optional[str]:
+    """Önceki özeti ve yeni düşen mesajları tek bir rolling özete katlar. Hata olursa None."""
+    transcript = "\n".join(f"{message['role'].upper()}: {message['content']}" for message in messages)
+    # Özetleme isteğinin kendisi de pencereye sığmalı
+    transcript = trim_to_tokens(transcript, NUM_CTX - RESPONSE_RESERVE_TOKENS - SUMMARY_MAX_TOKENS - 256)
+    parts = []
+    if summary:
+        parts.append(f"EXISTING SUMMARY:\n{summary}")
+    parts.append(f"NEW MESSAGES:\n{transcript}")
+
+    result = await model.generate(
+        [
+            {"role": "system", "content": SUMMARY_PROMPT.format(max_words=max_words)},
+            {"role": "user", "content": "\n\n".join(parts)},
+        ],
+        stream=False,
+        # Kullanıcı beklemiyor: etkileşimli istekler önce alınır
+        priority=BACKGROUND,
+    )
+    if not result or result.startswith("Error communicating with Ollama"):
+        return None
+    return result.strip()
@@ -0,0 +1,147 @@
+"""
+Boyut sınırlı, içerik adresli disk önbelleği.
+
+Değerler JSON olarak `<root>/<key[:2]>/<key>.json` altına yazılır. Toplam
+boyut `max_bytes`'ı aşınca en uzun süredir kullanılmayan kayıtlar (mtime'a
+göre) silinir. Yazımlar atomiktir (tmp + os.replace), bu yüzden aynı klasörü
+birden fazla süreç güvenle paylaşabilir.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+
+def make_key(*parts: Any) -> str:
+    """Parçaların sıralı JSON temsilinden sha256 anahtarı üretir."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """Dosya içeriğinin sha256 özetini döner (büyük dosyalar için parça parça)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, root: str, max_bytes: int, ttl: Optional[float] = None, name: str = "cache") -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._size = self._scan_size()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat
+
+    def _scan_size(self) -> int:
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if self.ttl is not None and time.time() - record.get("created", 0) > self.ttl:
+            self.delete(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # LRU için erişim zamanını güncelle
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return record.get("value")
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(payload.encode("utf-8")) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _evict(self) -> None:
+        """En eski erişilen kayıtları hedef boyutun %90'ına inene kadar siler (kilit altında)."""
+        target = int(self.max_bytes * 0.9)
+        # Diğer süreçlerin yazdıkları da hesaba katılsın diye boyutu diskten yeniden oku
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+        self._size = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= stat.st_size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
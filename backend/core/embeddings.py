@@ -0,0 +1,126 @@
+"""
+CPU için embedding katmanı.
+
+Sentence-Transformers modelini yapılandırılabilir batch boyutu ve thread
+sayısıyla çalıştırır; isteğe bağlı olarak modelin ONNX / int8 quantize
+edilmiş export'unu (onnxruntime) kullanır. Her çağrıda parça/saniye
+ölçülür. Chroma'ya vektörler hazır verildiği için bu sınıf Chroma'nın
+EmbeddingFunction'ına bağımlı değildir.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 -> kütüphane varsayılanı
+# all-MiniLM-L6-v2 deposunda hazır gelen quantize export'lar: model_qint8_avx2/avx512/arm64.onnx
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx2.onnx")
+
+
+class EmbeddingBackend:
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = EMBEDDING_BACKEND,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        threads: int = EMBEDDING_THREADS,
+        onnx_file: str = EMBEDDING_ONNX_FILE,
+    ) -> None:
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.threads = threads
+        self.onnx_file = onnx_file
+        self.model = self._load()
+
+        self._lock = threading.Lock()
+        self.total_chunks = 0
+        self.total_seconds = 0.0
+
+    @property
+    def config_key(self) -> str:
+        """Önbellek anahtarının parçası: quantize model biraz farklı vektör üretir."""
+        if self.backend == "onnx":
+            return f"{self.model_name}:onnx:{self.onnx_file}"
+        return f"{self.model_name}:torch"
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            try:
+                model_kwargs = {"file_name": self.onnx_file, "provider": "CPUExecutionProvider"}
+                if self.threads:
+                    import onnxruntime as ort
+
+                    session_options = ort.SessionOptions()
+                    session_options.intra_op_num_threads = self.threads
+                    session_options.inter_op_num_threads = 1
+                    model_kwargs["session_options"] = session_options
+                model = SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+                print(f"🧮 Embedding: {self.model_name} (ONNX {self.onnx_file}, batch={self.batch_size})")
+                return model
+            except Exception as e:
+                print(f"⚠️ ONNX embedding yüklenemedi ({e}), torch backend'e dönülüyor.")
+                self.backend = "torch"
+
+        if self.threads:
+            import torch
+
+            torch.set_num_threads(self.threads)
+        model = SentenceTransformer(self.model_name, device="cpu")
+        print(f"🧮 Embedding: {self.model_name} (torch, batch={self.batch_size})")
+        return model
+
+    def embed(self, texts: List[str], progress: Optional[Callable[[int, int], None]] = None) -> List[List[float]]:
+        """Metinleri batch_size'lık gruplar halinde vektöre çevirir."""
+        if not texts:
+            return []
+
+        started = time.perf_counter()
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            encoded = self.model.encode(
+                batch,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            vectors.extend(encoded.tolist())
+            if progress:
+                progress(len(vectors), len(texts))
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.total_chunks += len(texts)
+            self.total_seconds += elapsed
+        if len(texts) > 1:
+            print(f"🧮 {len(texts)} parça {elapsed:.2f}s ({len(texts) / max(elapsed, 1e-9):.0f} parça/s)")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        # Chroma EmbeddingFunction imzası ile uyumluluk
+        return self.embed(list(input))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "backend": self.backend,
+            "batch_size": self.batch_size,
+            "threads": self.threads,
+            "chunks": self.total_chunks,
+            "seconds": self.total_seconds,
+            "chunks_per_second": self.total_chunks / self.total_seconds if self.total_seconds else 0.0,
+        }
@@ -0,0 +1,212 @@
+"""
+Model kararını (JSON) stream edilirken parça parça ayrıştıran artımlı parser.
+
+extract_json yanıtın tamamı gelmeden çalışamaz. Bu parser her chunk'ta
+yalnızca yeni gelen karakterleri tarar ve üst seviye alanları (thought,
+tool_name, tool_args, tool_calls, final_answer) değerleri kapandığı anda
+çözer. Böylece tool çağrısı tamamlanır tamamlanmaz çalıştırılabilir ve
+üretimin geri kalanı (kullanılmayacak token'lar) iptal edilebilir.
+
+final_answer string'i ise kapanmasını beklemeden, kaçış dizileri (\\n,
+\\", \\uXXXX, chunk sınırında bölünmüş olsalar bile) çözülerek parça
+parça dışarı verilir; kullanıcı cevabı üretilirken görür.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+_WHITESPACE = " \t\r\n"
+STREAMED_FIELD = "final_answer"
+# Bir JSON nesnesinin model kararı sayılması için bu alanlardan en az biri dolu olmalı
+DECISION_FIELDS = ("tool_name", "tool_calls", "final_answer")
+
+
+def is_decision(decision: Optional[Dict[str, Any]]) -> bool:
+    """
+    Karar alanı taşıyan sözlük mü? Metin modunda parser kod bloğundaki
+    herhangi bir sözlüğü (ör. d = {"x": 1}) de çözebilir; onlar karar değildir.
+    """
+    return isinstance(decision, dict) and any(decision.get(field) for field in DECISION_FIELDS)
+
+
+def _complete_prefix(raw: str) -> int:
+    """JSON string içeriğinde yarım kalmış kaçış dizisinden önceki güvenli uzunluk."""
+    i = 0
+    while i < len(raw):
+        if raw[i] != "\\":
+            i += 1
+            continue
+        if i + 1 >= len(raw):
+            return i
+        if raw[i + 1] != "u":
+            i += 2
+            continue
+        if i + 6 > len(raw):
+            return i
+        # Yüksek surrogate ise (emoji vb.) eşi olan \uDCxx gelene kadar bekle
+        if raw[i + 2:i + 4].lower() in ("d8", "d9", "da", "db") and len(raw) < i + 12:
+            rest = raw[i + 6:]
+            if "\\u".startswith(rest[:2]):
+                return i
+        i += 6
+    return i
+
+
+class StreamingDecisionParser:
+    def __init__(self) -> None:
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.calls: List[Dict[str, Any]] = []  # tool_calls listesinde kapanan elemanlar
+        self.closed = False   # Üst seviye nesne kapandı
+        self.failed = False   # Kapanan bir değer çözülemedi (fallback: extract_json)
+
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"  # key | colon | value | comma (derinlik 1'de)
+        self._key: Optional[str] = None
+        self._token_start = -1   # Derinlik 1'deki anahtar/değerin başlangıcı
+        self._element_start = -1  # tool_calls içindeki elemanın başlangıcı
+        self._stream_start = -1   # final_answer string'inde henüz çözülmemiş kısmın başlangıcı
+        self._stream_out: List[str] = []
+        self.stream_started = False
+
+    def feed(self, chunk: str) -> None:
+        """Yeni chunk'ı ekler ve sadece yeni karakterleri tarar."""
+        if self.closed or self.failed:
+            return
+        self.text += chunk
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._stream_start >= 0:
+                        self._drain(i)
+                        self._stream_start = -1
+                    if self._depth == 1:
+                        self._finish_token(i + 1)
+                continue
+
+            if self._depth == 0:
+                # İlk '{' öncesindeki metin (```json vb.) atlanır
+                if c == "{":
+                    self._depth = 1
+                    self._expect = "key"
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._token_start = i
+                    if self._expect == "value" and self._key == STREAMED_FIELD:
+                        self._stream_start = i + 1
+                        self.stream_started = True
+            elif c in "{[":
+                if self._depth == 1:
+                    self._token_start = i
+                elif self._depth == 2 and self._key == "tool_calls" and c == "{":
+                    self._element_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1:
+                    # Üst seviye nesne kapanıyor; bekleyen primitive değer varsa bitir
+                    if self._expect == "value" and self._token_start >= 0:
+                        self._finish_token(i)
+                    self._depth = 0
+                    self.closed = True
+                    break
+                self._depth -= 1
+                if self._depth == 2 and self._key == "tool_calls" and self._element_start >= 0:
+                    self._finish_element(i + 1)
+                elif self._depth == 1:
+                    self._finish_token(i + 1)
+            elif self._depth == 1:
+                if c == ":" and self._expect == "colon":
+                    self._expect = "value"
+                    self._token_start = -1
+                elif c == ",":
+                    if self._expect == "value" and self._token_start >= 0:
+                        self._finish_token(i)
+                    self._expect = "key"
+                elif c not in _WHITESPACE and self._expect == "value" and self._token_start < 0:
+                    self._token_start = i  # true / false / null / sayı
+
+            if self.failed:
+                break
+
+        self._pos = len(text)
+        if self._stream_start >= 0:
+            self._drain(len(text))
+
+    def _drain(self, end: int) -> None:
+        """final_answer'ın tamamlanmış kısmını çözüp çıkış kuyruğuna ekler."""
+        raw = self.text[self._stream_start:end]
+        safe = _complete_prefix(raw)
+        if safe == 0:
+            return
+        try:
+            self._stream_out.append(json.loads('"' + raw[:safe] + '"'))
+        except ValueError:
+            # Geçersiz kaçış dizisi: kullanıcıya ham haliyle göster
+            self._stream_out.append(raw[:safe])
+        self._stream_start += safe
+
+    def take_answer(self) -> str:
+        """Son çağrıdan beri çözülen final_answer metni (yoksa boş string)."""
+        delta = "".join(self._stream_out)
+        self._stream_out.clear()
+        return delta
+
+    def _finish_token(self, end: int) -> None:
+        raw = self.text[self._token_start:end].strip()
+        self._token_start = -1
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            self.failed = True
+            return
+
+        if self._expect == "key":
+            self._key = value if isinstance(value, str) else None
+            self._expect = "colon"
+        elif self._expect == "value":
+            if self._key is not None:
+                self.fields[self._key] = value
+            self._expect = "comma"
+
+    def _finish_element(self, end: int) -> None:
+        raw = self.text[self._element_start:end]
+        self._element_start = -1
+        try:
+            call = json.loads(raw)
+        except ValueError:
+            return
+        if isinstance(call, dict) and call.get("tool_name"):
+            args = call.get("tool_args")
+            self.calls.append({"tool_name": call["tool_name"], "tool_args": args if isinstance(args, dict) else {}})
+
+    def tool_calls_ready(self) -> bool:
+        """Tool çağrısı eksiksiz geldi mi? (üretimin geri kalanı iptal edilebilir)"""
+        if "tool_calls" in self.fields:
+            return bool(self.calls)
+        return bool(self.fields.get("tool_name")) and isinstance(self.fields.get("tool_args"), dict)
+
+    def decision(self) -> Optional[Dict[str, Any]]:
+        """Şu ana kadar çözülen alanlardan karar sözlüğü (nesne kapanmadıysa ve tool hazır değilse None)."""
+        if self.failed or not (self.closed or self.tool_calls_ready()):
+            return None
+        decision = dict(self.fields)
+        if "tool_calls" in decision:
+            decision["tool_calls"] = list(self.calls)
+        return decision
@@ -0,0 +1,179 @@
+"""
+Chroma koleksiyonlarının yanında tutulan bellek içi BM25 (lexical) indeks.
+
+Dense embedding'ler tablo kodlarını, sayıları ve tam tanımlayıcıları
+(ör. "TR-2024-017") kaçırabildiği için her koleksiyonun bir ters indeksi
+tutulur ve RAGManager.search sonuçları rank fusion ile birleştirir.
+İndeks add_document sırasında artımlı güncellenir; süreç yeniden
+başladığında ilk erişimde Chroma'daki dokümanlardan yeniden kurulur.
+
+Skorlama numpy ile yapılır: her terimin posting'leri (doküman indeksi, tf)
+dizileri olarak önbelleklenir ve yeni dokümanlar eklendikçe uzatılır; bir
+sorgu tüm terimlerin katkısını tek bir bincount ile toplar.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Sorgu gecikmesi bütçesi (ms). Maliyeti okunan posting sayısı belirler: terimler nadirden
+# yaygına işlenir, toplam LEXICAL_MAX_POSTINGS'i aşacak yaygın terimlerin sadece en yüksek
+# katkılı posting'leri okunur (sonuç o zaman yaklaşıktır). Süre yine aşılırsa uyarı basılır.
+LEXICAL_BUDGET_MS = 5.0
+LEXICAL_MAX_POSTINGS = int(os.getenv("LEXICAL_MAX_POSTINGS", "100000"))
+# Bütçesi biten (yaygın) terimden bile en az bu kadar posting okunur
+MIN_POSTINGS_PER_TERM = 1000
+MAX_QUERY_TERMS = 32
+
+# "A-12", "3.14", "TR/2024" gibi kodlar tek parça halinde de yakalanır
+_TOKEN_RE = re.compile(r"\w+(?:[-./:]\w+)*", re.UNICODE)
+_PART_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Küçük harfe çevirip kelimeleri ve birleşik kodları (hem bütün hem parça) döner."""
+    tokens: List[str] = []
+    for match in _TOKEN_RE.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(_PART_RE.findall(match))
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B) -> None:
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.postings: Dict[str, Dict[int, int]] = {}  # terim -> {doc_idx: tf}
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.sources: List[str] = []
+        self.doc_lens: List[int] = []
+        self.total_len = 0
+        self.last_query_ms = 0.0
+        self.last_query_postings = 0
+        # terim -> (doküman indeksleri, tf'ler); postings'e eklenen yeni dokümanlarla uzatılır
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_lens_array = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: Iterable[str], documents: Iterable[str], sources: Optional[Iterable[str]] = None) -> None:
+        """Dokümanları artımlı olarak ekler (mevcut dokümanlar yeniden işlenmez)."""
+        ids, documents = list(ids), list(documents)
+        sources = list(sources) if sources is not None else [""] * len(ids)
+        with self._lock:
+            for doc_id, document, source in zip(ids, documents, sources):
+                idx = len(self.ids)
+                tokens = tokenize(document)
+                self.ids.append(doc_id)
+                self.documents.append(document)
+                self.sources.append(source)
+                self.doc_lens.append(len(tokens))
+                self.total_len += len(tokens)
+
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    self.postings.setdefault(token, {})[idx] = tf
+
+    def _term_arrays(self, term: str, postings: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Terimin posting dizileri. Yeni dokümanlar her zaman sona eklendiği için sadece fark işlenir."""
+        cached = self._arrays.get(term)
+        known = 0 if cached is None else len(cached[0])
+        if known == len(postings):
+            return cached
+        new_items = list(itertools.islice(postings.items(), known, None))
+        idxs = np.fromiter((idx for idx, _ in new_items), dtype=np.int64, count=len(new_items))
+        tfs = np.fromiter((tf for _, tf in new_items), dtype=np.float32, count=len(new_items))
+        if cached is not None:
+            idxs, tfs = np.concatenate([cached[0], idxs]), np.concatenate([cached[1], tfs])
+        self._arrays[term] = (idxs, tfs)
+        return idxs, tfs
+
+    def _doc_lens_np(self) -> np.ndarray:
+        known = len(self._doc_lens_array)
+        if known < len(self.doc_lens):
+            extra = np.asarray(self.doc_lens[known:], dtype=np.float32)
+            self._doc_lens_array = np.concatenate([self._doc_lens_array, extra])
+        return self._doc_lens_array
+
+    def search(self, query: str, n_results: int, exact: bool = False) -> List[Tuple[int, float]]:
+        """
+        En yüksek BM25 skorlu (doc_idx, skor) çiftlerini döner.
+        exact=True posting bütçesini kapatır (ölçüm/karşılaştırma için).
+        """
+        started = time.perf_counter()
+        with self._lock:
+            n_docs = len(self.ids)
+            if n_docs == 0:
+                return []
+
+            avg_len = self.total_len / n_docs
+            k1, b = self.k1, self.b
+            doc_lens = self._doc_lens_np()
+            terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+            # Nadir (yüksek idf) terimler önce: bütçe dolarsa en az bilgi taşıyan yaygın terimler kısaltılır
+            weighted = []
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings:
+                    df = len(postings)
+                    weighted.append((math.log(1 + (n_docs - df + 0.5) / (df + 0.5)), term, postings))
+            weighted.sort(key=lambda item: item[0], reverse=True)
+
+            all_idxs, all_weights = [], []
+            budget = LEXICAL_MAX_POSTINGS
+            for idf, term, postings in weighted:
+                idxs, tfs = self._term_arrays(term, postings)
+                weights = idf * tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * doc_lens[idxs] / avg_len))
+                limit = max(budget, MIN_POSTINGS_PER_TERM)
+                if not exact and len(idxs) > limit:
+                    # Bütçe yetmiyor: sadece terimin en güçlü geçtiği dokümanlar
+                    keep = np.argpartition(weights, -limit)[-limit:]
+                    idxs, weights = idxs[keep], weights[keep]
+                all_idxs.append(idxs)
+                all_weights.append(weights)
+                budget -= len(idxs)
+
+            if not all_idxs:
+                return []
+            idxs = np.concatenate(all_idxs)
+            scores = np.bincount(idxs, weights=np.concatenate(all_weights), minlength=n_docs)
+            matched = np.flatnonzero(scores)
+            if len(matched) > n_results:
+                matched = matched[np.argpartition(scores[matched], -n_results)[-n_results:]]
+            order = matched[np.argsort(-scores[matched], kind="stable")]
+            top = [(int(idx), float(scores[idx])) for idx in order]
+
+        self.last_query_postings = len(idxs)
+        self.last_query_ms = (time.perf_counter() - started) * 1000
+        if not exact and self.last_query_ms > LEXICAL_BUDGET_MS:
+            print(f"⚠️ Lexical arama bütçeyi aştı: {self.last_query_ms:.1f}ms ({n_docs} parça, {len(idxs)} posting)")
+        return top
+
+    def hit(self, idx: int) -> Dict[str, str]:
+        return {"id": self.ids[idx], "document": self.documents[idx], "source": self.sources[idx]}
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Birden fazla sıralamayı RRF ile birleştirir: skor = Σ 1 / (k + sıra)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
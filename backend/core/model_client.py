@@ -1,15 +1,95 @@
 import ollama
+import os
 from typing import List, Dict, AsyncGenerator, Any, Optional, Union
 import json
 import asyncio
+import time
+
+from backend.core import resources
+from backend.core.response_cache import cache_enabled
+from backend.core.scheduler import INTERACTIVE
+
+# Context penceresi; prompt bütçesi (backend.core.context) de buna göre hesaplanır
+NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+
+# Model bellekte ne kadar tutulsun? Boşaltılırsa sonraki istekte hem yükleme
+# hem de tüm prompt'un (KV cache) yeniden değerlendirilmesi ödenir.
+# Model bazında: MODEL_KEEP_ALIVE="glm4.7-flash:latest=1h,qwen3-vl:2b=0"
+DEFAULT_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+MODEL_KEEP_ALIVE: Dict[str, str] = dict(
+    item.strip().rsplit("=", 1) for item in os.getenv("MODEL_KEEP_ALIVE", "").split(",") if "=" in item
+)
+
+# Örnekleme sıcaklığı; 0 ise çıktı deterministiktir ve yanıt önbelleği otomatik açılır
+DEFAULT_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+
+# Ollama'nın done cevabındaki nanosaniye cinsinden süre alanları (kayıtta *_ms olarak tutulur)
+OLLAMA_DURATION_FIELDS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+
+
+def keep_alive_for(model_name: str, default: Union[str, int, None] = None) -> Union[str, int]:
+    """Modelin keep_alive değeri (ollama süre string'i, '0' ise hemen boşalt)."""
+    value = str(MODEL_KEEP_ALIVE.get(model_name, DEFAULT_KEEP_ALIVE if default is None else default))
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def describe_call(call: Dict[str, Any]) -> str:
+    """Telemetri kaydının tek satırlık özeti (log ve step çıktısı için)."""
+    parts = [f"TTFT {call['ttft_ms'] or 0:.0f}ms", f"toplam {call['wall_ms'] or 0:.0f}ms"]
+    if call.get("tokens_per_s"):
+        parts.append(f"{call['tokens_per_s']:.1f} tok/s")
+    if "prompt_eval_count" in call:
+        parts.append(f"prompt_eval {call['prompt_eval_count']} token ({call.get('prompt_eval_ms') or 0:.0f}ms)")
+    if call.get("load_ms"):
+        parts.append(f"yükleme {call['load_ms']:.0f}ms")
+    if call.get("retries"):
+        parts.append(f"{call['retries']} retry")
+    if call.get("queue_ms"):
+        parts.append(f"kuyruk {call['queue_ms']:.0f}ms")
+    if call.get("cached"):
+        parts.append("önbellek")
+    if call.get("cancelled"):
+        parts.append("iptal")
+    if call.get("error"):
+        parts.append("hata")
+    return " · ".join(parts)
+
 
 class ModelClient:
-    def __init__(self, model_name: str = "glm4.7-flash:latest"):
+    def __init__(
+        self,
+        model_name: str = "glm4.7-flash:latest",
+        client: Optional[ollama.AsyncClient] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+        temperature: float = DEFAULT_TEMPERATURE,
+        cache: Optional[bool] = None,
+        session_id: str = "default",
+        pinned: bool = False,
+    ):
         self.model_name = model_name
-        self.client = ollama.AsyncClient()
+        # Tüm çağrılar süreç genelindeki zamanlayıcıdan geçer (öncelik + oturumlar arası adalet)
+        self.scheduler = resources.get_llm_scheduler()
+        self.session_id = session_id
+        # Süreç genelinde tek bir AsyncClient paylaşılır (bağlantı havuzu dahil)
+        self.client = client or resources.get_ollama_client()
+        # keep_alive verilmezse residency yöneticisi RAM bütçesine göre her çağrıda karar verir;
+        # pinned: ana sohbet modeli, bütçede önce yer alır
+        self._keep_alive = keep_alive
+        self.residency = resources.get_residency_manager()
+        self.residency.register(model_name, pinned=pinned)
+        self.temperature = temperature
+        # cache=None: LLM_CACHE ayarına göre (varsayılan: sadece temperature 0'da açık)
+        use_cache = cache_enabled(temperature) if cache is None else cache
+        self.cache = resources.get_llm_cache() if use_cache else None
+        # Son çağrının telemetrisi (bkz. _new_call); stream iptal edilse de doldurulur
+        self.last_call: Dict[str, Any] = {}
         print(f"🤖 Model Client Hazır: {self.model_name}")
 
-    async def generate(self, messages: List[Dict[str, str]], stream: bool = True, json_mode: bool = False) -> Union[AsyncGenerator[str, None], str]:
+    @property
+    def keep_alive(self) -> Union[str, int]:
+        return self._keep_alive if self._keep_alive is not None else self.residency.keep_alive(self.model_name)
+
+    async def generate(self, messages: List[Dict[str, str]], stream: bool = True, json_mode: bool = False, priority: int = INTERACTIVE) -> Union[AsyncGenerator[str, None], str]:
         """
         Ollama Chat API'sini çağırır (Async).
         
@@ -17,26 +97,46 @@ class ModelClient:
             messages: [{"role": "user", "content": "..."}] formatında
             stream: True ise AsyncGenerator döner, False ise string.
             json_mode: True ise çıktı JSON'a zorlanır.
+            priority: scheduler.INTERACTIVE (kullanıcı bekliyor) veya scheduler.BACKGROUND
         """
         
         options = {
-            "temperature": 0.7,
-            "num_ctx": 8192, # Context window artırıldı
+            "temperature": self.temperature,
+            "num_ctx": NUM_CTX,
         }
         
         format_param = "json" if json_mode else None
+        call = self._new_call(json_mode, stream)
+        self.residency.touch(self.model_name)
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(self.model_name, messages, options, format_param)
+            cached = self.cache.get(cache_key, allow_partial=stream)
+            if cached is not None:
+                call["cached"] = True
+                if stream:
+                    return self._cached_stream(cached, call)
+                self._finish_call(call)
+                return cached
 
         try:
             if stream:
-                return self._stream_generator(messages, options, format_param)
+                return self._stream_generator(messages, options, format_param, call, cache_key, priority)
             else:
-                response = await self.client.chat(
-                    model=self.model_name,
-                    messages=messages,
-                    options=options,
-                    format=format_param,
-                    stream=False
-                )
+                async with self.scheduler.slot(self.session_id, priority, self.model_name) as waited_ms:
+                    call["queue_ms"] = round(waited_ms, 1)
+                    response = await self.client.chat(
+                        model=self.model_name,
+                        messages=messages,
+                        options=options,
+                        format=format_param,
+                        keep_alive=self.keep_alive,
+                        stream=False
+                    )
+                self._finish_call(call, response)
+                if cache_key:
+                    self.cache.put(cache_key, response['message']['content'])
                 return response['message']['content']
                 
         except Exception as e:
@@ -44,30 +144,103 @@ class ModelClient:
             # json_mode olmadan tekrar denemeyi veya hatayı yönetmeyi sağlar.
             if "parsing" in str(e).lower() and json_mode:
                 print(f"⚠️ Ollama JSON Parse Hatası: {e}. Raw moda dönülüyor...")
+                call["retries"] += 1
                 # Fallback durumunda model_name'i açıkça belirt
-                response = await self.client.chat(
-                    model=self.model_name,
-                    messages=messages,
-                    options=options,
-                    stream=False
-                )
+                async with self.scheduler.slot(self.session_id, priority, self.model_name):
+                    response = await self.client.chat(
+                        model=self.model_name,
+                        messages=messages,
+                        options=options,
+                        keep_alive=self.keep_alive,
+                        stream=False
+                    )
+                self._finish_call(call, response)
                 return response['message']['content']
             
+            call["error"] = str(e)
+            self._finish_call(call)
             return f"Error communicating with Ollama: {str(e)}"
 
-    async def _stream_generator(self, messages, options, format_param) -> AsyncGenerator[str, None]:
-        stream = await self.client.chat(
-            model=self.model_name,
-            messages=messages,
-            options=options,
-            format=format_param,
-            stream=True
-        )
-        
-        async for chunk in stream:
-            content = chunk['message']['content']
-            if content:
-                yield content
+    async def _stream_generator(self, messages, options, format_param, call: Dict[str, Any], cache_key: Optional[str] = None, priority: int = INTERACTIVE) -> AsyncGenerator[str, None]:
+        # Zamanlayıcı hakkı ilk iterasyonda alınır ve stream bitene/kapanana kadar tutulur
+        async with self.scheduler.slot(self.session_id, priority, self.model_name) as waited_ms:
+            call["queue_ms"] = round(waited_ms, 1)
+            stream = await self.client.chat(
+                model=self.model_name,
+                messages=messages,
+                options=options,
+                format=format_param,
+                keep_alive=self.keep_alive,
+                stream=True
+            )
+            
+            final = None
+            parts: List[str] = []
+            try:
+                async for chunk in stream:
+                    content = chunk['message']['content']
+                    if content:
+                        parts.append(content)
+                        if call["ttft_ms"] is None:
+                            call["ttft_ms"] = round((time.perf_counter() - call["_started"]) * 1000, 1)
+                        yield content
+                    if chunk.get('done'):
+                        final = chunk
+            except Exception as e:
+                call["error"] = str(e)
+                raise
+            finally:
+                # Tüketici erken bıraktıysa (aclose) HTTP stream'i hemen kapat; Ollama üretimi durdurur
+                call["cancelled"] = final is None and not call["error"]
+                self._finish_call(call, final)
+                # Erken kapatılan stream'in öneki sadece tüketici işaretlediyse saklanır
+                # (partial_ok: önek kararın tamamını içeriyor, ör. tool çağrısı yakalandı)
+                if cache_key and not call["error"] and (final is not None or call.pop("partial_ok", False)):
+                    self.cache.put(cache_key, "".join(parts), complete=final is not None)
+                await stream.aclose()
+
+    async def _cached_stream(self, content: str, call: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        """Önbellekteki yanıtı tek parça halinde stream eder."""
+        call["ttft_ms"] = round((time.perf_counter() - call["_started"]) * 1000, 1)
+        try:
+            yield content
+        finally:
+            call.pop("partial_ok", None)
+            self._finish_call(call)
+
+    def _new_call(self, json_mode: bool, stream: bool) -> Dict[str, Any]:
+        call = {
+            "model": self.model_name,
+            "mode": "json" if json_mode else "text",
+            "stream": stream,
+            "ttft_ms": None,       # İlk içerik token'ına kadar geçen duvar saati süresi
+            "wall_ms": None,
+            "retries": 0,          # JSON format hatası sonrası raw moda düşme sayısı
+            "cancelled": False,    # Stream erken kapatıldı (ör. tool kararı yakalandı)
+            "error": None,
+            "cached": False,       # Yanıt LLM önbelleğinden geldi (model çağrılmadı)
+            "_started": time.perf_counter(),
+        }
+        self.last_call = call
+        return call
+
+    def _finish_call(self, call: Dict[str, Any], response=None) -> None:
+        """Duvar saati ölçümlerine Ollama'nın son (done) cevabındaki sayaç/süreleri ekler."""
+        call["wall_ms"] = round((time.perf_counter() - call.pop("_started", time.perf_counter())) * 1000, 1)
+        if response is not None:
+            for field in OLLAMA_DURATION_FIELDS:
+                value = response.get(field)
+                call[field.replace("_duration", "_ms")] = round(value / 1e6, 1) if value else None
+            call["prompt_eval_count"] = response.get('prompt_eval_count') or 0
+            call["eval_count"] = response.get('eval_count') or 0
+            if call.get("eval_ms"):
+                call["tokens_per_s"] = round(call["eval_count"] / (call["eval_ms"] / 1000), 1)
+            if call.get("prompt_eval_ms"):
+                call["prompt_tokens_per_s"] = round(call["prompt_eval_count"] / (call["prompt_eval_ms"] / 1000), 1)
+            if call["ttft_ms"] is None:
+                call["ttft_ms"] = call["wall_ms"]
+            self.residency.record_load(self.model_name, call.get("load_ms"))
+        print(f"🧮 {self.model_name}: {describe_call(call)}")
 
     async def check_connection(self) -> bool:
         try:
@@ -1,124 +1,300 @@
-import os
 import uuid
-from typing import List, Dict, Any
-import chromadb
-from chromadb.utils import embedding_functions
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional, Callable
 
-# ChromaDB ve Model Ayarları
-VECTOR_DB_PATH = os.path.join(os.getcwd(), "data", "vector_store")
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+from backend.core import resources
+from backend.core.embeddings import EMBEDDING_BATCH_SIZE
+from backend.core.lexical import reciprocal_rank_fusion
+from backend.core.reranker import RERANKER_ENABLED, RERANK_OVERFETCH
+
+# Tüm sohbetlerin erişebildiği kalıcı bilgi tabanı
+SHARED_COLLECTION = "shared_knowledge"
+# DB kaydı olmayan oturumların geçici koleksiyonları (resume edilemez, oturum bitince silinir)
+SESSION_COLLECTION_PREFIX = "session_"
+
+# Hibrit aramada her yöntemden (dense / BM25) çekilecek aday sayısı: max(n_results * çarpan, taban)
+HYBRID_CANDIDATE_FACTOR = 4
+HYBRID_MIN_CANDIDATES = 10
 
 class RAGManager:
-    def __init__(self):
-        print(f"🧠 RAG Manager Başlatılıyor ({VECTOR_DB_PATH})...")
-        
-        # Klasör yoksa oluştur
-        os.makedirs(VECTOR_DB_PATH, exist_ok=True)
-        
-        # ChromaDB Client (Persistent)
-        self.client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
-        
-        # Embedding Function (Sentence-Transformers kullanıyoruz, hafif ve hızlı)
-        # ChromaDB'nin built-in fonksiyonu yerine manuel yönetmek daha stabil sonuç veriyor bazen,
-        # ama burada Chroma'nın utility'sini kullanmak en kolayı.
-        self.ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL_NAME)
-        
-        # Koleksiyonu al veya yarat
-        self.collection = self.client.get_or_create_collection(
-            name="local_knowledge",
-            embedding_function=self.ef
+    def __init__(self, conversation_id: Optional[int] = None, include_shared: bool = True):
+        """
+        Her sohbet kendi koleksiyonunu (namespace) kullanır; böylece eşzamanlı
+        oturumlar birbirinin indeksini silmez ve search() sadece ilgili
+        vektörleri tarar.
+
+        Args:
+            conversation_id: Database'deki sohbet id'si. None ise oturuma özel geçici namespace açılır.
+            include_shared: True ise aramalara ortak bilgi tabanı da dahil edilir.
+        """
+        # ChromaDB Client (Persistent) ve Embedding Function süreç başına bir kez
+        # yüklenir; bu nesne sadece paylaşılan kaynaklar üzerinde bir tutamaçtır.
+        self.client = resources.get_vector_client()
+        self.embedder = resources.get_embedder()
+        self.chunker = resources.get_chunker()
+        self.cache = resources.get_retrieval_cache()
+
+        self.conversation_id = conversation_id
+        self.include_shared = include_shared
+        self.collection_name = self.collection_name_for(conversation_id)
+
+        # Koleksiyon ilk add_document'ta oluşturulur; doküman eklenmeyen sohbetler
+        # Chroma'da boş koleksiyon bırakmaz (resume edilen sohbette mevcut olan açılır)
+        self.collection = None
+
+    @staticmethod
+    def collection_name_for(conversation_id: Optional[int]) -> str:
+        if conversation_id:
+            return f"conv_{conversation_id}"
+        # DB kaydı yoksa sohbeti başkasıyla karıştırmamak için geçici namespace
+        return f"{SESSION_COLLECTION_PREFIX}{uuid.uuid4().hex[:12]}"
+
+    def _get_collection(self, name: str):
+        # Vektörler her zaman embedder ile hazır verilir; Chroma kendi modelini yüklemez
+        return self.client.get_or_create_collection(
+            name=name,
+            embedding_function=None
         )
 
-    def add_document(self, text: str, source: str):
+    def _open_collection(self, name: str):
+        """Var olan koleksiyonu döner; yoksa oluşturmadan None döner."""
+        try:
+            return self.client.get_collection(name=name, embedding_function=None)
+        except Exception:
+            return None
+
+    def _own_collection(self, create: bool = False):
+        """Sohbet koleksiyonu. create=False iken henüz yoksa None."""
+        if self.collection is None:
+            if create:
+                self.collection = self._get_collection(self.collection_name)
+            else:
+                self.collection = self._open_collection(self.collection_name)
+        return self.collection
+
+    def add_document(
+        self,
+        text: str,
+        source: str,
+        shared: bool = False,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ):
         """
         Metni parçalara (chunk) ayırır ve Vektör DB'ye ekler.
+        shared=True ise sohbet yerine ortak bilgi tabanına yazılır.
+        progress(done, total) her embedding grubundan sonra çağrılır.
         """
-        chunks = self._split_text(text)
-        
+        chunks, embeddings = self._chunk_and_embed(text, progress)
+
         if not chunks:
             return 0
-            
+
+        collection = self._get_collection(SHARED_COLLECTION) if shared else self._own_collection(create=True)
         ids = [str(uuid.uuid4()) for _ in chunks]
-        metadatas = [{"source": source} for _ in chunks]
-        
-        # DB'ye ekle
-        self.collection.add(
-            documents=chunks,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print(f"📚 {len(chunks)} parça hafızaya eklendi: {source}")
+        metadatas = [
+            {"source": source, "conversation_id": self.conversation_id or 0}
+            for _ in chunks
+        ]
+
+        # Lexical indeks eklemeden önce alınır (ilk erişimde Chroma'dan kurulurken yeni parçaları iki kez saymasın)
+        lexical = resources.get_lexical_index(collection)
+
+        # DB'ye dilimler halinde ekle: Chroma max_batch_size'ı aşan tek bir add'i reddeder
+        step = min(EMBEDDING_BATCH_SIZE, self._max_batch_size())
+        try:
+            for start in range(0, len(chunks), step):
+                end = start + step
+                collection.add(
+                    documents=chunks[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end]
+                )
+                # BM25 indeksi sadece Chroma'ya yazılmış dilimleri içerir
+                lexical.add(ids[start:end], chunks[start:end], [source] * len(chunks[start:end]))
+        finally:
+            self.cache.bump(collection.name)
+        print(f"📚 {len(chunks)} parça hafızaya eklendi: {source} ({collection.name})")
         return len(chunks)
 
-    def search(self, query: str, n_results: int = 3) -> List[str]:
+    def _max_batch_size(self) -> int:
+        # Chroma sürümüne göre metot veya property; bilinmiyorsa sınır yok sayılır
+        getter = getattr(self.client, "get_max_batch_size", None)
+        if callable(getter):
+            return getter()
+        return getattr(self.client, "max_batch_size", None) or EMBEDDING_BATCH_SIZE
+
+    def has_source(self, source: str) -> bool:
+        """Bu kaynaktan (dosya adı / URL) sohbet koleksiyonunda parça var mı?"""
+        collection = self._own_collection()
+        if collection is None:
+            return False
+        try:
+            found = collection.get(where={"source": source}, limit=1, include=[])
+        except Exception:
+            return False
+        return bool(found and found.get("ids"))
+
+    def _chunk_and_embed(self, text: str, progress: Optional[Callable[[int, int], None]] = None):
+        """
+        Metni parçalar ve embedding'leri hesaplar. Aynı metin daha önce
+        işlendiyse chunk'lar ve vektörler disk önbelleğinden gelir.
+        """
+        if not text:
+            return [], []
+
+        cache = resources.get_ingestion_cache()
+        cache_key = cache.chunks_key(text, self.chunker.config_key, self.embedder.config_key)
+        cached = cache.get_chunks(cache_key)
+        if cached is not None:
+            if progress:
+                progress(len(cached["chunks"]), len(cached["chunks"]))
+            return cached["chunks"], cached["embeddings"]
+
+        chunks = self._split_text(text)
+        if not chunks:
+            return [], []
+
+        embeddings = self.embedder.embed(chunks, progress=progress)
+        cache.put_chunks(cache_key, chunks, embeddings)
+        return chunks, embeddings
+
+    def _query_collection(self, collection, query_embedding: List[float], n_results: int) -> List[Dict[str, Any]]:
+        count = collection.count()
+        if count == 0:
+            return []
+
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(n_results, count)
+        )
+        if not results or not results['documents']:
+            return []
+
+        ids = results['ids'][0]
+        documents = results['documents'][0]
+        metadatas = (results.get('metadatas') or [[]])[0] or [{}] * len(ids)
+        distances = (results.get('distances') or [[]])[0] or [0.0] * len(ids)
+        return [
+            {"id": doc_id, "document": doc, "source": (meta or {}).get("source", ""), "distance": dist}
+            for doc_id, doc, meta, dist in zip(ids, documents, metadatas, distances)
+        ]
+
+    def _collections(self) -> List[Any]:
+        # Sadece var olan koleksiyonlar taranır (arama yüzünden koleksiyon oluşturulmaz)
+        collections = [self._own_collection()]
+        if self.include_shared:
+            collections.append(self._open_collection(SHARED_COLLECTION))
+        return [collection for collection in collections if collection is not None]
+
+    def _embed_query(self, query: str) -> List[float]:
+        key = self.cache.embedding_key(query, self.embedder.config_key)
+        embedding = self.cache.embeddings.get(key)
+        if embedding is None:
+            embedding = self.embedder.embed_query(query)
+            self.cache.embeddings.set(key, embedding)
+        return embedding
+
+    def search_hits(self, query: str, n_results: int = 3) -> List[Dict[str, Any]]:
+        """
+        Dense (Chroma) ve lexical (BM25) sonuçlarını Reciprocal Rank Fusion ile
+        birleştirir. {"id", "document", "source", "score"} listesi döner.
+        """
+        candidates = max(n_results * HYBRID_CANDIDATE_FACTOR, HYBRID_MIN_CANDIDATES)
+        collections = self._collections()
+
+        # 1. Dense: sorgu bir kez embed edilir, tüm namespace'lerde aynı vektör kullanılır
+        query_embedding = self._embed_query(query)
+        dense = []
+        for collection in collections:
+            dense.extend(self._query_collection(collection, query_embedding, candidates))
+        dense.sort(key=lambda hit: hit["distance"])
+
+        # 2. Lexical: kodlar, sayılar, tam tanımlayıcılar
+        lexical = []
+        for collection in collections:
+            index = resources.get_lexical_index(collection)
+            lexical.extend((score, index.hit(idx)) for idx, score in index.search(query, candidates))
+        lexical.sort(key=lambda item: item[0], reverse=True)
+
+        # 3. Rank fusion
+        by_id = {hit["id"]: hit for _, hit in lexical}
+        by_id.update({hit["id"]: hit for hit in dense})
+        fused = reciprocal_rank_fusion([
+            [hit["id"] for hit in dense],
+            [hit["id"] for _, hit in lexical],
+        ])
+        return [
+            {"id": doc_id, "document": by_id[doc_id]["document"], "source": by_id[doc_id]["source"], "score": score}
+            for doc_id, score in fused[:n_results]
+        ]
+
+    def search(self, query: str, n_results: int = 3, rerank: Optional[bool] = None) -> List[str]:
         """
         Sorgu ile en alakalı metin parçalarını getirir.
+        Sohbet koleksiyonu ve (açıksa) ortak bilgi tabanı birlikte taranır.
+
+        rerank: None ise RERANKER_ENABLED ayarı kullanılır. Açıkken fazladan
+        aday çekilip cross-encoder ile yeniden sıralanır; eşik altı parçalar
+        atıldığı için n_results'tan az sonuç dönebilir.
         """
+        if rerank is None:
+            rerank = RERANKER_ENABLED
         try:
-            # Koleksiyonun varlığını ve geçerliliğini kontrol et
-            if not hasattr(self, "collection") or self.collection is None:
-                self.collection = self.client.get_or_create_collection(
-                    name="local_knowledge",
-                    embedding_function=self.ef
-                )
+            collections = self._collections()
+            if not collections:
+                return []
+            # Aynı sorgu + aynı koleksiyon sürümleri -> Chroma'ya hiç gitme
+            collection_names = [collection.name for collection in collections]
+            cache_key = self.cache.result_key(query, n_results, collection_names, rerank=rerank)
+            cached = self.cache.results.get(cache_key)
+            if cached is not None:
+                return list(cached)
 
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
-            
-            if results and results['documents']:
-                return results['documents'][0]
+            if rerank:
+                candidates = self.search_hits(query, n_results * RERANK_OVERFETCH)
+                hits = resources.get_reranker().rerank(query, candidates, n_results)
+            else:
+                hits = self.search_hits(query, n_results)
+            documents = [hit["document"] for hit in hits]
+            self.cache.results.set(cache_key, documents)
+            return list(documents)
         except Exception as e:
             print(f"⚠️ RAG Search Hatası: {e}")
-            # Hata durumunda koleksiyonu yenilemeyi dene
-            try:
-                self.collection = self.client.get_or_create_collection(
-                    name="local_knowledge",
-                    embedding_function=self.ef
-                )
-            except:
-                pass
+            # Hata durumunda koleksiyon bir sonraki erişimde yeniden açılır
+            self.collection = None
         return []
 
-    def _split_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    def _split_text(self, text: str) -> List[str]:
         """
-        Basit ama etkili bir chunking (parçalama) algoritması.
-        RecursiveCharacterTextSplitter mantığına benzer.
+        Markdown yapısına (başlık, tablo, liste) ve embedding modelinin
+        token limitine göre parçalar; bkz. backend/core/chunking.py.
         """
-        if not text:
-            return []
-            
-        chunks = []
-        start = 0
-        text_len = len(text)
-        
-        while start < text_len:
-            end = start + chunk_size
-            
-            # Eğer sona gelmediysek ve kelime ortasındaysak, en yakın boşluğa geri git
-            if end < text_len:
-                # Geriye doğru boşluk ara
-                while end > start and text[end] not in [' ', '\n', '.', ',']:
-                    end -= 1
-                # Eğer hiç boşluk bulamazsa mecburen chunk_size kadar kes (kelime çok uzunsa)
-                if end == start:
-                    end = start + chunk_size
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            # Overlap (örtüşme) payı ile bir sonraki parçaya geç
-            start = end - overlap
-            
-        return chunks
+        return self.chunker.split(text)
 
     def clear_memory(self):
-        """Hafızayı temizler (Yeni sohbet için opsiyonel)."""
-        self.client.delete_collection("local_knowledge")
-        self.collection = self.client.get_or_create_collection(
-            name="local_knowledge",
-            embedding_function=self.ef
-        )
+        """Sadece bu sohbetin hafızasını temizler (diğer oturumlar etkilenmez)."""
+        try:
+            self.client.delete_collection(self.collection_name)
+        except Exception:
+            pass
+        resources.drop_lexical_index(self.collection_name)
+        self.cache.bump(self.collection_name)
+        self.collection = None
+
+    def release(self):
+        """
+        Sohbet kapanırken çağrılır: bellekteki BM25 indeksi bırakılır; boş kalan
+        sohbet koleksiyonu ve (hiçbir zaman resume edilemeyen) geçici oturum
+        koleksiyonu silinir. Doküman içeren sohbet koleksiyonu resume için korunur.
+        """
+        resources.drop_lexical_index(self.collection_name)
+        collection = self._own_collection()
+        if collection is None:
+            return
+        try:
+            if self.collection_name.startswith(SESSION_COLLECTION_PREFIX) or collection.count() == 0:
+                self.client.delete_collection(self.collection_name)
+                self.cache.bump(self.collection_name)
+                self.collection = None
+        except Exception as e:
+            print(f"⚠️ Koleksiyon silinemedi ({self.collection_name}): {e}")
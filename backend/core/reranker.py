@@ -0,0 +1,68 @@
+"""
+İsteğe bağlı CPU cross-encoder yeniden sıralayıcı (reranker).
+
+Hibrit aramadan fazladan aday çekilir (over-fetch), cross-encoder her
+(sorgu, parça) çiftini puanlar, eşiğin altındakiler atılır. Böylece LLM'e
+daha az ama daha alakalı parça gider ve prompt değerlendirmesi ucuzlar.
+Puanlar (sorgu, chunk id) başına önbelleklenir.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, List
+
+from backend.core.lru import LRUCache
+
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "0") == "1"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Reranker açıkken n_results * RERANK_OVERFETCH aday puanlanır
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "4"))
+# ms-marco cross-encoder'ları logit döner; 0 civarı "belirsiz", negatifler alakasız
+RERANK_THRESHOLD = float(os.getenv("RERANK_THRESHOLD", "-1.0"))
+RERANK_CACHE_SIZE = 8192
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str = RERANKER_MODEL, threshold: float = RERANK_THRESHOLD) -> None:
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.threshold = threshold
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.scores = LRUCache(RERANK_CACHE_SIZE, name="rerank_scores")
+        print(f"🎯 Reranker Hazır: {model_name}")
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+        """Adayları puanlar, eşik altını atar ve en iyi n_results tanesini döner."""
+        if not hits:
+            return []
+
+        started = time.perf_counter()
+        query_key = " ".join(query.lower().split())
+        scores: Dict[str, float] = {}
+        missing = []
+        for hit in hits:
+            cached = self.scores.get((query_key, hit["id"]))
+            if cached is None:
+                missing.append(hit)
+            else:
+                scores[hit["id"]] = cached
+
+        if missing:
+            predicted = self.model.predict([(query, hit["document"]) for hit in missing], show_progress_bar=False)
+            for hit, score in zip(missing, predicted):
+                scores[hit["id"]] = float(score)
+                self.scores.set((query_key, hit["id"]), float(score))
+
+        ranked = sorted(hits, key=lambda hit: scores[hit["id"]], reverse=True)
+        kept = [
+            dict(hit, rerank_score=scores[hit["id"]])
+            for hit in ranked
+            if scores[hit["id"]] >= self.threshold
+        ][:n_results]
+
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"🎯 Rerank: {len(hits)} aday -> {len(kept)} parça ({len(missing)} yeni puan, {elapsed:.0f}ms)")
+        return kept
@@ -0,0 +1,202 @@
+"""
+Sohbet ve vision modellerinin bellekte kalma (residency) yöneticisi.
+
+Vision modeli eskiden keep_alive=0 ile her resim sorusunda yüklenip
+boşaltılıyordu; ana modelle de koordine edilmediği için bir resim turu iki
+soğuk yükleme ödeyebiliyordu. Yönetici her modelin bellek ihtiyacını
+(ollama list boyutu x MODEL_MEMORY_OVERHEAD) bilir ve RAM bütçesine sığan
+modellerin kalıcı tutulmasına karar verir:
+
+- Sabitlenen (pinned) sohbet modeli önce yerleşir, kalan bütçe en son
+  kullanılan modellere verilir.
+- Bütçeye sığmayan modeller keep_alive=0 alır (iş bitince boşalır) ve bu
+  karar loglanır.
+- Resim yüklendiğinde vision modeli soru gelmeden önceden yüklenir.
+- Ollama'nın load_duration değerleri model başına toplanır.
+
+MODEL_KEEP_ALIVE ile açıkça verilen değerler her zaman kararın önündedir.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Union
+
+from backend.core.model_client import DEFAULT_KEEP_ALIVE, MODEL_KEEP_ALIVE, keep_alive_for
+from backend.core.scheduler import BACKGROUND
+
+# Model ağırlıkları + KV cache / runtime payı
+MODEL_MEMORY_OVERHEAD = float(os.getenv("MODEL_MEMORY_OVERHEAD", "1.25"))
+# Boyut bilgisi bu kadar saniyeden eskiyse yeniden sorulur
+SIZE_REFRESH_SECONDS = 300.0
+# Bundan uzun load_duration soğuk yükleme sayılır
+COLD_LOAD_MS = 500.0
+
+
+def _default_ram_budget() -> int:
+    configured = os.getenv("MODEL_RAM_BUDGET_GB")
+    if configured:
+        return int(float(configured) * 1024 ** 3)
+    try:
+        # Ayar yoksa fiziksel belleğin %60'ı (uygulama ve OS'e pay kalsın)
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.6)
+    except (ValueError, OSError, AttributeError):
+        return 8 * 1024 ** 3
+
+
+class ModelResidencyManager:
+    def __init__(self, client=None, ram_budget: Optional[int] = None) -> None:
+        self._client = client
+        self.ram_budget = ram_budget if ram_budget is not None else _default_ram_budget()
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self._resident: Dict[str, bool] = {}
+        self._sizes_at = 0.0
+        self._preloading: Dict[str, asyncio.Task] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from backend.core import resources
+
+            self._client = resources.get_ollama_client()
+        return self._client
+
+    def register(self, model_name: str, pinned: bool = False) -> None:
+        """Yönetilecek modeli ekler (tekrar çağrılabilir)."""
+        info = self.models.setdefault(model_name, {
+            "pinned": False,
+            "size_bytes": None,
+            "last_used": 0.0,
+            "loads": 0,
+            "cold_loads": 0,
+            "load_ms": [],
+        })
+        info["pinned"] = info["pinned"] or pinned
+        self._plan()
+
+    async def refresh_sizes(self, force: bool = False) -> None:
+        """Model boyutlarını ollama list'ten okur (SIZE_REFRESH_SECONDS boyunca önbellekli)."""
+        if not force and time.time() - self._sizes_at < SIZE_REFRESH_SECONDS:
+            return
+        try:
+            response = await self.client.list()
+        except Exception as e:
+            print(f"⚠️ Model boyutları okunamadı: {e}")
+            return
+        for item in response.get("models") or []:
+            name = item.get("model") or item.get("name")
+            if name in self.models and item.get("size"):
+                self.models[name]["size_bytes"] = int(item["size"] * MODEL_MEMORY_OVERHEAD)
+        self._sizes_at = time.time()
+        self._plan()
+
+    def _plan(self) -> None:
+        """Bütçeye hangi modellerin sığacağına karar verir; değişen kararları loglar."""
+        ordered = sorted(self.models.items(), key=lambda item: (not item[1]["pinned"], -item[1]["last_used"]))
+        used = 0
+        for name, info in ordered:
+            size = info["size_bytes"]
+            # Boyutu bilinmeyen model (list okunamadı): sadece sabitlenmiş sohbet modeli kalıcı sayılır
+            resident = used + size <= self.ram_budget if size is not None else info["pinned"]
+            if resident and size is not None:
+                used += size
+            if self._resident.get(name) != resident:
+                self._resident[name] = resident
+                reason = (
+                    f"{size / 1024 ** 3:.1f} GB, toplam {used / 1024 ** 3:.1f}/{self.ram_budget / 1024 ** 3:.1f} GB"
+                    if size is not None else "boyut bilinmiyor"
+                )
+                self.decisions.append({"time": time.time(), "model": name, "resident": resident, "reason": reason})
+                print(f"📦 Residency: {name} -> {'kalıcı' if resident else 'iş bitince boşalt'} ({reason})")
+
+    def keep_alive(self, model_name: str) -> Union[str, int]:
+        """Modelin bir sonraki çağrıda kullanacağı keep_alive değeri."""
+        if model_name in MODEL_KEEP_ALIVE:
+            return keep_alive_for(model_name)
+        if model_name not in self.models:
+            return keep_alive_for(model_name)
+        return DEFAULT_KEEP_ALIVE if self._resident.get(model_name) else 0
+
+    def touch(self, model_name: str) -> None:
+        """Model kullanıldı: bütçe taşarsa en son kullanılanlar tercih edilir."""
+        if model_name in self.models:
+            self.models[model_name]["last_used"] = time.time()
+            self._plan()
+
+    def record_load(self, model_name: str, load_ms: Optional[float]) -> None:
+        """Ollama'nın load_duration değerini kaydeder; soğuk yüklemeleri loglar."""
+        if model_name not in self.models or load_ms is None:
+            return
+        info = self.models[model_name]
+        info["loads"] += 1
+        info["load_ms"] = (info["load_ms"] + [load_ms])[-100:]
+        if load_ms >= COLD_LOAD_MS:
+            info["cold_loads"] += 1
+            print(f"🥶 {model_name} soğuk yüklendi: {load_ms / 1000:.1f}s")
+
+    def preload(self, model_name: str, session_id: str = "default") -> Optional[asyncio.Task]:
+        """Modeli arka planda belleğe alır (boş prompt). Zaten yükleniyorsa aynı görevi döner."""
+        task = self._preloading.get(model_name)
+        if task and not task.done():
+            return task
+        task = asyncio.create_task(self._preload(model_name, session_id))
+        self._preloading[model_name] = task
+        return task
+
+    async def _preload(self, model_name: str, session_id: str = "default") -> None:
+        self.register(model_name)
+        await self.refresh_sizes()
+        self.touch(model_name)
+        if self.keep_alive(model_name) == 0:
+            # Bütçeye sığmıyor: yüklesek de hemen boşalır, asıl istekte yüklenecek
+            print(f"📦 {model_name} önceden yüklenmedi (RAM bütçesine sığmıyor)")
+            return
+        from backend.core import resources
+
+        started = time.perf_counter()
+        try:
+            # Boş prompt sadece modeli yükler; yükleme de Ollama'yı meşgul ettiği için zamanlayıcıdan
+            # arka plan önceliğiyle geçer (etkileşimli üretimin ortasında sohbet modelini boşaltmasın)
+            async with resources.get_llm_scheduler().slot(session_id, BACKGROUND, model_name):
+                response = await self.client.generate(model=model_name, prompt="", keep_alive=self.keep_alive(model_name))
+        except Exception as e:
+            print(f"⚠️ {model_name} önceden yüklenemedi: {e}")
+            return
+        load_ms = (response.get("load_duration") or 0) / 1e6
+        self.record_load(model_name, load_ms)
+        print(f"📦 {model_name} önceden yüklendi ({(time.perf_counter() - started) * 1000:.0f}ms, load {load_ms:.0f}ms)")
+
+    async def resident_now(self) -> List[Dict[str, Any]]:
+        """Ollama'da şu an yüklü modeller (ollama ps)."""
+        try:
+            response = await self.client.ps()
+        except Exception:
+            return []
+        return [
+            {"model": item.get("model") or item.get("name"), "size_bytes": item.get("size"), "expires_at": str(item.get("expires_at"))}
+            for item in response.get("models") or []
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for name, info in self.models.items():
+            loads = sorted(info["load_ms"])
+            models[name] = {
+                "pinned": info["pinned"],
+                "size_gb": round(info["size_bytes"] / 1024 ** 3, 2) if info["size_bytes"] else None,
+                "resident": self._resident.get(name, False),
+                "keep_alive": self.keep_alive(name),
+                "loads": info["loads"],
+                "cold_loads": info["cold_loads"],
+                "load_ms_p50": loads[len(loads) // 2] if loads else None,
+                "load_ms_max": loads[-1] if loads else None,
+            }
+        return {
+            "ram_budget_gb": round(self.ram_budget / 1024 ** 3, 2),
+            "models": models,
+            "decisions": list(self.decisions),
+        }
@@ -0,0 +1,321 @@
+"""
+Süreç genelinde paylaşılan kaynak havuzu.
+
+Embedding modeli, parser motorları, ollama client'ı ve veritabanı bağlantısı
+her tarayıcı oturumunda yeniden kurulmak yerine süreç başına bir kez, ilk
+ihtiyaç anında (lazy) yüklenir. Oturum nesneleri (ModelClient, RAGManager)
+bu havuzun üzerinde ince birer tutamaçtır.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List
+
+VECTOR_DB_PATH = os.path.join(os.getcwd(), "data", "vector_store")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# Bellekte tutulan sohbet BM25 indeksi sayısı; en uzun süredir kullanılmayan atılır
+# (tekrar gerekirse Chroma'dan yeniden kurulur)
+LEXICAL_MAX_INDEXES = int(os.getenv("LEXICAL_MAX_INDEXES", "16"))
+
+
+class ResourcePool:
+    """Thread-safe, lazy kaynak kayıt defteri."""
+
+    def __init__(self) -> None:
+        self._resources: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self.load_times: Dict[str, float] = {}
+        self.load_count = 0
+        self.session_starts: Dict[str, List[float]] = {"cold": [], "warm": []}
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._registry_lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def get(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Kaynağı döner; yoksa factory ile bir kez oluşturur."""
+        resource = self._resources.get(key)
+        if resource is not None:
+            return resource
+
+        # Her kaynak kendi kilidine sahip: embedding modeli yüklenirken
+        # parser motorlarını bekleyen oturum bloklanmaz.
+        with self._lock_for(key):
+            if key not in self._resources:
+                started = time.perf_counter()
+                self._resources[key] = factory()
+                elapsed = time.perf_counter() - started
+                self.load_times[key] = elapsed
+                self.load_count += 1
+                print(f"♻️ Paylaşılan kaynak yüklendi: {key} ({elapsed:.2f}s)")
+            return self._resources[key]
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._resources
+
+    def discard(self, key: str) -> None:
+        """Kaynağı havuzdan çıkarır; bir sonraki get() yeniden oluşturur."""
+        with self._lock_for(key):
+            self._resources.pop(key, None)
+
+    @contextlib.contextmanager
+    def track_session_start(self) -> Iterator[None]:
+        """
+        Oturum başlangıç süresini ölçer. Bu sürede havuz yeni bir kaynak
+        yüklediyse başlangıç 'cold', yüklemediyse 'warm' sayılır.
+        """
+        loads_before = self.load_count
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            kind = "cold" if self.load_count > loads_before else "warm"
+            self.session_starts[kind].append(elapsed)
+            print(f"⏱️ Oturum başlangıcı ({kind}): {elapsed:.3f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        def _avg(values: List[float]) -> float:
+            return sum(values) / len(values) if values else 0.0
+
+        return {
+            "loaded": sorted(self._resources),
+            "load_times": dict(self.load_times),
+            "cold_starts": len(self.session_starts["cold"]),
+            "warm_starts": len(self.session_starts["warm"]),
+            "avg_cold_start": _avg(self.session_starts["cold"]),
+            "avg_warm_start": _avg(self.session_starts["warm"]),
+        }
+
+
+POOL = ResourcePool()
+
+
+# --- Kaynak fabrikaları ---
+
+def _create_vector_client():
+    import chromadb
+
+    os.makedirs(VECTOR_DB_PATH, exist_ok=True)
+    return chromadb.PersistentClient(path=VECTOR_DB_PATH)
+
+
+def _create_embedder():
+    from backend.core.embeddings import EmbeddingBackend
+
+    return EmbeddingBackend(EMBEDDING_MODEL_NAME)
+
+
+def _create_chunker():
+    from backend.core.chunking import MarkdownChunker, make_token_counter
+
+    # Parçalar embedding modelinin kendi tokenizer'ı ile ölçülür
+    try:
+        tokenizer = get_embedder().tokenizer
+        return MarkdownChunker(make_token_counter(tokenizer), counter_name=EMBEDDING_MODEL_NAME)
+    except Exception as e:
+        print(f"⚠️ Tokenizer yüklenemedi ({e}), yaklaşık token sayımı kullanılıyor.")
+        return MarkdownChunker()
+
+
+def _build_lexical_index(collection):
+    from backend.core.lexical import BM25Index
+
+    # Süreç yeniden başladıysa indeks Chroma'daki kalıcı dokümanlardan kurulur
+    index = BM25Index()
+    page_size, offset = 5000, 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        sources = [(meta or {}).get("source", "") for meta in page.get("metadatas") or [{}] * len(ids)]
+        index.add(ids, page.get("documents") or [""] * len(ids), sources)
+        offset += len(ids)
+    return index
+
+
+def _create_reranker():
+    from backend.core.reranker import CrossEncoderReranker
+
+    return CrossEncoderReranker()
+
+
+def _create_retrieval_cache():
+    from backend.core.retrieval_cache import RetrievalCache
+
+    return RetrievalCache()
+
+
+def _create_ingestor():
+    from backend.ingestion.ingestor import UniversalIngestor
+
+    return UniversalIngestor()
+
+
+def _create_ingestion_cache():
+    from backend.ingestion.cache import IngestionCache
+
+    return IngestionCache()
+
+
+def _create_ingestion_jobs():
+    from backend.ingestion.jobs import IngestionJobManager
+
+    return IngestionJobManager()
+
+
+def _create_tool_executor():
+    from backend.tools import ToolExecutor
+
+    return ToolExecutor()
+
+
+def _create_kernel_manager():
+    from backend.tools.kernels import KernelManager
+
+    return KernelManager()
+
+
+def _create_ollama_client():
+    import ollama
+
+    return ollama.AsyncClient()
+
+
+def _create_llm_scheduler():
+    from backend.core.scheduler import LLMScheduler
+
+    return LLMScheduler()
+
+
+def _create_residency_manager():
+    from backend.core.residency import ModelResidencyManager
+
+    return ModelResidencyManager()
+
+
+def _create_image_cache():
+    from backend.tools.image_preprocess import ImageCache
+
+    return ImageCache()
+
+
+def _create_llm_cache():
+    from backend.core.response_cache import LLMResponseCache
+
+    return LLMResponseCache()
+
+
+def _create_web_search():
+    # Registry'deki örnek: tek HTTP session ve arama önbelleği tüm oturumlarca paylaşılır
+    from backend.tools import get_tool
+
+    return get_tool("web_search")
+
+
+def _create_database():
+    from backend.database.db import Database
+
+    return Database()
+
+
+def get_vector_client():
+    return POOL.get("vector_client", _create_vector_client)
+
+
+def get_embedder():
+    return POOL.get("embedder", _create_embedder)
+
+
+def get_chunker():
+    return POOL.get("chunker", _create_chunker)
+
+
+_LEXICAL_RECENT: "OrderedDict[str, None]" = OrderedDict()
+_LEXICAL_LOCK = threading.Lock()
+
+
+def get_lexical_index(collection):
+    key = f"lexical:{collection.name}"
+    index = POOL.get(key, lambda: _build_lexical_index(collection))
+    with _LEXICAL_LOCK:
+        _LEXICAL_RECENT[key] = None
+        _LEXICAL_RECENT.move_to_end(key)
+        evicted = []
+        while len(_LEXICAL_RECENT) > LEXICAL_MAX_INDEXES:
+            evicted.append(_LEXICAL_RECENT.popitem(last=False)[0])
+    for old in evicted:
+        POOL.discard(old)
+    return index
+
+
+def drop_lexical_index(collection_name: str) -> None:
+    key = f"lexical:{collection_name}"
+    with _LEXICAL_LOCK:
+        _LEXICAL_RECENT.pop(key, None)
+    POOL.discard(key)
+
+
+def get_reranker():
+    return POOL.get("reranker", _create_reranker)
+
+
+def get_retrieval_cache():
+    return POOL.get("retrieval_cache", _create_retrieval_cache)
+
+
+def get_ingestor():
+    return POOL.get("ingestor", _create_ingestor)
+
+
+def get_ingestion_cache():
+    return POOL.get("ingestion_cache", _create_ingestion_cache)
+
+
+def get_ingestion_jobs():
+    return POOL.get("ingestion_jobs", _create_ingestion_jobs)
+
+
+def get_tool_executor():
+    return POOL.get("tool_executor", _create_tool_executor)
+
+
+def get_kernel_manager():
+    return POOL.get("kernel_manager", _create_kernel_manager)
+
+
+def get_ollama_client():
+    return POOL.get("ollama_client", _create_ollama_client)
+
+
+def get_llm_scheduler():
+    return POOL.get("llm_scheduler", _create_llm_scheduler)
+
+
+def get_residency_manager():
+    return POOL.get("residency_manager", _create_residency_manager)
+
+
+def get_image_cache():
+    return POOL.get("image_cache", _create_image_cache)
+
+
+def get_llm_cache():
+    return POOL.get("llm_cache", _create_llm_cache)
+
+
+def get_web_search():
+    return POOL.get("web_search", _create_web_search)
+
+
+def get_database():
+    return POOL.get("database", _create_database)
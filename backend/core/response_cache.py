@@ -0,0 +1,56 @@
+"""
+Deterministik LLM çağrıları için birebir eşleşen (exact-match) yanıt önbelleği.
+
+Aynı dokümanlar üzerinde aynı soru tekrar sorulduğunda ajan aynı karar
+adımlarını yeniden çalıştırır. Temperature 0'da çıktı (model, mesajlar,
+seçenekler, format) ile belirlendiği için yanıt diskte saklanır ve tekrar
+istekte model hiç çağrılmaz; model diğer oturumlara kalır.
+
+LLM_CACHE: "auto" (varsayılan, sadece temperature 0), "1" (her zaman), "0" (kapalı)
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+from backend.core.disk_cache import DiskCache, make_key
+
+CACHE_DIR = os.path.join(os.getcwd(), "data", "cache", "llm")
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_HOURS", "24")) * 3600
+LLM_CACHE_MODE = os.getenv("LLM_CACHE", "auto").lower()
+
+
+def cache_enabled(temperature: float, mode: str = LLM_CACHE_MODE) -> bool:
+    if mode in ("1", "true", "on"):
+        return True
+    if mode in ("0", "false", "off"):
+        return False
+    return temperature == 0
+
+
+class LLMResponseCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL_SECONDS):
+        self.store = DiskCache(root, max_bytes=max_bytes, ttl=ttl, name="llm_responses")
+
+    def key(self, model: str, messages: List[Dict[str, Any]], options: Dict[str, Any], format_param: Optional[str]) -> str:
+        return make_key("chat", model, messages, options, format_param)
+
+    def get(self, key: str, allow_partial: bool = False) -> Optional[str]:
+        """
+        Kayıtlı yanıtı döner. Stream'i tüketici erken kapattıysa (ör. tool
+        kararı yakalandı) kayıt yalnızca o öneki içerir; bunlar sadece
+        allow_partial ile (aynı stream tüketicisine) verilir.
+        """
+        record = self.store.get(key)
+        if not record or (not record.get("complete") and not allow_partial):
+            return None
+        return record.get("content")
+
+    def put(self, key: str, content: str, complete: bool = True) -> None:
+        if content:
+            self.store.set(key, {"content": content, "complete": complete})
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
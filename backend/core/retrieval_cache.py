@@ -0,0 +1,61 @@
+"""
+Sorgu embedding'leri ve search() sonuçları için bellek içi önbellek.
+
+Kullanıcı aynı soruyu tekrarladığında (veya retry'da küçük büyük harf /
+boşluk / noktalama farkıyla yeniden sorduğunda) sorgu tekrar embed
+edilmez ve Chroma tekrar sorgulanmaz. Sonuç anahtarına aranan
+koleksiyonların sürümleri girer; add_document / clear_memory sürümü
+artırdığı için eski sonuçlar kendiliğinden geçersiz olur.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Dict, Hashable, Iterable, Tuple
+
+from backend.core.lru import LRUCache
+
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+SEARCH_RESULT_CACHE_SIZE = 1024
+
+_EDGE_PUNCTUATION_RE = re.compile(r"^[\W_]+|[\W_]+$", re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """Küçük harf, tek boşluk, baştaki/sondaki noktalama atılmış sorgu."""
+    collapsed = " ".join(query.lower().split())
+    return _EDGE_PUNCTUATION_RE.sub("", collapsed) or collapsed
+
+
+class RetrievalCache:
+    def __init__(
+        self,
+        embedding_items: int = QUERY_EMBEDDING_CACHE_SIZE,
+        result_items: int = SEARCH_RESULT_CACHE_SIZE,
+    ) -> None:
+        self.embeddings = LRUCache(embedding_items, name="query_embeddings")
+        self.results = LRUCache(result_items, name="search_results")
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, collection_name: str) -> int:
+        return self._versions.get(collection_name, 0)
+
+    def bump(self, collection_name: str) -> None:
+        """Koleksiyon değişti: bu koleksiyonu içeren tüm sonuç anahtarları artık eşleşmez."""
+        with self._lock:
+            self._versions[collection_name] = self._versions.get(collection_name, 0) + 1
+
+    def embedding_key(self, query: str, embedder_key: str) -> Tuple[str, str]:
+        return (embedder_key, normalize_query(query))
+
+    def result_key(self, query: str, n_results: int, collection_names: Iterable[str], **options: Any) -> Hashable:
+        versions = tuple((name, self.version(name)) for name in collection_names)
+        return (normalize_query(query), n_results, versions, tuple(sorted(options.items())))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "query_embeddings": self.embeddings.stats(),
+            "search_results": self.results.stats(),
+        }
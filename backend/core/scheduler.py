@@ -0,0 +1,184 @@
+"""
+Süreç genelinde Ollama istek zamanlayıcısı.
+
+Oturumlar isteklerini koordinasyonsuz gönderince Ollama hepsini FIFO
+sıraya koyar ve etkileşimli turlar uzun arka plan üretimlerinin arkasında
+bekler. Tüm LLM ve vision çağrıları buradan geçer:
+
+- Aynı anda en fazla LLM_MAX_IN_FLIGHT istek Ollama'ya gider.
+- Öncelik sınıfları: INTERACTIVE (kullanıcının beklediği cevap / tool)
+  her zaman BACKGROUND'dan (geçmiş özetleme) önce alınır; çok bekleyen
+  arka plan işi yaşlanarak (aging) öne geçer, aç kalmaz.
+- Aynı öncelikte oturumlar arasında round-robin: bir oturumun art arda
+  istekleri diğer oturumları bekletmez.
+- Kuyruk dolunca arka plan istekleri beklemeden reddedilir (backpressure).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Ollama'nın paralel işleyebildiği istek sayısı (OLLAMA_NUM_PARALLEL ile uyumlu tutulmalı)
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "2"))
+# Bu kadar bekleyen varken yeni arka plan isteği kabul edilmez
+LLM_MAX_BACKGROUND_QUEUE = int(os.getenv("LLM_MAX_BACKGROUND_QUEUE", "8"))
+# Arka plan isteği bu kadar saniye bekledikten sonra etkileşimli gibi sıraya girer
+BACKGROUND_AGING_SECONDS = 30.0
+# Bundan uzun kuyruk beklemeleri loglanır
+SLOW_WAIT_MS = 500.0
+
+
+class SchedulerOverloaded(RuntimeError):
+    """Kuyruk dolu; istek (arka plan) kabul edilmedi."""
+
+
+class _Waiter:
+    __slots__ = ("future", "session_id", "priority", "label", "enqueued")
+
+    def __init__(self, future: asyncio.Future, session_id: str, priority: int, label: str) -> None:
+        self.future = future
+        self.session_id = session_id
+        self.priority = priority
+        self.label = label
+        self.enqueued = time.perf_counter()
+
+
+class LLMScheduler:
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT, max_background_queue: int = LLM_MAX_BACKGROUND_QUEUE) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_background_queue = max_background_queue
+        self.in_flight = 0
+        # öncelik -> (oturum -> bekleyenler); OrderedDict sırası round-robin sırasıdır
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {
+            INTERACTIVE: OrderedDict(),
+            BACKGROUND: OrderedDict(),
+        }
+        self.metrics: Dict[str, Any] = {
+            "completed": 0,
+            "rejected": 0,
+            "max_queue_depth": 0,
+            "wait_ms": {PRIORITY_NAMES[p]: [] for p in PRIORITY_NAMES},
+        }
+
+    def queue_depth(self, priority: Optional[int] = None) -> int:
+        priorities = [priority] if priority is not None else list(self._queues)
+        return sum(len(waiters) for p in priorities for waiters in self._queues[p].values())
+
+    @contextlib.asynccontextmanager
+    async def slot(self, session_id: str = "default", priority: int = INTERACTIVE, label: str = "llm") -> AsyncIterator[float]:
+        """
+        Ollama'ya istek gönderme hakkı. Kuyrukta beklenen süreyi (ms) verir.
+
+            async with scheduler.slot(session_id, INTERACTIVE, "chat") as waited_ms:
+                ...
+        """
+        waited_ms = await self._acquire(session_id, priority, label)
+        try:
+            yield waited_ms
+        finally:
+            self._release()
+
+    async def _acquire(self, session_id: str, priority: int, label: str) -> float:
+        if self.in_flight < self.max_in_flight and self.queue_depth() == 0:
+            self.in_flight += 1
+            self._record_wait(priority, 0.0)
+            return 0.0
+
+        if priority == BACKGROUND and self.queue_depth(BACKGROUND) >= self.max_background_queue:
+            self.metrics["rejected"] += 1
+            raise SchedulerOverloaded(f"LLM kuyruğu dolu ({self.queue_depth()} bekleyen), arka plan isteği reddedildi")
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), session_id, priority, label)
+        self._queues[priority].setdefault(session_id, deque()).append(waiter)
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], self.queue_depth())
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Hak verilmişti ama kullanılmadan iptal edildi: sıradakine devret
+                self._release()
+            else:
+                self._remove(waiter)
+            raise
+
+        waited_ms = (time.perf_counter() - waiter.enqueued) * 1000
+        self._record_wait(priority, waited_ms)
+        if waited_ms > SLOW_WAIT_MS:
+            print(
+                f"🚦 LLM kuyruğu: {label} ({PRIORITY_NAMES[priority]}, oturum {session_id}) "
+                f"{waited_ms:.0f}ms bekledi, kuyrukta {self.queue_depth()} istek"
+            )
+        return waited_ms
+
+    def _release(self) -> None:
+        self.metrics["completed"] += 1
+        waiter = self._next_waiter()
+        if waiter is None:
+            self.in_flight -= 1
+        else:
+            # Hak doğrudan sıradakine geçer (in_flight değişmez)
+            waiter.future.set_result(None)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        now = time.perf_counter()
+        background = self._queues[BACKGROUND]
+        # Yaşlanan arka plan işi etkileşimlilerden önce alınır
+        aged = any(waiters[0].enqueued < now - BACKGROUND_AGING_SECONDS for waiters in background.values())
+        order = [BACKGROUND, INTERACTIVE] if aged else [INTERACTIVE, BACKGROUND]
+
+        for priority in order:
+            queue = self._queues[priority]
+            while queue:
+                # Round-robin: sıradaki oturumdan bir istek al, oturumu sona taşı
+                session_id, waiters = next(iter(queue.items()))
+                waiter = waiters.popleft()
+                if waiters:
+                    queue.move_to_end(session_id)
+                else:
+                    del queue[session_id]
+                if not waiter.future.done():
+                    return waiter
+        return None
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queue = self._queues[waiter.priority]
+        waiters = queue.get(waiter.session_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del queue[waiter.session_id]
+
+    def _record_wait(self, priority: int, waited_ms: float) -> None:
+        samples: List[float] = self.metrics["wait_ms"][PRIORITY_NAMES[priority]]
+        samples.append(waited_ms)
+        if len(samples) > 1000:
+            del samples[:500]
+
+    def stats(self) -> Dict[str, Any]:
+        waits = {}
+        for name, samples in self.metrics["wait_ms"].items():
+            ordered = sorted(samples)
+            waits[name] = {
+                "count": len(ordered),
+                "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                "p95": ordered[int(len(ordered) * 0.95)] if ordered else 0.0,
+            }
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": {PRIORITY_NAMES[p]: self.queue_depth(p) for p in PRIORITY_NAMES},
+            "max_queue_depth": self.metrics["max_queue_depth"],
+            "completed": self.metrics["completed"],
+            "rejected": self.metrics["rejected"],
+            "wait_ms": waits,
+        }
@@ -6,12 +6,18 @@ Uses sqlite3 with WAL and foreign keys enabled.
 from __future__ import annotations
 
 import json
+import math
 import sqlite3
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 SCHEMA_PATH = Path(__file__).with_name("schema.sql")
 DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "temp" / "chat.db"
+# llm_call_stats'in varsayılan olarak özetlediği telemetri alanları (ModelClient çağrı kayıtları)
+LLM_CALL_METRICS = (
+    "ttft_ms", "wall_ms", "load_ms", "prompt_eval_ms", "eval_ms",
+    "prompt_eval_count", "eval_count", "tokens_per_s", "retries",
+)
 
 
 class Database:
@@ -142,6 +148,60 @@ class Database:
         self.conn.commit()
         return cursor.lastrowid
 
+    def llm_call_stats(
+        self,
+        metrics: Iterable[str] = LLM_CALL_METRICS,
+        conversation_mode: Optional[str] = None,
+        since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        messages.meta içindeki llm_calls kayıtlarından model ve çağrı modu
+        (json/text) başına p50/p95 özetleri döner (kapasite planlaması için).
+
+        conversation_mode: sadece bu moddaki sohbetler; since: 'YYYY-MM-DD HH:MM:SS'
+        """
+        assert self.conn
+        query = (
+            "SELECT call.value AS call FROM messages m "
+            "JOIN conversations c ON c.id = m.conversation_id, "
+            "json_each(m.meta, '$.llm_calls') AS call "
+            "WHERE json_valid(m.meta)"
+        )
+        params: List[Any] = []
+        if conversation_mode:
+            query += " AND c.mode = ?"
+            params.append(conversation_mode)
+        if since:
+            query += " AND m.created_at >= ?"
+            params.append(since)
+
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in self.conn.execute(query, params):
+            call = json.loads(row["call"])
+            groups.setdefault((call.get("model"), call.get("mode")), []).append(call)
+
+        stats = []
+        for (model, mode), calls in sorted(groups.items(), key=lambda item: (str(item[0][0]), str(item[0][1]))):
+            entry: Dict[str, Any] = {
+                "model": model,
+                "mode": mode,
+                "calls": len(calls),
+                "cancelled": sum(1 for call in calls if call.get("cancelled")),
+                "errors": sum(1 for call in calls if call.get("error")),
+            }
+            for metric in metrics:
+                values = [call[metric] for call in calls if isinstance(call.get(metric), (int, float))]
+                entry[metric] = {"p50": _percentile(values, 50), "p95": _percentile(values, 95)} if values else None
+            stats.append(entry)
+        return stats
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank yüzdelik (SQLite'ta percentile fonksiyonu yok)."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
 
 def init_db_sync(db_path: Path | str = DEFAULT_DB_PATH) -> Database:
     return Database(db_path)
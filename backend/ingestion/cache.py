@@ -0,0 +1,42 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from backend.core.disk_cache import DiskCache, make_key, hash_file
+
+CACHE_DIR = os.path.join(os.getcwd(), "data", "cache", "ingestion")
+CACHE_MAX_BYTES = int(os.getenv("INGESTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+class IngestionCache:
+    """
+    Parse edilmiş Markdown, chunk listesi ve embedding vektörleri için
+    içerik adresli önbellek. Aynı dosya ikinci kez yüklendiğinde OCR ve
+    embedding adımları atlanır.
+
+    - Markdown: (dosya içeriği hash'i, parser konfigürasyonu) ile anahtarlanır.
+    - Chunk + embedding: (Markdown hash'i, chunker konfigürasyonu, embedding modeli) ile anahtarlanır.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.store = DiskCache(root, max_bytes=max_bytes, name="ingestion")
+
+    def markdown_key(self, file_path: str, parser_config: str) -> str:
+        return make_key("markdown", hash_file(file_path), parser_config)
+
+    def get_markdown(self, key: str) -> Optional[str]:
+        return self.store.get(key)
+
+    def put_markdown(self, key: str, markdown: str) -> None:
+        self.store.set(key, markdown)
+
+    def chunks_key(self, text: str, chunker_config: str, embedding_model: str) -> str:
+        return make_key("chunks", make_key(text), chunker_config, embedding_model)
+
+    def get_chunks(self, key: str) -> Optional[Dict[str, List[Any]]]:
+        """{"chunks": [...], "embeddings": [[...], ...]} döner, yoksa None."""
+        return self.store.get(key)
+
+    def put_chunks(self, key: str, chunks: List[str], embeddings: List[List[float]]) -> None:
+        self.store.set(key, {"chunks": chunks, "embeddings": embeddings})
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
@@ -1,33 +1,56 @@
 import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, List, Optional
 
 # Local imports
+from backend.core import resources
 from backend.ingestion.parsers.pdf_parser import PDFParser
 from backend.ingestion.parsers.docx_parser import DocxParser
 from backend.ingestion.parsers.excel_parser import ExcelParser
 
+# Desteklenen formatlar ve ilgili motorlar
+PARSER_CLASSES = {
+    ".pdf": PDFParser,
+    ".docx": DocxParser,
+    ".doc": DocxParser,
+    ".xlsx": ExcelParser,
+    ".xls": ExcelParser
+}
+
 class UniversalIngestor:
     def __init__(self):
-        # Motorları bir kere başlatıyoruz (Performans için)
-        print("🔧 Ingestor Motorları Başlatılıyor...")
-        self.pdf_engine = PDFParser()
-        self.docx_engine = DocxParser()
-        self.excel_engine = ExcelParser()
-
-        # Desteklenen formatlar ve ilgili motorlar
-        self.parsers = {
-            ".pdf": self.pdf_engine,
-            ".docx": self.docx_engine,
-            ".doc": self.docx_engine,
-            ".xlsx": self.excel_engine,
-            ".xls": self.excel_engine
-        }
-
-    def ingest_file(self, file_path: str) -> Optional[str]:
+        # Motorlar ilk ihtiyaçta ve bir kere başlatılır (Performans için).
+        # Ana süreç ayrıştırmayı işçi süreçlere devrettiğinde docling
+        # modelleri burada hiç yüklenmez.
+        self.parsers = PARSER_CLASSES
+        self._engines = {}
+        self._engines_lock = threading.Lock()
+
+    def get_parser(self, ext: str):
+        parser_cls = self.parsers[ext]
+        with self._engines_lock:
+            if parser_cls not in self._engines:
+                print(f"🔧 Ingestor Motoru Başlatılıyor: {parser_cls.__name__}")
+                self._engines[parser_cls] = parser_cls()
+            return self._engines[parser_cls]
+
+    def ingest_file(
+        self,
+        file_path: str,
+        executor: Optional[Executor] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Optional[str]:
         """
         Dosyayı okur ve Markdown string olarak döner.
         Dosya formatı desteklenmiyorsa None döner.
+
+        Args:
+            executor: Verilirse ayrıştırma bu (process) havuzunda yapılır.
+            progress: progress(done, total) ilerleme bildirimi.
         """
         path = Path(file_path)
 
@@ -41,8 +64,115 @@ class UniversalIngestor:
             print(f"⚠️ Desteklenmeyen format: {ext}")
             return None
 
-        # İlgili motoru çağır
-        parser = self.parsers[ext]
-        markdown_content = parser.parse(path)
-        
+        parser_cls = self.parsers[ext]
+
+        # Aynı içerik + aynı parser ayarı daha önce işlendiyse OCR'ı atla
+        cache = resources.get_ingestion_cache()
+        cache_key = cache.markdown_key(str(path), parser_cls.config_key)
+        cached = cache.get_markdown(cache_key)
+        if cached is not None:
+            print(f"⚡ Önbellekten okundu: {path.name}")
+            if progress:
+                progress(1, 1)
+            return cached
+
+        # İlgili motoru çağır. Sayfa bazlı paralel çalışabilen parser'lar
+        # (PDF) işleri havuza kendileri dağıtır ve sayfa ilerlemesi bildirir;
+        # diğerleri tek parça halinde bir işçi sürece gönderilir.
+        parallel = getattr(parser_cls, "parallel", False)
+        if parallel:
+            markdown_content = self.get_parser(ext).parse(path, executor=executor, progress=progress)
+        elif executor is not None:
+            markdown_content = executor.submit(parse_in_worker, str(path)).result()
+        else:
+            markdown_content = self.get_parser(ext).parse(path)
+        if progress and not parallel:
+            progress(1, 1)
+
+        # Parser hataları string olarak döner; bunları önbelleğe yazma
+        if markdown_content and not markdown_content.startswith("Error processing"):
+            cache.put_markdown(cache_key, markdown_content)
+
         return markdown_content
+
+    def ingest_batches(
+        self,
+        file_path: str,
+        executor: Optional[Executor] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Optional[Iterable[str]]:
+        """
+        ingest_file'ın parti parti hali: sırayla RAG'e eklenecek Markdown parçaları döner.
+
+        Akış destekleyen parser'larda (Excel) doküman tek string'e toplanmaz ve
+        Markdown önbelleğine yazılmaz (pahalı adım olan embedding'ler parti bazında
+        önbelleklenir). executor verilirse işçi süreç partileri geçici dosyalara
+        yazar; bu çağrı ayrıştırma bitince döner, partiler okundukça diskten yüklenir.
+        Diğer formatlar tek partilik liste olarak döner.
+        """
+        path = Path(file_path)
+        ext = path.suffix.lower()
+        parser_cls = self.parsers.get(ext)
+        if parser_cls is None or not getattr(parser_cls, "streaming", False) or not path.exists():
+            markdown_content = self.ingest_file(file_path, executor=executor, progress=progress)
+            return [markdown_content] if markdown_content else None
+
+        if executor is None:
+            batches: Iterable[str] = self.get_parser(ext).iter_batches(path)
+        else:
+            spool_dir = tempfile.mkdtemp(prefix="ingest-spool-")
+            try:
+                parts = executor.submit(spool_batches_in_worker, str(path), spool_dir).result()
+            except BaseException:
+                shutil.rmtree(spool_dir, ignore_errors=True)
+                raise
+            batches = _read_spooled(spool_dir, parts)
+        if progress:
+            progress(1, 1)
+        return batches
+
+
+def _read_spooled(spool_dir: str, parts: List[str]) -> Iterator[str]:
+    """Geçici dosyalara yazılmış partileri sırayla okur ve siler."""
+    try:
+        for part in parts:
+            with open(part, encoding="utf-8") as f:
+                text = f.read()
+            os.remove(part)
+            yield text
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+# --- Process pool işçileri ---
+
+# Her işçi süreç kendi motorlarını bir kez yükler ve sonraki işlerde tekrar kullanır
+_WORKER_INGESTOR: Optional[UniversalIngestor] = None
+
+def parse_in_worker(file_path: str) -> str:
+    """İşçi süreçte dosyayı ayrıştırır (önbellek ana süreçte kontrol edilir)."""
+    global _WORKER_INGESTOR
+    if _WORKER_INGESTOR is None:
+        _WORKER_INGESTOR = UniversalIngestor()
+
+    path = Path(file_path)
+    return _WORKER_INGESTOR.get_parser(path.suffix.lower()).parse(path)
+
+
+def spool_batches_in_worker(file_path: str, spool_dir: str) -> List[str]:
+    """
+    İşçi süreçte akış destekleyen dosyayı parti parti ayrıştırıp her partiyi
+    spool_dir'e ayrı dosya olarak yazar; dosya yollarını sırayla döner.
+    """
+    global _WORKER_INGESTOR
+    if _WORKER_INGESTOR is None:
+        _WORKER_INGESTOR = UniversalIngestor()
+
+    path = Path(file_path)
+    parts = []
+    for i, batch in enumerate(_WORKER_INGESTOR.get_parser(path.suffix.lower()).iter_batches(path)):
+        part = os.path.join(spool_dir, f"{i:06d}.md")
+        with open(part, "w", encoding="utf-8") as f:
+            f.write(batch)
+        parts.append(part)
+    return parts
@@ -0,0 +1,161 @@
+"""
+Arka plan ingestion işleri.
+
+Ekler eşzamanlı olarak process havuzuna gönderilir; ayrıştırma (docling OCR
+vb.) Chainlit event loop'unu bloklamaz. Her iş sayfa ve parça (chunk)
+ilerlemesini tutar, böylece arayüz işlenmekte olan dosyaları gösterirken
+sohbet biten dokümanlar üzerinden cevap verebilir.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from backend.core import resources
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+# İşçi süreç çökerse (OOM, docling/OCR segfault) havuz yeniden kurulup iş bu kadar kez tekrarlanır
+INGESTION_RETRIES = 1
+
+
+class IngestionJob:
+    def __init__(self, path: str, name: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.name = name
+        self.status = "queued"  # queued -> parsing -> embedding -> done | failed
+        self.pages_done = 0
+        self.pages_total = 0
+        self.chunks_done = 0
+        self.chunks_total = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    # İlerleme callback'leri işçi thread'lerinden çağrılır; sadece sayaç yazarlar.
+    def on_pages(self, done: int, total: int) -> None:
+        self.pages_done, self.pages_total = done, total
+
+    def on_chunks(self, done: int, total: int) -> None:
+        self.chunks_done, self.chunks_total = done, total
+
+    def describe(self) -> str:
+        if self.status == "done":
+            elapsed = (self.finished_at or time.time()) - self.created_at
+            return f"✅ {self.name}: {self.chunks_total} parça ({elapsed:.1f}s)"
+        if self.status == "failed":
+            return f"❌ {self.name}: {self.error}"
+        if self.status == "embedding":
+            return f"🧠 {self.name}: parça {self.chunks_done}/{self.chunks_total or '?'}"
+        if self.status == "parsing":
+            pages = f"sayfa {self.pages_done}/{self.pages_total}" if self.pages_total else "ayrıştırılıyor"
+            return f"📄 {self.name}: {pages}"
+        return f"⏳ {self.name}: sırada"
+
+
+class IngestionJobManager:
+    def __init__(self, workers: int = INGESTION_WORKERS) -> None:
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # torch/chromadb yüklü ana süreçten fork etmek güvenli değil -> spawn
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            print(f"🏭 Ingestion havuzu başlatıldı ({self.workers} işçi)")
+        return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor) -> None:
+        """Çöken havuzu bırakır; sonraki executor erişimi yenisini kurar."""
+        # Aynı anda çöken birden çok iş havuzu sadece bir kez yeniden kurdursun
+        if self._executor is broken:
+            self._executor = None
+            broken.shutdown(wait=False, cancel_futures=True)
+            print("♻️ Ingestion havuzu çöktü, yeniden başlatılıyor")
+
+    def submit(
+        self,
+        path: str,
+        name: str,
+        rag: Any,
+        on_done: Optional[Callable[[IngestionJob], Awaitable[None]]] = None,
+    ) -> IngestionJob:
+        """Dosyayı arka planda ayrıştırıp RAG'e ekleyen bir iş başlatır."""
+        job = IngestionJob(path, name)
+        job.task = asyncio.create_task(self._run(job, rag, on_done))
+        return job
+
+    async def _run(self, job: IngestionJob, rag: Any, on_done) -> None:
+        try:
+            job.status = "parsing"
+            ingestor = resources.get_ingestor()
+            for attempt in range(INGESTION_RETRIES + 1):
+                executor = self.executor
+                try:
+                    batches = await asyncio.to_thread(
+                        ingestor.ingest_batches, job.path, executor=executor, progress=job.on_pages
+                    )
+                    break
+                except BrokenProcessPool:
+                    self._reset_executor(executor)
+                    if attempt == INGESTION_RETRIES:
+                        raise RuntimeError("Ayrıştırma işçisi çöktü (bellek yetersiz olabilir)")
+                    print(f"🔁 {job.name}: işçi süreç çöktü, tekrar deneniyor")
+            if not batches:
+                raise ValueError("Desteklenmeyen format veya boş içerik")
+
+            job.status = "embedding"
+            job.chunks_total = await asyncio.to_thread(self._add_batches, job, rag, batches)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Ingestion hatası ({job.name}): {e}")
+        finally:
+            job.finished_at = time.time()
+
+        if on_done:
+            try:
+                await on_done(job)
+            except Exception as e:
+                print(f"⚠️ Ingestion callback hatası: {e}")
+
+    @staticmethod
+    def _add_batches(job: IngestionJob, rag: Any, batches: Iterable[str]) -> int:
+        """Partileri sırayla RAG'e ekler (bellekte aynı anda tek parti); toplam parça sayısını döner."""
+        total = 0
+        for markdown_text in batches:
+            total += rag.add_document(
+                markdown_text,
+                source=job.name,
+                progress=lambda done, count, base=total: job.on_chunks(base + done, base + count),
+            )
+        return total
+
+    async def wait(self, jobs: List[IngestionJob], timeout: Optional[float] = None) -> bool:
+        """İşleri en fazla `timeout` saniye bekler; hepsi bittiyse True döner."""
+        pending = [job.task for job in jobs if job.task and not job.task.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        return all(job.finished for job in jobs)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
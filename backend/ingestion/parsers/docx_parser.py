@@ -2,6 +2,8 @@ from pathlib import Path
 from docling.document_converter import DocumentConverter
 
 class DocxParser:
+    config_key = "docx:docling:v1"
+
     def __init__(self):
         # Word için ekstra ayara gerek yok, Docling varsayılanı harika.
         self.converter = DocumentConverter()
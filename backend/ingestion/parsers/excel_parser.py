@@ -1,43 +1,172 @@
+import datetime
+import math
+import os
 from pathlib import Path
-from markitdown import MarkItDown
+from typing import Any, Iterator, List
 import re
 
+from backend.core.chunking import CHUNK_BOUNDARY
+
+# Her chunk'ta (başlık satırı hariç) kaç veri satırı olacağı
+ROWS_PER_CHUNK = int(os.getenv("EXCEL_ROWS_PER_CHUNK", "25"))
+# Akış modunda tek seferde embed edilip RAG'e eklenen chunk sayısı (bellekte tutulan üst sınır)
+CHUNKS_PER_BATCH = int(os.getenv("EXCEL_CHUNKS_PER_BATCH", "200"))
+
 class ExcelParser:
+    config_key = f"excel:openpyxl-stream:{ROWS_PER_CHUNK}:v2"
+    # Çalışma kitabı tek bir Markdown string'ine toplanmaz; ingestor iter_batches ile parti parti işler
+    streaming = True
+
     def __init__(self):
-        # MarkItDown motorunu başlatıyoruz.
-        self.md = MarkItDown()
+        # MarkItDown sadece openpyxl'in okuyamadığı eski .xls dosyaları için (lazy)
+        self._md = None
 
     def parse(self, file_path: Path) -> str:
         """
-        Excel dosyasını Microsoft MarkItDown kullanarak Markdown'a çevirir
-        ve ardından oluşan kirlilikleri (NaN, Unnamed vb.) temizler.
+        Excel dosyasını sayfa sayfa, satır grupları halinde Markdown tablolarına çevirir.
+        Her grup sütun başlıklarını ve sayfa adını taşır; gruplar arasına
+        CHUNK_BOUNDARY konur, böylece tablo satır ortasından bölünmez.
+
+        Tüm çalışma kitabını tek string olarak döner; büyük dosyalar için iter_batches kullanılır.
         """
         try:
-            print(f"📊 Excel İşleniyor (MarkItDown): {file_path.name}")
-            
-            # 1. Dönüştürme
-            result = self.md.convert(str(file_path))
-            raw_text = result.text_content
-            
-            # 2. Temizlik (Post-Processing)
-            cleaned_text = self._clean_artifacts(raw_text)
-            
-            return cleaned_text
-            
+            if file_path.suffix.lower() == ".xls":
+                return self._parse_legacy(file_path)
+
+            print(f"📊 Excel İşleniyor (Streaming): {file_path.name}")
+            return CHUNK_BOUNDARY.join(self.iter_chunks(file_path))
+
         except Exception as e:
-            return f"Error processing Excel with MarkItDown: {e}"
+            return f"Error processing Excel: {e}"
+
+    def iter_batches(self, file_path: Path, chunks_per_batch: int = CHUNKS_PER_BATCH) -> Iterator[str]:
+        """
+        parse() ile aynı Markdown'ı en fazla chunks_per_batch satır grubundan oluşan
+        partiler halinde üretir. Hatalar string yerine exception olarak yükselir.
+        """
+        if file_path.suffix.lower() == ".xls":
+            yield self._parse_legacy(file_path)
+            return
+
+        print(f"📊 Excel İşleniyor (Streaming): {file_path.name}")
+        batch: List[str] = []
+        for chunk in self.iter_chunks(file_path):
+            batch.append(chunk)
+            if len(batch) >= chunks_per_batch:
+                yield CHUNK_BOUNDARY.join(batch)
+                batch = []
+        if batch:
+            yield CHUNK_BOUNDARY.join(batch)
+
+    def iter_chunks(self, file_path: Path, rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[str]:
+        """Çalışma kitabını read-only modda okur, her ROWS_PER_CHUNK satırda bir chunk üretir."""
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                header: List[str] = []
+                batch: List[List[str]] = []
+                first_row = 0
+
+                for row_no, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                    cells = self._trim(self._clean_cell(value) for value in row)
+                    if not cells:
+                        continue
+
+                    # İlk dolu satır başlık kabul edilir
+                    if not header:
+                        header = [cell or f"Sütun {i + 1}" for i, cell in enumerate(cells)]
+                        continue
+
+                    if not batch:
+                        first_row = row_no
+                    batch.append(cells)
+                    if len(batch) >= rows_per_chunk:
+                        yield self._render(sheet.title, header, batch, first_row, row_no)
+                        batch = []
+
+                if batch:
+                    yield self._render(sheet.title, header, batch, first_row, first_row + len(batch) - 1)
+                elif header and first_row == 0:
+                    # Sadece başlığı olan sayfa: yine de sütun adları aranabilir olsun
+                    yield self._render(sheet.title, header, [], 0, 0)
+        finally:
+            workbook.close()
+
+    def _render(self, sheet_name: str, header: List[str], rows: List[List[str]], start: int, end: int) -> str:
+        width = max([len(header)] + [len(row) for row in rows])
+        columns = header + [f"Sütun {i + 1}" for i in range(len(header), width)]
+
+        title = f"## Sheet: {sheet_name}"
+        if rows:
+            title += f" (satır {start}-{end})"
+        lines = [
+            title,
+            "| " + " | ".join(columns) + " |",
+            "| " + " | ".join("---" for _ in columns) + " |",
+        ]
+        for row in rows:
+            padded = row + [""] * (width - len(row))
+            lines.append("| " + " | ".join(padded) + " |")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _trim(cells) -> List[str]:
+        """Satır sonundaki boş hücreleri atar (read-only modda max_column şişkin olabilir)."""
+        cells = list(cells)
+        while cells and not cells[-1]:
+            cells.pop()
+        return cells
+
+    @staticmethod
+    def _clean_cell(value: Any) -> str:
+        """Hücre değerini tek satırlık, tabloya uygun metne çevirir (NaN, satır sonu vb. temizlenir)."""
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            if math.isnan(value):
+                return ""
+            if value.is_integer():
+                return str(int(value))
+        if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+            return value.date().isoformat()
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        text = str(value).replace("\r", " ").replace("\n", " ").replace("|", "\\|")
+        return " ".join(text.split())
+
+    # --- Eski .xls formatı ---
+
+    def _parse_legacy(self, file_path: Path) -> str:
+        """
+        .xls dosyasını Microsoft MarkItDown kullanarak Markdown'a çevirir
+        ve ardından oluşan kirlilikleri (NaN, Unnamed vb.) temizler.
+        """
+        if self._md is None:
+            from markitdown import MarkItDown
+            self._md = MarkItDown()
+
+        print(f"📊 Excel İşleniyor (MarkItDown): {file_path.name}")
+
+        # 1. Dönüştürme
+        result = self._md.convert(str(file_path))
+        raw_text = result.text_content
+
+        # 2. Temizlik (Post-Processing)
+        return self._clean_artifacts(raw_text)
 
     def _clean_artifacts(self, text: str) -> str:
         """Markdown metnindeki Excel artıklarını temizler."""
-        
+
         # 1. 'Unnamed: 0', 'Unnamed: 1' gibi başlıkları sil
         text = re.sub(r'Unnamed:\s*\d+', ' ', text)
-        
+
         # 2. 'NaN' veya 'nan' ifadelerini sil
         text = re.sub(r'\bNaN\b', ' ', text)
         text = re.sub(r'\bnan\b', ' ', text)
-        
+
         # 3. Metin içinde görünen literal '\n' kaçış karakterlerini boşluk yap
         text = text.replace('\\n', ' ')
-        
+
         return text
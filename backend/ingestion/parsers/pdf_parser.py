@@ -1,27 +1,239 @@
+import threading
+import time
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
 from docling.datamodel.base_models import InputFormat
 
+# Sayfa sınıflandırma eşikleri
+MIN_TEXT_CHARS = 80          # Bundan az karakterli sayfa "taranmış" sayılır
+MIN_PRINTABLE_RATIO = 0.9    # Bozuk font kodlamasını (�, kontrol karakterleri) ayıklamak için
+MIN_TABLE_PATHS = 40         # Çizgi/dikdörtgen sayısı bunu aşarsa sayfada tablo var kabul edilir
+PAGES_PER_TASK = 8           # Docling'e giden sayfa aralıkları bu boyutta bölünüp paralel işlenir
+
+# Sayfa türleri
+PAGE_TEXT = "text"      # Metin katmanı yeterli -> doğrudan çıkar
+PAGE_TABLE = "table"    # Metin var ama tablo yapısı lazım -> TableFormer (OCR kapalı)
+PAGE_SCANNED = "scan"   # Metin katmanı yok -> OCR + TableFormer
+
+Segment = Tuple[str, int, int]  # (tür, başlangıç sayfası, bitiş sayfası) - 1 tabanlı, dahil
+
+# PDFium thread-safe değil: aynı süreçte iki thread aynı anda pypdfium2'ye (docling'in
+# PDF backend'i dahil) girerse süreç çökebilir. Havuz verilmediğinde bütün PDFium işleri
+# bu kilitle sıraya girer; havuz varsa işler tek thread'li işçi süreçlerde çalışır.
+_PDFIUM_LOCK = threading.Lock()
+
 class PDFParser:
+    # Önbellek anahtarının parçası: pipeline ayarları değişirse güncellenmeli
+    config_key = f"pdf:adaptive:{MIN_TEXT_CHARS}:{MIN_PRINTABLE_RATIO}:{MIN_TABLE_PATHS}:v2"
+    # Sayfa aralıklarını kendisi process havuzuna dağıtır
+    parallel = True
+
     def __init__(self):
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.do_ocr = True
-        pipeline_options.do_table_structure = True
-        pipeline_options.table_structure_options.mode = TableFormerMode.ACCURATE
-        
-        self.converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-            }
-        )
+        # Docling modelleri sadece gerçekten OCR/tablo gereken sayfa çıkınca yüklenir
+        self._converters = {}
+        # parse() aynı anda birden çok ingestion thread'inden çağrılabilir
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "fast_pages": 0, "fast_seconds": 0.0,
+            "docling_pages": 0, "docling_seconds": 0.0,
+        }
+
+    def _converter(self, kind: str) -> DocumentConverter:
+        if kind not in self._converters:
+            pipeline_options = PdfPipelineOptions()
+            pipeline_options.do_ocr = kind == PAGE_SCANNED
+            pipeline_options.do_table_structure = True
+            pipeline_options.table_structure_options.mode = TableFormerMode.ACCURATE
+
+            self._converters[kind] = DocumentConverter(
+                format_options={
+                    InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+                }
+            )
+        return self._converters[kind]
 
-    def parse(self, file_path: Path) -> str:
-        """PDF'i Markdown'a çevirir."""
+    def classify_pages(self, file_path: Path) -> Tuple[List[str], List[str]]:
+        """
+        Her sayfayı metin katmanına göre sınıflandırır.
+        (türler, metin katmanından çıkarılan sayfa metinleri) döner.
+        """
+        with _PDFIUM_LOCK:
+            return self._classify_pages(file_path)
+
+    def _classify_pages(self, file_path: Path) -> Tuple[List[str], List[str]]:
+        import pypdfium2 as pdfium
+        import pypdfium2.raw as pdfium_c
+
+        kinds, texts = [], []
+        pdf = pdfium.PdfDocument(str(file_path))
         try:
-            print(f"📄 PDF İşleniyor (Docling): {file_path.name}")
-            result = self.converter.convert(file_path)
-            # Markdown çıktısını al
-            return result.document.export_to_markdown()
+            for page in pdf:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range().replace("\r\n", "\n").strip()
+                textpage.close()
+
+                printable = sum(1 for ch in text if ch.isprintable() or ch in "\n\t")
+                usable = len(text) >= MIN_TEXT_CHARS and printable / max(len(text), 1) >= MIN_PRINTABLE_RATIO
+                if not usable or "�" in text[:500]:
+                    kinds.append(PAGE_SCANNED)
+                else:
+                    paths = sum(1 for _ in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH], max_depth=1))
+                    kinds.append(PAGE_TABLE if paths >= MIN_TABLE_PATHS else PAGE_TEXT)
+                texts.append(text)
+                page.close()
+        finally:
+            pdf.close()
+        return kinds, texts
+
+    @staticmethod
+    def plan_segments(kinds: List[str]) -> List[Segment]:
+        """Aynı türdeki ardışık sayfaları en fazla PAGES_PER_TASK sayfalık aralıklara böler."""
+        segments: List[Segment] = []
+        for page_no, kind in enumerate(kinds, start=1):
+            if segments:
+                last_kind, start, end = segments[-1]
+                limit = PAGES_PER_TASK if kind != PAGE_TEXT else len(kinds)
+                if last_kind == kind and end == page_no - 1 and end - start + 1 < limit:
+                    segments[-1] = (kind, start, page_no)
+                    continue
+            segments.append((kind, page_no, page_no))
+        return segments
+
+    def convert_segment(self, file_path: Path, kind: str, start: int, end: int) -> str:
+        with _PDFIUM_LOCK:
+            result = self._converter(kind).convert(file_path, page_range=(start, end))
+        return result.document.export_to_markdown()
+
+    def convert_document(self, file_path: Path) -> str:
+        """Tüm PDF'i OCR + TableFormer ile dönüştürür (sınıflandırılamayan dosyalar için)."""
+        with _PDFIUM_LOCK:
+            result = self._converter(PAGE_SCANNED).convert(file_path)
+        return result.document.export_to_markdown()
+
+    def parse(
+        self,
+        file_path: Path,
+        executor: Optional[Executor] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> str:
+        """
+        PDF'i Markdown'a çevirir. Metin katmanı olan sayfalar doğrudan çıkarılır,
+        sadece taranmış/tablolu sayfalar docling'e gider. executor verilirse
+        sınıflandırma/metin çıkarma ve docling aralıkları işçi süreçlerde çalışır
+        (PDFium sunucu sürecinde hiç çağrılmaz), aralıklar çekirdekler arasında
+        paralel işlenir.
+        """
+        try:
+            print(f"📄 PDF İşleniyor (Adaptive): {file_path.name}")
+            # Sınıflandırma metni de çıkardığı için hızlı yolun maliyetine sayılır
+            classify_started = time.perf_counter()
+            try:
+                if executor is not None:
+                    kinds, texts = executor.submit(classify_pdf_pages, str(file_path)).result()
+                else:
+                    kinds, texts = self.classify_pages(file_path)
+            except Exception as e:
+                # Sınıflandırılamayan PDF için eski davranış: tamamı OCR'dan geçer
+                print(f"⚠️ Sayfa sınıflandırma başarısız ({e}), tam OCR kullanılıyor.")
+                if executor is not None:
+                    return executor.submit(convert_pdf_document, str(file_path)).result()
+                return self.convert_document(file_path)
+
+            classify_seconds = time.perf_counter() - classify_started
+            total = len(kinds)
+            segments = self.plan_segments(kinds)
+            parts = {}
+            pages_done = 0
+
+            # 1. Docling gereken aralıkları havuza gönder (arka planda çalışırken hızlı yolu işle)
+            docling_segments = [seg for seg in segments if seg[0] != PAGE_TEXT]
+            docling_started = time.perf_counter()
+            futures = {}
+            if executor is not None:
+                for seg in docling_segments:
+                    futures[seg] = executor.submit(convert_pdf_segment, str(file_path), *seg)
+
+            # 2. Hızlı yol: metin katmanı
+            fast_started = time.perf_counter()
+            fast_pages = 0
+            for seg in segments:
+                kind, start, end = seg
+                if kind == PAGE_TEXT:
+                    parts[seg] = "\n\n".join(texts[start - 1:end])
+                    fast_pages += end - start + 1
+                    pages_done += end - start + 1
+                    if progress:
+                        progress(pages_done, total)
+            self._record("fast", fast_pages, time.perf_counter() - fast_started + classify_seconds)
+
+            # 3. Docling sonuçlarını topla (executor yoksa sırayla çalıştır)
+            docling_pages = 0
+            for seg in docling_segments:
+                kind, start, end = seg
+                if seg in futures:
+                    parts[seg] = futures[seg].result()
+                else:
+                    parts[seg] = self.convert_segment(file_path, kind, start, end)
+                docling_pages += end - start + 1
+                pages_done += end - start + 1
+                if progress:
+                    progress(pages_done, total)
+            if docling_pages:
+                self._record("docling", docling_pages, time.perf_counter() - docling_started)
+
+            self._report(file_path, fast_pages, docling_pages)
+            return "\n\n".join(parts[seg] for seg in segments if parts.get(seg))
+        except BrokenProcessPool:
+            # Çöken havuz iş yöneticisinde yeniden kurulur; hata metni doküman gibi indekslenmesin
+            raise
         except Exception as e:
             return f"Error processing PDF: {e}"
+
+    def _record(self, path: str, pages: int, seconds: float) -> None:
+        with self._stats_lock:
+            self.stats[f"{path}_pages"] += pages
+            self.stats[f"{path}_seconds"] += seconds
+
+    def _report(self, file_path: Path, fast_pages: int, docling_pages: int) -> None:
+        """İki yolun kümülatif sayfa/saniye değerlerini yazdırır (ölçüm için bkz. benchmarks/bench_pdf.py)."""
+        def rate(pages, seconds):
+            return f"{pages / seconds:.1f} sayfa/s" if seconds > 0 else "-"
+
+        with self._stats_lock:
+            s = dict(self.stats)
+        print(
+            f"📊 {file_path.name}: {fast_pages} sayfa metin katmanı, {docling_pages} sayfa docling | "
+            f"hızlı yol {rate(s['fast_pages'], s['fast_seconds'])}, "
+            f"docling {rate(s['docling_pages'], s['docling_seconds'])}"
+        )
+
+
+# --- Process pool işçileri ---
+
+_WORKER_PARSER: Optional[PDFParser] = None
+
+def _worker_parser() -> PDFParser:
+    global _WORKER_PARSER
+    if _WORKER_PARSER is None:
+        _WORKER_PARSER = PDFParser()
+    return _WORKER_PARSER
+
+
+def classify_pdf_pages(file_path: str) -> Tuple[List[str], List[str]]:
+    """İşçi süreçte sayfaları sınıflandırır ve metin katmanını çıkarır."""
+    return _worker_parser().classify_pages(Path(file_path))
+
+
+def convert_pdf_segment(file_path: str, kind: str, start: int, end: int) -> str:
+    """İşçi süreçte bir sayfa aralığını docling ile dönüştürür."""
+    return _worker_parser().convert_segment(Path(file_path), kind, start, end)
+
+
+def convert_pdf_document(file_path: str) -> str:
+    """İşçi süreçte tüm PDF'i OCR ile dönüştürür."""
+    return _worker_parser().convert_document(Path(file_path))
@@ -5,10 +5,22 @@ Each tool module defines a subclass of BaseTool and is registered here.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Protocol
+import asyncio
+import functools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Dict, Optional, Protocol, Union
 
 
 class BaseTool(Protocol):
+    """
+    Optional class attributes read by ToolExecutor:
+      execution: "thread" (default), "process" (stateless, picklable tools) or "async" (tool defines arun)
+      timeout: seconds before the call is abandoned (default DEFAULT_TOOL_TIMEOUT)
+      max_concurrency: simultaneous calls allowed across all sessions (default DEFAULT_TOOL_CONCURRENCY)
+    """
+
     name: str
     description: str
 
@@ -16,15 +28,119 @@ class BaseTool(Protocol):
         ...
 
 
-TOOL_REGISTRY: Dict[str, BaseTool] = {}
+class AsyncBaseTool(Protocol):
+    """
+    Tools with execution = "async" are only awaited through arun (on the event
+    loop, e.g. behind the LLM scheduler); they need no synchronous run.
+    timeout and max_concurrency are read as for BaseTool.
+    """
+
+    name: str
+    description: str
+    execution: str  # "async"
+
+    async def arun(self, **kwargs: Any) -> Any:
+        ...
+
+
+DEFAULT_TOOL_TIMEOUT = 60.0
+DEFAULT_TOOL_CONCURRENCY = 4
+TOOL_THREADS = 16
+TOOL_PROCESSES = 2
+
+
+class ToolExecutor:
+    """
+    Runs tool calls without blocking the event loop.
+    Blocking tools go to a shared thread pool (or a process pool), async tools
+    are awaited directly; each tool gets its own timeout and concurrency limit.
+    """
+
+    def __init__(self, max_threads: int = TOOL_THREADS, max_processes: int = TOOL_PROCESSES) -> None:
+        self._threads = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="tool")
+        self._max_processes = max_processes
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def processes(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(
+                max_workers=self._max_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._processes
+
+    def _semaphore(self, tool: Union[BaseTool, AsyncBaseTool]) -> asyncio.Semaphore:
+        if tool.name not in self._semaphores:
+            limit = getattr(tool, "max_concurrency", DEFAULT_TOOL_CONCURRENCY)
+            self._semaphores[tool.name] = asyncio.Semaphore(limit)
+        return self._semaphores[tool.name]
+
+    def _submit(self, tool: BaseTool, kwargs: Dict[str, Any], semaphore: asyncio.Semaphore) -> Awaitable[Any]:
+        """
+        Submit a blocking tool call to its pool. The concurrency slot is released
+        when the pool future finishes, not when the caller stops waiting: a timed
+        out call keeps its thread/process busy, so it keeps its slot as well.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self.processes if getattr(tool, "execution", "thread") == "process" else self._threads
+        try:
+            future = pool.submit(functools.partial(tool.run, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(_future: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # event loop already closed
+
+        future.add_done_callback(release)
+        return asyncio.wrap_future(future, loop=loop)
+
+    async def run(self, tool: Union[BaseTool, AsyncBaseTool], timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Run a tool; on timeout an error payload is returned instead of raising."""
+        timeout = timeout or getattr(tool, "timeout", DEFAULT_TOOL_TIMEOUT)
+        stats = self.stats.setdefault(tool.name, {"calls": 0, "timeouts": 0, "errors": 0, "seconds": 0.0})
+        semaphore = self._semaphore(tool)
+        started = time.perf_counter()
+        try:
+            await semaphore.acquire()
+            if getattr(tool, "execution", "thread") == "async":
+                # wait_for returns only after the cancelled coroutine has unwound
+                try:
+                    return await asyncio.wait_for(tool.arun(**kwargs), timeout=timeout)
+                finally:
+                    semaphore.release()
+            return await asyncio.wait_for(self._submit(tool, kwargs, semaphore), timeout=timeout)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            return {"status": "error", "message": f"Tool '{tool.name}' timed out after {timeout:g}s."}
+        except Exception as e:
+            stats["errors"] += 1
+            return {"status": "error", "message": f"Tool '{tool.name}' failed: {e}"}
+        finally:
+            stats["calls"] += 1
+            stats["seconds"] += time.perf_counter() - started
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+TOOL_REGISTRY: Dict[str, Union[BaseTool, AsyncBaseTool]] = {}
 
 
-def register_tool(tool: BaseTool) -> None:
+def register_tool(tool: Union[BaseTool, AsyncBaseTool]) -> None:
     """Register a tool instance by its name."""
     TOOL_REGISTRY[tool.name] = tool
 
 
-def get_tool(name: str) -> BaseTool:
+def get_tool(name: str) -> Union[BaseTool, AsyncBaseTool]:
     return TOOL_REGISTRY[name]
 
 
@@ -1,79 +1,60 @@
-import io
-import sys
-import os
-import contextlib
-import uuid
+import asyncio
 from typing import Dict, Any
 
-# Matplotlib ayarı: Pencere açma (GUI yok), sadece dosya üret (Agg backend)
-import matplotlib
-matplotlib.use('Agg') 
-import matplotlib.pyplot as plt
-import pandas as pd
+from backend.core import resources
+from backend.tools.kernels import KERNEL_MAX_SESSIONS, KERNEL_TIMEOUT, PLOT_DIR
 
 class DataAnalystTool:
     name = "data_analyst"
     description = "Execute Python code for data analysis. Available libraries: pandas (pd), matplotlib.pyplot (plt)."
-    
-    OUTPUT_DIR = os.path.join(os.getcwd(), "data", "temp", "plots")
 
-    def __init__(self):
-        os.makedirs(self.OUTPUT_DIR, exist_ok=True)
-        # Kalıcı Python ortamı
-        self.globals = {
-            "pd": pd,
-            "plt": plt,
-            "os": os
-        }
+    # ToolExecutor ayarları: kod oturumun kendi kernel sürecinde çalışır (bkz. kernels.py);
+    # oturumlar birbirini beklemez. Timeout kernel tarafında uygulanır, buradaki üst sınır yedektir.
+    execution = "async"
+    timeout = KERNEL_TIMEOUT + 30
+    max_concurrency = KERNEL_MAX_SESSIONS
 
-    def run(self, code: str, **kwargs) -> str:
+    OUTPUT_DIR = PLOT_DIR
+
+    def __init__(self, session_id: str = "default"):
+        # Kalıcı Python ortamı (değişkenler) oturumun kernel'inde tutulur; bu nesne sadece bir tutamaç
+        self.session_id = session_id
+        self.kernels = resources.get_kernel_manager()
+
+    @staticmethod
+    def _format(reply: Dict[str, Any]) -> str:
+        output = reply.get("output") or ""
+        status = reply.get("status")
+
+        if status == "ok":
+            result = output if output else "Code executed successfully."
+            if reply.get("restarted"):
+                # Oturumun kernel'i limit yüzünden kapatılmıştı; kod temiz bir ortamda çalıştı
+                result += "\n⚠️ The Python kernel was restarted before this run; previously defined variables are lost."
+            if reply.get("image_path"):
+                return f"{result}\n[IMAGE_GENERATED]: {reply['image_path']}"
+            return result
+
+        if status == "interrupted":
+            message = "❌ Execution cancelled."
+        else:
+            message = f"❌ Python Error: {reply.get('error')}"
+        if reply.get("restarted"):
+            message += "\n⚠️ The Python kernel was restarted; all previously defined variables are lost."
+        return f"{output}\n{message}" if output else message
+
+    async def arun(self, code: str, **kwargs) -> str:
         """
-        Python kodunu çalıştırır, çıktıyı (stdout) ve oluşturulan grafikleri yakalar.
+        Python kodunu oturumun kernel'inde çalıştırır, çıktıyı (stdout) ve oluşturulan grafikleri yakalar.
+        Görev iptal edilirse (timeout / kullanıcı durdurdu) kernel'deki kod da kesilir.
         """
-        # Standart çıktıyı yakalamak için buffer
-        stdout_buffer = io.StringIO()
-        
-        # plt.show()'u etkisiz hale getir (yoksa grafik temizlenir ve kaybolur)
-        def dummy_show():
-            pass
-        
-        # Mevcut plt.show fonksiyonunu yedekle (gerekirse) ve ez
-        original_show = plt.show
-        plt.show = dummy_show
-        
-        # Önceki çizimleri temizle
-        plt.clf()
-        plt.close('all')
-        
         try:
-            # Code execution
-            with contextlib.redirect_stdout(stdout_buffer):
-                exec(code, self.globals)
-            
-            output = stdout_buffer.getvalue()
-            
-            # Grafik kontrolü
-            image_path = None
-            # get_fignums() aktif figürleri döndürür
-            if plt.get_fignums():
-                filename = f"plot_{uuid.uuid4().hex}.png"
-                file_path = os.path.join(self.OUTPUT_DIR, filename)
-                
-                # Grafiği kaydet
-                plt.savefig(file_path, bbox_inches='tight')
-                plt.close('all') # Temizlik
-                image_path = file_path
-                
-            # plt.show'u eski haline getirmek şimdilik gerekmez ama temizlik iyidir
-            plt.show = original_show
-            
-            result = output if output else "Code executed successfully."
-            
-            if image_path:
-                return f"{result}\n[IMAGE_GENERATED]: {image_path}"
-            
-            return result
+            reply = await asyncio.to_thread(self.kernels.execute, self.session_id, code)
+        except asyncio.CancelledError:
+            self.kernels.interrupt(self.session_id)
+            raise
+        return self._format(reply)
 
-        except Exception as e:
-            plt.close('all') # Hata durumunda da temizle
-            return f"❌ Python Error: {str(e)}"
\ No newline at end of file
+    def run(self, code: str, **kwargs) -> str:
+        """Event loop dışından (script vb.) senkron kullanım."""
+        return self._format(self.kernels.execute(self.session_id, code))
@@ -1,15 +1,16 @@
 from __future__ import annotations
 from typing import Any, Dict
 from backend.tools import register_tool
-from backend.ingestion.ingestor import UniversalIngestor
+from backend.core import resources
 
 class FileLoaderTool:
     name = "file_loader"
     description = "Load and process local files (pdf, docx, xlsx) into markdown text."
 
-    def __init__(self):
-        # Ingestor motorunu başlat
-        self.ingestor = UniversalIngestor()
+    @property
+    def ingestor(self):
+        # Paylaşılan ingestor ilk kullanımda yüklenir (import anında değil)
+        return resources.get_ingestor()
 
     def run(self, path: str, **kwargs: Any) -> Dict[str, Any]:
         target = kwargs.get("path") or kwargs.get("query") or path
@@ -4,6 +4,9 @@ from typing import Dict, Any
 class FileWriterTool:
     name = "file_writer"
     description = "Write content to a file. Useful for creating reports, code files, or summaries."
+
+    execution = "thread"
+    timeout = 10
     
     # Güvenlik: Dosyalar sadece bu klasöre yazılır
     EXPORT_DIR = os.path.join(os.getcwd(), "data", "exports")
@@ -1,24 +1,52 @@
-import ollama
-import base64
+import asyncio
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
+
+from backend.core import resources
+from backend.core.scheduler import INTERACTIVE
 
 class ImageAnalysisTool:
     name = "image_analysis"
     description = "Analyze images using a vision model. Provide the image path and a specific prompt/question about the image."
 
+    # ToolExecutor ayarları: event loop'ta çalışır, istek LLM zamanlayıcısından geçer;
+    # vision modeli tek seferde bir istek işlesin
+    execution = "async"
+    timeout = 180
+    max_concurrency = 1
+
     def __init__(self, model_name: str = "qwen3-vl:2b"):
         self.model_name = model_name
-        self.client = ollama.Client()
+        # Süreç genelindeki AsyncClient (ayrı bir sync client / bağlantı havuzu açılmaz)
+        self.client = resources.get_ollama_client()
+        self.residency = resources.get_residency_manager()
+        self.residency.register(model_name)
 
-    def _encode_image(self, image_path: str) -> str:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+    def _prepare(self, image_path: str) -> Tuple[str, str]:
+        """(resim hash'i, base64 payload): modelin çözünürlüğüne küçültülmüş, önbellekli."""
+        return resources.get_image_cache().prepare(image_path, self.model_name)
 
-    def run(self, image_path: str = None, prompt: str = "Describe this image in detail.", **kwargs: Any) -> str:
+    def _resolve_path(self, image_path: Optional[str], kwargs: Dict[str, Any]) -> Optional[str]:
         # image_path hem positional hem de kwargs içinden gelebilir, kontrol et
-        img_path = image_path or kwargs.get("image_path") or kwargs.get("path")
-        
+        return image_path or kwargs.get("image_path") or kwargs.get("path")
+
+    def _request(self, base64_image: str, prompt: str) -> Dict[str, Any]:
+        # keep_alive residency yöneticisinden: RAM bütçesine sığıyorsa model bellekte kalır,
+        # sığmıyorsa 0 (işlem bitince VRAM'den temizle). MODEL_KEEP_ALIVE her zaman önceliklidir.
+        return {
+            "model": self.model_name,
+            "prompt": prompt,
+            "images": [base64_image],
+            "keep_alive": self.residency.keep_alive(self.model_name),
+        }
+
+    @staticmethod
+    def _format(result: str) -> str:
+        return f"--- IMAGE ANALYSIS RESULT ---\n{result}\n-----------------------------"
+
+    async def arun(self, image_path: str = None, prompt: str = "Describe this image in detail.", session_id: str = "default", **kwargs: Any) -> str:
+        img_path = self._resolve_path(image_path, kwargs)
+
         if not img_path:
             return "❌ Error: No image path provided. Please specify the 'image_path'."
 
@@ -26,22 +54,31 @@ class ImageAnalysisTool:
             return f"❌ Error: Image file not found at {img_path}"
 
         try:
+            # Küçültme/yeniden kodlama CPU işi: event loop'u bloklamasın
+            image_hash, base64_image = await asyncio.to_thread(self._prepare, img_path)
+
+            # Aynı resim + aynı soru + aynı model daha önce analiz edildiyse vision modeli çalışmaz
+            cache = resources.get_image_cache()
+            analysis_key = cache.analysis_key(image_hash, prompt, self.model_name)
+            cached = cache.get_analysis(analysis_key)
+            if cached is not None:
+                print(f"👁️ Visual Analysis önbellekten ({self.model_name})")
+                return self._format(cached)
+
             print(f"👁️ Visual Analysis Başlıyor ({self.model_name})...")
-            
-            # Resmi encode et
-            base64_image = self._encode_image(image_path)
-            
-            # Ollama Vision API çağrısı
-            # keep_alive: 0 -> İşlem bitince modeli VRAM'den hemen temizle
-            response = self.client.generate(
-                model=self.model_name,
-                prompt=prompt,
-                images=[base64_image],
-                keep_alive=0 
-            )
-            
-            result = response.get('response', 'No analysis generated.')
-            return f"--- IMAGE ANALYSIS RESULT ---\n{result}\n-----------------------------"
+
+            # Ollama Vision API çağrısı; kullanıcı sonucu beklediği için etkileşimli öncelik
+            self.residency.touch(self.model_name)
+            async with resources.get_llm_scheduler().slot(session_id, INTERACTIVE, self.model_name):
+                response = await self.client.generate(**self._request(base64_image, prompt))
+            load_ns = response.get('load_duration')
+            self.residency.record_load(self.model_name, load_ns / 1e6 if load_ns else None)
+
+            result = response.get('response')
+            if not result:
+                return self._format("No analysis generated.")
+            cache.put_analysis(analysis_key, result)
+            return self._format(result)
 
         except Exception as e:
-            return f"❌ Error during image analysis: {str(e)}"
\ No newline at end of file
+            return f"❌ Error during image analysis: {str(e)}"
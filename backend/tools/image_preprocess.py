@@ -0,0 +1,137 @@
+"""
+Vision modeline gönderilecek resimlerin ön işlemesi ve önbelleği.
+
+Ham dosyanın tam çözünürlükte base64'lenmesi hem aktarımı hem de vision
+çıkarımını büyütür; model resmi zaten kendi giriş çözünürlüğüne indirir.
+Resim burada modelin efektif çözünürlüğüne küçültülüp yeniden kodlanır,
+sonuç içerik hash'i ile diskte saklanır. Aynı resim hakkında aynı soru
+(ve aynı model) tekrar gelirse analiz sonucu da önbellekten döner.
+
+Pillow yoksa resim olduğu gibi gönderilir (eski davranış).
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from backend.core.disk_cache import DiskCache, hash_file, make_key
+from backend.core.retrieval_cache import normalize_query
+
+CACHE_DIR = os.path.join(os.getcwd(), "data", "cache", "images")
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", "256")) * 1024 * 1024
+ANALYSIS_TTL_SECONDS = float(os.getenv("IMAGE_ANALYSIS_TTL_HOURS", "24")) * 3600
+
+# Modelin resmi işlediği en uzun kenar (px); model adı öneki ile eşleşir
+MODEL_INPUT_SIDE = {
+    "qwen3-vl": 1280,
+    "qwen2.5vl": 1280,
+    "llava": 672,
+    "moondream": 756,
+}
+DEFAULT_INPUT_SIDE = int(os.getenv("VISION_MAX_SIDE", "1024"))
+JPEG_QUALITY = 90
+PREPROCESS_VERSION = "v1"
+
+
+def input_side_for(model_name: str) -> int:
+    if os.getenv("VISION_MAX_SIDE"):
+        return DEFAULT_INPUT_SIDE
+    for prefix, side in MODEL_INPUT_SIDE.items():
+        if model_name.startswith(prefix):
+            return side
+    return DEFAULT_INPUT_SIDE
+
+
+def _encode(image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def downsize_image(raw: bytes, max_side: int) -> Tuple[bytes, Dict[str, Any]]:
+    """En uzun kenarı max_side'a indirip yeniden kodlar. Kazanç yoksa ham baytları döner."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return raw, {"preprocessed": False}
+
+    with Image.open(io.BytesIO(raw)) as image:
+        original_size = image.size
+        image.load()
+        if image.mode in ("RGBA", "LA", "P"):
+            # Saydamlık beyaz zemine oturtulur (vision modelleri RGB bekler)
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        # Az renkli ekran görüntülerinde (yazı, grafik) PNG hem küçük hem keskin kalır
+        few_colors = image.getcolors(maxcolors=256) is not None
+        encoded = _encode(image, "PNG" if few_colors else "JPEG")
+        resized = image.size
+
+    if len(encoded) >= len(raw) and resized == original_size:
+        return raw, {"preprocessed": False, "size": original_size}
+    return encoded, {
+        "preprocessed": True,
+        "original_size": original_size,
+        "size": resized,
+        "bytes_before": len(raw),
+        "bytes_after": len(encoded),
+    }
+
+
+class ImageCache:
+    """Hazırlanmış base64 payload'ları ve (resim, prompt, model) analiz sonuçları."""
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        # Payload'lar içerik adreslidir (süresiz); analizler TTL ile ayrı tutulur
+        self.payloads = DiskCache(os.path.join(root, "payloads"), max_bytes=max_bytes, name="image_payloads")
+        self.analyses = DiskCache(os.path.join(root, "analyses"), max_bytes=max_bytes // 8, ttl=ANALYSIS_TTL_SECONDS, name="image_analyses")
+
+    def prepare(self, image_path: str, model_name: str) -> Tuple[str, str]:
+        """(resim hash'i, base64 payload) döner; payload önbellekte yoksa hazırlanır."""
+        image_hash = hash_file(image_path)
+        max_side = input_side_for(model_name)
+        key = make_key("payload", image_hash, max_side, PREPROCESS_VERSION)
+
+        payload = self.payloads.get(key)
+        if payload is None:
+            with open(image_path, "rb") as f:
+                raw = f.read()
+            try:
+                data, info = downsize_image(raw, max_side)
+            except Exception as e:
+                print(f"⚠️ Resim ön işlenemedi, ham haliyle gönderiliyor: {e}")
+                data, info = raw, {"preprocessed": False}
+            payload = base64.b64encode(data).decode("utf-8")
+            self.payloads.set(key, payload)
+            if info.get("preprocessed"):
+                print(
+                    f"🖼️ Resim hazırlandı: {info['original_size']} -> {info['size']}, "
+                    f"{info['bytes_before'] // 1024} KB -> {info['bytes_after'] // 1024} KB"
+                )
+        return image_hash, payload
+
+    def analysis_key(self, image_hash: str, prompt: str, model_name: str) -> str:
+        return make_key("analysis", image_hash, normalize_query(prompt), model_name)
+
+    def get_analysis(self, key: str) -> Optional[str]:
+        return self.analyses.get(key)
+
+    def put_analysis(self, key: str, result: str) -> None:
+        self.analyses.set(key, result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"payloads": self.payloads.stats(), "analyses": self.analyses.stats()}
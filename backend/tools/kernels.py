@@ -0,0 +1,352 @@
+"""
+data_analyst için süreç dışı, kalıcı Python kernel'leri.
+
+Model kodu eskiden sunucu sürecinde exec ile çalışıyordu: matplotlib
+global state'i oturumlar arasında paylaşılıyor, sonsuz döngü veya ağır
+bir pandas işi herkesi kilitliyordu. Artık her oturumun kendi kernel
+süreci vardır:
+
+- Kernel'ler spawn ile önceden başlatılır (KERNEL_WARM_POOL yedek), pandas
+  ve matplotlib (Agg) içeride önceden import edilir; ilk çağrı import
+  süresini ödemez.
+- Oturumun değişkenleri (globals) kernel yaşadıkça korunur.
+- CPU süresi (RLIMIT_CPU) ve bellek (RLIMIT_AS) sınırlıdır; duvar saati
+  timeout'unda kod önce kesilir (SIGINT), cevap gelmezse kernel öldürülüp
+  yerine yenisi verilir.
+- Çalışan kod iptal edilebilir (interrupt).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+try:
+    import resource  # POSIX
+except ImportError:  # Windows: limitler uygulanmaz, timeout yine geçerli
+    resource = None
+
+PLOT_DIR = os.path.join(os.getcwd(), "data", "temp", "plots")
+
+# Hazırda bekleyen (oturuma atanmamış) kernel sayısı
+KERNEL_WARM_POOL = int(os.getenv("KERNEL_WARM_POOL", "1"))
+# Aynı anda yaşayan oturum kernel'i; aşılırsa en uzun süredir kullanılmayan kapatılır
+KERNEL_MAX_SESSIONS = int(os.getenv("KERNEL_MAX_SESSIONS", "8"))
+# Tek çalıştırma için duvar saati ve CPU süresi (s)
+KERNEL_TIMEOUT = float(os.getenv("KERNEL_TIMEOUT", "120"))
+KERNEL_CPU_SECONDS = int(os.getenv("KERNEL_CPU_SECONDS", "90"))
+# Kernel süreci sanal bellek sınırı
+KERNEL_MEMORY_MB = int(os.getenv("KERNEL_MEMORY_MB", "4096"))
+# Kernel'in açılıp kütüphaneleri import etmesi için süre
+KERNEL_START_TIMEOUT = 60.0
+# SIGINT'ten sonra kodun durması için tanınan süre; sonra kernel öldürülür
+INTERRUPT_GRACE_SECONDS = 3.0
+
+
+# --- Kernel süreci tarafı ---
+
+class CPUTimeExceeded(Exception):
+    pass
+
+
+_BUSY = False
+
+
+def _on_interrupt(signum, frame):
+    # Sadece kod çalışırken kes; çağrılar arasında gelen geç SIGINT yok sayılır
+    if _BUSY:
+        raise KeyboardInterrupt
+
+
+def _on_cpu_limit(signum, frame):
+    if _BUSY:
+        raise CPUTimeExceeded
+
+
+def _cpu_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_cpu_budget(seconds: Optional[int]) -> None:
+    """RLIMIT_CPU kümülatiftir: her çağrıda limit 'şimdiye kadar kullanılan + bütçe' yapılır."""
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = resource.RLIM_INFINITY if seconds is None else int(_cpu_used()) + seconds
+    with contextlib.suppress(ValueError, OSError):
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _execute(code: str, namespace: Dict[str, Any], plt, plot_dir: str, cpu_seconds: int) -> Dict[str, Any]:
+    global _BUSY
+
+    buffer = io.StringIO()
+    # Önceki çizimler bu çağrının grafiğine karışmasın
+    plt.close("all")
+    _set_cpu_budget(cpu_seconds)
+    try:
+        with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+            _BUSY = True
+            try:
+                exec(code, namespace)
+            finally:
+                _BUSY = False
+
+        image_path = None
+        if plt.get_fignums():
+            image_path = os.path.join(plot_dir, f"plot_{uuid.uuid4().hex}.png")
+            plt.savefig(image_path, bbox_inches="tight")
+        return {"status": "ok", "output": buffer.getvalue(), "image_path": image_path}
+    except KeyboardInterrupt:
+        return {"status": "interrupted", "output": buffer.getvalue()}
+    except CPUTimeExceeded:
+        return {"status": "error", "output": buffer.getvalue(), "error": f"CPU time limit exceeded ({cpu_seconds}s)"}
+    except MemoryError:
+        return {"status": "error", "output": buffer.getvalue(), "error": f"Memory limit exceeded ({KERNEL_MEMORY_MB} MB)"}
+    except BaseException as e:
+        return {"status": "error", "output": buffer.getvalue(), "error": str(e) or type(e).__name__}
+    finally:
+        _BUSY = False
+        _set_cpu_budget(None)
+        plt.close("all")
+
+
+def kernel_main(conn, plot_dir: str, memory_mb: int, cpu_seconds: int) -> None:
+    """Kernel süreci: kütüphaneleri yükler, sonra istekleri sırayla çalıştırır."""
+    started = time.perf_counter()
+    # BLAS thread havuzları sanal bellek limitini boşuna tüketmesin
+    for var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+
+    signal.signal(signal.SIGINT, _on_interrupt)
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    # Matplotlib ayarı: Pencere açma (GUI yok), sadece dosya üret (Agg backend)
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    # plt.show()'u etkisiz hale getir (yoksa grafik temizlenir ve kaybolur)
+    plt.show = lambda *args, **kwargs: None
+    os.makedirs(plot_dir, exist_ok=True)
+
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        with contextlib.suppress(ValueError, OSError):
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    # Kalıcı Python ortamı
+    namespace: Dict[str, Any] = {"__name__": "__main__", "pd": pd, "plt": plt, "os": os}
+    conn.send({"status": "ready", "pid": os.getpid(), "startup_ms": (time.perf_counter() - started) * 1000})
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        conn.send(_execute(request["code"], namespace, plt, plot_dir, cpu_seconds))
+
+
+# --- Sunucu tarafı ---
+
+class Kernel:
+    """Tek bir kernel süreci. execute() bloklayıcıdır; aynı kernel'de çağrılar sıraya girer."""
+
+    def __init__(self, ctx) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=kernel_main,
+            args=(child_conn, PLOT_DIR, KERNEL_MEMORY_MB, KERNEL_CPU_SECONDS),
+            name="python-kernel",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.lock = threading.Lock()
+        self.ready = False
+        self.busy = False
+        self.calls = 0
+        self.started_at = time.time()
+        self.last_used = time.time()
+        self.startup_ms: Optional[float] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def _wait_ready(self) -> None:
+        if self.ready:
+            return
+        if not self.conn.poll(KERNEL_START_TIMEOUT):
+            raise TimeoutError(f"kernel did not start within {KERNEL_START_TIMEOUT:.0f}s")
+        message = self.conn.recv()
+        self.ready = True
+        self.startup_ms = message.get("startup_ms")
+
+    def execute(self, code: str, timeout: float = KERNEL_TIMEOUT) -> Dict[str, Any]:
+        with self.lock:
+            self.busy = True
+            self.last_used = time.time()
+            try:
+                self._wait_ready()
+                self.calls += 1
+                self.conn.send({"code": code})
+                if self.conn.poll(timeout):
+                    return self.conn.recv()
+
+                # Duvar saati doldu: önce nazikçe kes, durmazsa kernel'i öldür
+                self.interrupt()
+                if self.conn.poll(INTERRUPT_GRACE_SECONDS):
+                    reply = self.conn.recv()
+                    return dict(reply, status="timeout", error=f"Execution timed out after {timeout:g}s")
+                self.kill()
+                return {"status": "timeout", "restarted": True, "error": f"Execution timed out after {timeout:g}s"}
+            except (EOFError, OSError, TimeoutError) as e:
+                # Süreç öldü (bellek, CPU hard limit, segfault) veya hiç açılamadı
+                self.kill()
+                return {"status": "error", "restarted": True, "error": f"Kernel died: {str(e) or 'process exited'}"}
+            finally:
+                self.busy = False
+                self.last_used = time.time()
+
+    def interrupt(self) -> None:
+        if self.alive and self.busy:
+            with contextlib.suppress(OSError):
+                os.kill(self.process.pid, signal.SIGINT)
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=2)
+        with contextlib.suppress(OSError):
+            self.conn.close()
+
+    def shutdown(self) -> None:
+        """Kernel'i kapatır; çalışan kod varsa beklemeden öldürür."""
+        if not self.busy and self.alive:
+            with contextlib.suppress(OSError, ValueError):
+                self.conn.send(None)
+            self.process.join(timeout=1)
+        self.kill()
+
+
+class KernelManager:
+    def __init__(self, warm: int = KERNEL_WARM_POOL, max_sessions: int = KERNEL_MAX_SESSIONS) -> None:
+        # spawn: sunucunun thread'leri ve açık bağlantıları fork ile kopyalanmasın
+        self._ctx = multiprocessing.get_context("spawn")
+        self.warm = warm
+        self.max_sessions = max_sessions
+        self._spares: Deque[Kernel] = deque()
+        self._sessions: "OrderedDict[str, Kernel]" = OrderedDict()
+        # Kernel'i limit yüzünden kapatılan oturumlar: sonraki çağrının cevabı restarted=True taşır
+        self._evicted: Set[str] = set()
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, int] = {"started": 0, "restarts": 0, "evictions": 0, "timeouts": 0, "interrupts": 0}
+        os.makedirs(PLOT_DIR, exist_ok=True)
+        with self._lock:
+            self._fill()
+
+    def _spawn(self) -> Kernel:
+        self.metrics["started"] += 1
+        return Kernel(self._ctx)
+
+    def _fill(self) -> None:
+        # Yedek kernel'ler arka planda kütüphaneleri import ederek hazır bekler (kilit altında)
+        while len(self._spares) < self.warm:
+            self._spares.append(self._spawn())
+
+    def kernel_for(self, session_id: str) -> Kernel:
+        with self._lock:
+            kernel = self._sessions.get(session_id)
+            if kernel is not None and kernel.alive:
+                self._sessions.move_to_end(session_id)
+                return kernel
+            if kernel is not None:
+                self.metrics["restarts"] += 1
+                print(f"🐍 Kernel yeniden başlatılıyor (oturum {session_id})")
+
+            while self._spares and not self._spares[0].alive:
+                self._spares.popleft().kill()
+            kernel = self._spares.popleft() if self._spares else self._spawn()
+            self._sessions[session_id] = kernel
+            evicted = self._evict()
+            self._fill()
+        # Kapatma ~3s join edebilir; diğer oturumlar kilidi beklemesin (release() gibi)
+        for old in evicted:
+            old.shutdown()
+        return kernel
+
+    def _evict(self) -> List[Kernel]:
+        """
+        Sınır aşılırsa en uzun süredir kullanılmayan boştaki kernel'ler oturumlardan
+        çıkarılır (kilit altında); kapatılmaları için listesi döner.
+        """
+        evicted = []
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            kernel = self._sessions[session_id]
+            if not kernel.busy:
+                del self._sessions[session_id]
+                self._evicted.add(session_id)
+                evicted.append(kernel)
+                self.metrics["evictions"] += 1
+                print(f"🐍 Kernel kapatıldı (oturum {session_id}, limit {self.max_sessions})")
+        return evicted
+
+    def execute(self, session_id: str, code: str, timeout: float = KERNEL_TIMEOUT) -> Dict[str, Any]:
+        with self._lock:
+            was_evicted = session_id in self._evicted
+            self._evicted.discard(session_id)
+        kernel = self.kernel_for(session_id)
+        reply = kernel.execute(code, timeout)
+        if was_evicted:
+            # Değişkenler kernel'le birlikte gitti; model bunu çıktıda görsün
+            reply = dict(reply, restarted=True)
+        if reply.get("status") == "timeout":
+            self.metrics["timeouts"] += 1
+        if reply.get("status") == "interrupted":
+            self.metrics["interrupts"] += 1
+        return reply
+
+    def interrupt(self, session_id: str) -> None:
+        """Oturumun çalışan kodunu keser (kernel ve değişkenleri korunur)."""
+        kernel = self._sessions.get(session_id)
+        if kernel is not None:
+            kernel.interrupt()
+
+    def release(self, session_id: str) -> None:
+        with self._lock:
+            kernel = self._sessions.pop(session_id, None)
+            self._evicted.discard(session_id)
+        if kernel is not None:
+            kernel.shutdown()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            kernels = list(self._sessions.values()) + list(self._spares)
+            self._sessions.clear()
+            self._spares.clear()
+        for kernel in kernels:
+            kernel.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "spares": len(self._spares),
+            "busy": sum(1 for kernel in self._sessions.values() if kernel.busy),
+            **self.metrics,
+        }
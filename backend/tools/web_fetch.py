@@ -0,0 +1,174 @@
+"""
+Arama sonucu sayfalarını indirip ana metni çıkarma.
+
+web_search sadece başlık/link/snippet döndürdüğünde model ya snippet'ten
+cevap uyduruyor ya da tekrar tekrar arıyordu. Fetch modunda ilk sonuç
+sayfaları sınırlı paralellikle ve zaman aşımıyla indirilir, ana metin
+(script/menü/footer atılarak) stdlib HTMLParser ile çıkarılır ve oturumun
+RAG koleksiyonuna eklenir; takip soruları ağa gitmeden yerel aramadan
+cevaplanır.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag
+
+import requests
+
+WEB_FETCH_TOP_N = int(os.getenv("WEB_FETCH_TOP_N", "3"))
+WEB_FETCH_CONCURRENCY = int(os.getenv("WEB_FETCH_CONCURRENCY", "4"))
+# Sayfa başına (bağlantı + okuma) ve tüm indirme turu için üst sınır (s)
+WEB_FETCH_TIMEOUT = float(os.getenv("WEB_FETCH_TIMEOUT", "8"))
+WEB_FETCH_DEADLINE = float(os.getenv("WEB_FETCH_DEADLINE", "15"))
+WEB_FETCH_MAX_BYTES = int(os.getenv("WEB_FETCH_MAX_KB", "2048")) * 1024
+# Bundan kısa çıkarılan metin (çerez duvarı, JS-only sayfa) indekslenmez
+MIN_TEXT_CHARS = 200
+# Bundan kısa satırlar (menü, buton, breadcrumb) ana metin sayılmaz
+MIN_LINE_CHARS = 40
+
+USER_AGENT = "Mozilla/5.0 (compatible; local-agent/1.0; +https://github.com/Fetiiii/local-agent)"
+
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "header", "footer", "aside", "form", "iframe", "template", "button"}
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "tr", "br", "pre", "blockquote", "table", "ul", "ol", "dd", "dt"}
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+class MainTextExtractor(HTMLParser):
+    """Atlanan etiketlerin dışındaki metni blok sınırlarında satırlara böler."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self._in_title = False
+        self._skip_depth = 0
+        self._lines: List[str] = []
+        self._current: List[str] = []
+        self._heading = False
+
+    def _flush(self) -> None:
+        line = " ".join("".join(self._current).split())
+        if line:
+            # Başlıklar kısa olsa da tutulur (chunker Markdown başlığına göre böler)
+            self._lines.append(f"## {line}" if self._heading else line)
+        self._current = []
+        self._heading = False
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag == "title":
+            self._in_title = True
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS or tag in _HEADING_TAGS:
+            self._flush()
+            self._heading = tag in _HEADING_TAGS
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        if tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title":
+            self._in_title = False
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS or tag in _HEADING_TAGS:
+            self._flush()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._current.append(data)
+
+    def lines(self) -> List[str]:
+        self._flush()
+        return self._lines
+
+
+def extract_main_text(html: str) -> Tuple[str, str]:
+    """(başlık, ana metin) döner. Kısa menü/buton satırları atılır."""
+    parser = MainTextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass
+    kept = [line for line in parser.lines() if line.startswith("## ") or len(line) >= MIN_LINE_CHARS]
+    # Arka arkaya gelen başlıklardan sadece içerik taşıyanlar kalsın
+    text_lines = [
+        line for i, line in enumerate(kept)
+        if not line.startswith("## ") or (i + 1 < len(kept) and not kept[i + 1].startswith("## "))
+    ]
+    return " ".join(parser.title.split()), "\n\n".join(text_lines)
+
+
+def canonical_url(url: str) -> str:
+    """Dedupe için: #fragment ve sondaki / atılır."""
+    return urldefrag((url or "").strip())[0].rstrip("/")
+
+
+def _charset(content_type: str) -> Optional[str]:
+    match = re.search(r"charset=([\w-]+)", content_type or "", re.I)
+    return match.group(1) if match else None
+
+
+class PageFetcher:
+    def __init__(self, session: Optional[requests.Session] = None, concurrency: int = WEB_FETCH_CONCURRENCY) -> None:
+        self.session = session or requests.Session()
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="web-fetch")
+
+    def fetch(self, url: str) -> Dict[str, Any]:
+        """Tek sayfa: {"url", "status", "title", "text"} veya hata mesajı."""
+        started = time.perf_counter()
+        try:
+            with self.session.get(url, timeout=WEB_FETCH_TIMEOUT, stream=True, headers={"User-Agent": USER_AGENT}) as resp:
+                resp.raise_for_status()
+                content_type = resp.headers.get("Content-Type", "")
+                if "html" not in content_type and "text/plain" not in content_type:
+                    return {"url": url, "status": "skipped", "message": f"unsupported content type: {content_type or '?'}"}
+
+                # Dev sayfalar (veya bitmeyen stream) WEB_FETCH_MAX_BYTES'ta kesilir
+                body = b""
+                for block in resp.iter_content(64 * 1024):
+                    body += block
+                    if len(body) >= WEB_FETCH_MAX_BYTES or time.perf_counter() - started > WEB_FETCH_TIMEOUT:
+                        break
+                html = body.decode(_charset(content_type) or resp.encoding or "utf-8", errors="replace")
+        except Exception as e:
+            return {"url": url, "status": "error", "message": str(e)}
+
+        if "html" in content_type:
+            title, text = extract_main_text(html)
+        else:
+            title, text = "", html
+        if len(text) < MIN_TEXT_CHARS:
+            return {"url": url, "status": "skipped", "message": "no main text"}
+        return {
+            "url": url,
+            "status": "ok",
+            "title": title,
+            "text": text,
+            "fetch_ms": round((time.perf_counter() - started) * 1000),
+        }
+
+    def fetch_many(self, urls: List[str], deadline: float = WEB_FETCH_DEADLINE) -> List[Dict[str, Any]]:
+        """Sayfaları paralel indirir; deadline'a yetişmeyenler 'timeout' olarak döner (sıra korunur)."""
+        futures = [self.pool.submit(self.fetch, url) for url in urls]
+        wait(futures, timeout=deadline)
+        pages = []
+        for url, future in zip(urls, futures):
+            if future.done():
+                pages.append(future.result())
+            else:
+                future.cancel()
+                pages.append({"url": url, "status": "timeout", "message": f"not fetched within {deadline:.0f}s"})
+        return pages
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
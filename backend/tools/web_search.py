@@ -1,62 +1,229 @@
-"""Web search tool using Brave Search API."""
+"""Web search tool using Brave Search API (or a pluggable HTTP provider)."""
 
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional, Protocol
 import time
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from backend.core.disk_cache import DiskCache, make_key
+from backend.core.retrieval_cache import normalize_query
 from backend.tools import BaseTool, register_tool
+from backend.tools.web_fetch import WEB_FETCH_TOP_N, PageFetcher, canonical_url
 
 load_dotenv()
 
+# brave | http (WEB_SEARCH_ENDPOINT'teki genel/lokal JSON servisi, ör. test için stand-in sunucu)
+WEB_SEARCH_PROVIDER = os.getenv("WEB_SEARCH_PROVIDER", "brave").lower()
+CACHE_DIR = os.path.join(os.getcwd(), "data", "cache", "web_search")
+CACHE_MAX_BYTES = int(os.getenv("WEB_SEARCH_CACHE_MAX_MB", "64")) * 1024 * 1024
+CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL_HOURS", "6")) * 3600
+# 1 ise her aramada ilk sonuç sayfaları indirilip oturumun RAG'ine eklenir (tool arg: fetch_pages)
+WEB_SEARCH_FETCH = os.getenv("WEB_SEARCH_FETCH", "0") == "1"
+
+
+class TokenBucket:
+    """Thread-safe token bucket: saniyede `rate` istek, en fazla `capacity` kadar ani patlama."""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Bir token alır; gerekirse bekler. Beklenen süreyi (s) döner."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# Sağlayıcı başına süreç genelinde tek limiter (kaç WebSearchTool örneği olursa olsun)
+_LIMITERS: Dict[str, TokenBucket] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def limiter_for(provider: "SearchProvider") -> TokenBucket:
+    with _LIMITERS_LOCK:
+        if provider.name not in _LIMITERS:
+            _LIMITERS[provider.name] = TokenBucket(provider.rate, provider.burst)
+        return _LIMITERS[provider.name]
+
+
+class SearchProvider(Protocol):
+    name: str
+    label: str
+    rate: float   # saniyedeki istek
+    burst: float
+
+    def configured(self) -> Optional[str]:
+        """Eksik ayar varsa hata mesajı, yoksa None."""
+        ...
+
+    def search(self, session: requests.Session, query: str, count: int, timeout: float) -> List[Dict[str, Any]]:
+        """Normalize edilmiş {title, link, snippet} listesi döner."""
+        ...
+
+
+class BraveProvider:
+    name = "brave"
+    label = "Brave Search API"
+    rate = float(os.getenv("WEB_SEARCH_QPS", "1"))  # Brave ücretsiz plan: 1 QPS
+    burst = 1.0
+
+    endpoint = "https://api.search.brave.com/res/v1/web/search"
+
+    def configured(self) -> Optional[str]:
+        if not os.getenv("WEB_SEARCH_API_KEY"):
+            return "WEB_SEARCH_API_KEY missing. Set your Brave API key in .env."
+        return None
+
+    def search(self, session: requests.Session, query: str, count: int, timeout: float) -> List[Dict[str, Any]]:
+        headers = {
+            "X-Subscription-Token": os.getenv("WEB_SEARCH_API_KEY", ""),
+            "Accept": "application/json"
+        }
+        resp = session.get(self.endpoint, params={"q": query, "count": count}, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+
+        results = resp.json().get("web", {}).get("results", [])
+        return [
+            {"title": item.get("title") or "", "link": item.get("url") or "", "snippet": item.get("description") or ""}
+            for item in results
+        ]
+
+
+class HttpJsonProvider:
+    """
+    Genel JSON arama servisi: GET {endpoint}?q=...&count=... ->
+    {"results": [{"title", "url"|"link", "snippet"|"description"}]}
+    Lokal bir stand-in sunucuyla (test) veya self-hosted arama ile kullanılır.
+    """
+
+    name = "http"
+    label = "HTTP search endpoint"
+    rate = float(os.getenv("WEB_SEARCH_QPS", "10"))
+    burst = 5.0
+
+    def __init__(self, endpoint: Optional[str] = None) -> None:
+        self.endpoint = endpoint or os.getenv("WEB_SEARCH_ENDPOINT", "")
+
+    def configured(self) -> Optional[str]:
+        if not self.endpoint:
+            return "WEB_SEARCH_ENDPOINT missing for the http search provider."
+        return None
+
+    def search(self, session: requests.Session, query: str, count: int, timeout: float) -> List[Dict[str, Any]]:
+        resp = session.get(self.endpoint, params={"q": query, "count": count}, timeout=timeout)
+        resp.raise_for_status()
+
+        payload = resp.json()
+        results = payload.get("results", []) if isinstance(payload, dict) else payload
+        return [
+            {
+                "title": item.get("title") or "",
+                "link": item.get("url") or item.get("link") or "",
+                "snippet": item.get("snippet") or item.get("description") or "",
+            }
+            for item in results
+        ]
+
+
+PROVIDERS = {"brave": BraveProvider, "http": HttpJsonProvider}
+
 
 class WebSearchTool:
     name = "web_search"
     description = "Perform web search using Brave Search API and return top results."
 
+    # ToolExecutor ayarları (blocking HTTP -> thread havuzu)
+    execution = "thread"
+    timeout = 60  # fetch modunda sayfa indirme + embedding dahil
+    max_concurrency = 2
+
     DEFAULT_RESULTS = 5
     MAX_RESULTS = 10
     DEFAULT_TIMEOUT = 10
 
-    brave_endpoint = "https://api.search.brave.com/res/v1/web/search"
-
-    # Rate-limit için (Brave: 1 QPS)
-    _last_call_timestamp = 0
+    def __init__(self, provider: Optional[SearchProvider] = None) -> None:
+        # Uzun ömürlü: tek HTTP session (keep-alive bağlantı havuzu) ve disk önbelleği
+        self.provider = provider or PROVIDERS.get(WEB_SEARCH_PROVIDER, BraveProvider)()
+        self.limiter = limiter_for(self.provider)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=self.max_concurrency))
+        self.session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=self.max_concurrency))
+        self._cache: Optional[DiskCache] = None
+        self._fetcher: Optional[PageFetcher] = None
 
-    def _prepare_query(self, query: str) -> str:
-        return " ".join((query or "").split())
+    @property
+    def cache(self) -> DiskCache:
+        # Klasör ilk aramada oluşturulur (modül import'unda diske dokunulmasın)
+        if self._cache is None:
+            self._cache = DiskCache(CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS, name="web_search")
+        return self._cache
 
-    def _extract_results(self, payload: dict) -> List[Dict[str, Any]]:
-        """Extract Brave Search results -> normalized {title, link, snippet}."""
-        results = payload.get("web", {}).get("results", [])
-        normalized = []
+    @property
+    def fetcher(self) -> PageFetcher:
+        if self._fetcher is None:
+            self._fetcher = PageFetcher()
+        return self._fetcher
 
+    def _index_pages(self, results: List[Dict[str, Any]], rag: Any) -> List[Dict[str, Any]]:
+        """İlk sonuç sayfalarını paralel indirip RAG'e ekler; daha önce eklenen URL'ler atlanır."""
+        report: List[Dict[str, Any]] = []
+        urls: List[str] = []
+        seen = set()
         for item in results:
-            title = item.get("title") or ""
-            link = item.get("url") or ""
-            snippet = item.get("description") or ""
-            normalized.append({"title": title, "link": link, "snippet": snippet})
+            url = canonical_url(item.get("link", ""))
+            if not url.startswith(("http://", "https://")) or url in seen:
+                continue
+            seen.add(url)
+            if rag.has_source(url):
+                report.append({"url": url, "status": "already_indexed"})
+            else:
+                urls.append(url)
+            if len(urls) + len(report) >= WEB_FETCH_TOP_N:
+                break
 
-        return normalized
+        started = time.perf_counter()
+        for page in self.fetcher.fetch_many(urls):
+            if page["status"] != "ok":
+                report.append({k: v for k, v in page.items() if k in ("url", "status", "message")})
+                continue
+            text = f"# {page['title']}\n\n{page['text']}" if page["title"] else page["text"]
+            try:
+                chunks = rag.add_document(text, source=page["url"])
+            except Exception as e:
+                report.append({"url": page["url"], "status": "error", "message": f"indexing failed: {e}"})
+                continue
+            report.append({"url": page["url"], "status": "indexed", "title": page["title"], "chunks": chunks})
 
-    def _rate_limit(self):
-        now = time.time()
-        since_last = now - self._last_call_timestamp
+        indexed = sum(1 for page in report if page["status"] == "indexed")
+        if urls:
+            print(f"🌐 {indexed}/{len(urls)} sayfa indirildi ve hafızaya eklendi ({time.perf_counter() - started:.1f}s)")
+        return report
 
-        # Brave = 1 QPS -> en az 1 saniye beklemeli
-        if since_last < 1.0:
-            time.sleep(1.0 - since_last)
-
-        self._last_call_timestamp = time.time()
+    def _prepare_query(self, query: str) -> str:
+        return " ".join((query or "").split())
 
     def run(self, query: str, **kwargs: Any) -> Dict[str, Any]:
         q = self._prepare_query(kwargs.get("query") or query or "")
 
-        api_key = os.getenv("WEB_SEARCH_API_KEY")
         timeout = float(os.getenv("WEB_SEARCH_TIMEOUT", self.DEFAULT_TIMEOUT))
         num_results = int(kwargs.get("num_results") or self.DEFAULT_RESULTS)
         num_results = max(1, min(num_results, self.MAX_RESULTS))
@@ -64,46 +231,49 @@ class WebSearchTool:
         if not q:
             return {"status": "error", "message": "Query is empty."}
 
-        if not api_key:
-            return {"status": "error", 
-                    "message": "WEB_SEARCH_API_KEY missing. Set your Brave API key in .env."}
+        problem = self.provider.configured()
+        if problem:
+            return {"status": "error", "message": problem}
 
-        # Rate limit (Brave: 1 request per second)
-        self._rate_limit()
-
-        try:
-            headers = {
-                "X-Subscription-Token": api_key,
-                "Accept": "application/json"
-            }
+        # Büyük/küçük harf, boşluk ve noktalama farkı aynı sorgu sayılır
+        cache_key = make_key(self.provider.name, normalize_query(q), num_results)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            result = dict(cached, query=q, cached=True)
+        else:
+            result = self._search(q, num_results, timeout, cache_key)
 
-            params = {
-                "q": q,
-                "count": num_results
-            }
+        # Fetch modu: sonuç sayfaları oturumun RAG koleksiyonuna eklenir (takip soruları yerelden cevaplanır)
+        fetch_pages = kwargs.get("fetch_pages")
+        if fetch_pages is None:
+            fetch_pages = WEB_SEARCH_FETCH
+        elif isinstance(fetch_pages, str):
+            fetch_pages = fetch_pages.strip().lower() in ("1", "true", "yes")
+        rag = kwargs.get("rag")
+        if result["status"] == "ok" and rag is not None and fetch_pages:
+            result = dict(result, pages=self._index_pages(result["results"], rag))
+        return result
 
-            resp = requests.get(
-                self.brave_endpoint,
-                params=params,
-                headers=headers,
-                timeout=timeout
-            )
-            resp.raise_for_status()
-
-            data = resp.json()
-            results = self._extract_results(data)
-            limited = results[:num_results]
-
-            return {
-                "status": "ok",
-                "query": q,
-                "results": limited,
-                "count": len(limited),
-                "provider": "Brave Search API",
-            }
+    def _search(self, q: str, num_results: int, timeout: float, cache_key: str) -> Dict[str, Any]:
+        # Süreç genelinde sağlayıcı limiti (Brave: 1 istek/sn)
+        waited = self.limiter.acquire()
+        if waited > 0.05:
+            print(f"⏳ Web search rate limit: {waited:.2f}s beklendi")
 
+        try:
+            limited = self.provider.search(self.session, q, num_results, timeout)[:num_results]
         except Exception as e:
             return {"status": "error", "query": q, "message": str(e)}
 
+        result = {
+            "status": "ok",
+            "query": q,
+            "results": limited,
+            "count": len(limited),
+            "provider": self.provider.label,
+        }
+        self.cache.set(cache_key, result)
+        return result
+
 
 register_tool(WebSearchTool())
@@ -0,0 +1,147 @@
+"""
+Eski karakter tabanlı _split_text ile MarkdownChunker karşılaştırması.
+
+Her doküman için parça sayısı, embedding modeline giden token sayısı,
+modelin 256 token sınırında kesilip kaybolan token sayısı ve parçalama
+süresi raporlanır. --embed ile gerçek embedding süresi de ölçülür.
+
+Kullanım:
+    python benchmarks/bench_chunking.py                 # data/uploads/* (txt, md, pdf metin katmanı)
+    python benchmarks/bench_chunking.py dosya.md --embed
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.chunking import (  # noqa: E402
+    CHUNK_BOUNDARY,
+    MarkdownChunker,
+    approximate_token_counter,
+    make_token_counter,
+    split_on_boundaries,
+)
+
+# all-MiniLM-L6-v2 girişi ([CLS]/[SEP] hariç)
+MODEL_MAX_TOKENS = 254
+
+
+def legacy_split_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """RAGManager._split_text'in eski hali (1000 karakter / 200 örtüşme), karşılaştırma için."""
+    if not text:
+        return []
+    if CHUNK_BOUNDARY.strip() in text:
+        chunks = []
+        for part in split_on_boundaries(text):
+            if len(part) <= chunk_size:
+                chunks.append(part)
+            else:
+                chunks.extend(legacy_split_text(part, chunk_size, overlap))
+        return chunks
+
+    chunks = []
+    start = 0
+    text_len = len(text)
+    while start < text_len:
+        end = start + chunk_size
+        if end < text_len:
+            while end > start and text[end] not in [' ', '\n', '.', ',']:
+                end -= 1
+            if end == start:
+                end = start + chunk_size
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end - overlap
+    return chunks
+
+
+def load_text(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return "\n\n".join(page.get_textpage().get_text_range() for page in pdf)
+        finally:
+            pdf.close()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def token_counter(use_tokenizer: bool):
+    if use_tokenizer:
+        try:
+            from backend.core import resources
+
+            return make_token_counter(resources.get_embedder().tokenizer), "tokenizer"
+        except Exception as e:
+            print(f"⚠️ Tokenizer yüklenemedi ({e}), yaklaşık sayım kullanılıyor.")
+    return approximate_token_counter, "approx"
+
+
+def measure(name: str, split, text: str, count, embed: bool) -> dict:
+    started = time.perf_counter()
+    chunks = split(text)
+    split_ms = (time.perf_counter() - started) * 1000
+    tokens = count(chunks)
+    result = {
+        "name": name,
+        "chunks": len(chunks),
+        "embedded": sum(min(t, MODEL_MAX_TOKENS) for t in tokens),
+        "truncated": sum(max(t - MODEL_MAX_TOKENS, 0) for t in tokens),
+        "split_ms": split_ms,
+        "embed_ms": None,
+    }
+    if embed and chunks:
+        from backend.core import resources
+
+        started = time.perf_counter()
+        resources.get_embedder().embed(chunks)
+        result["embed_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("files", nargs="*", help="dokümanlar (varsayılan: data/uploads/*.txt|md|pdf)")
+    arg_parser.add_argument("--embed", action="store_true", help="parçaları gerçekten embed edip süreyi ölç")
+    arg_parser.add_argument("--approx", action="store_true", help="tokenizer yerine yaklaşık sayım kullan")
+    args = arg_parser.parse_args()
+
+    files = args.files or sorted(
+        f for ext in ("txt", "md", "pdf") for f in glob.glob(os.path.join("data", "uploads", f"*.{ext}"))
+    )
+    if not files:
+        print("⚠️ Doküman bulunamadı (data/uploads)")
+        return
+
+    count, counter_name = token_counter(not args.approx)
+    chunker = MarkdownChunker(count, counter_name=counter_name)
+    print(f"Token sayımı: {counter_name}, model sınırı {MODEL_MAX_TOKENS}, chunker bütçesi {chunker.max_tokens}\n")
+    print(f"{'dosya':32} {'yöntem':10} {'parça':>6} {'token':>8} {'kesilen':>8} {'split ms':>9} {'embed ms':>9}")
+
+    for path in files:
+        try:
+            text = load_text(path)
+        except Exception as e:
+            print(f"⚠️ {path} okunamadı: {e}")
+            continue
+        for name, split in (("eski", legacy_split_text), ("markdown", chunker.split)):
+            r = measure(name, split, text, count, args.embed)
+            embed_ms = f"{r['embed_ms']:9.0f}" if r["embed_ms"] is not None else f"{'-':>9}"
+            print(
+                f"{os.path.basename(path)[:32]:32} {r['name']:10} {r['chunks']:6d} {r['embedded']:8d} "
+                f"{r['truncated']:8d} {r['split_ms']:9.1f} {embed_ms}"
+            )
+
+
+if __name__ == "__main__":
+    main()
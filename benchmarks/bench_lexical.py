@@ -0,0 +1,114 @@
+"""
+BM25Index arama gecikmesi ve doğruluğu.
+
+Sentetik bir korpusta (yaygın / orta / nadir terimler) sorgu tiplerine göre
+p50/p95 gecikme, LEXICAL_BUDGET_MS'e uyum ve bütçesiz (exact=True) aramaya
+göre top-10 örtüşmesi raporlanır. Karşılaştırma için posting'leri saf
+Python ile dolaşan eski skorlama da ölçülür.
+
+Kullanım:
+    python benchmarks/bench_lexical.py                  # 30k parça
+    python benchmarks/bench_lexical.py --docs 100000 --queries 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.lexical import LEXICAL_BUDGET_MS, BM25Index, tokenize  # noqa: E402
+
+
+def legacy_search(index: BM25Index, query: str, n_results: int) -> List[Tuple[int, float]]:
+    """Posting'lerin dict üzerinden saf Python ile skorlanması (eski yol), karşılaştırma için."""
+    n_docs = len(index.ids)
+    avg_len = index.total_len / n_docs
+    scores: Dict[int, float] = {}
+    for term in dict.fromkeys(tokenize(query)):
+        postings = index.postings.get(term)
+        if not postings:
+            continue
+        df = len(postings)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for idx, tf in postings.items():
+            norm = tf + index.k1 * (1 - index.b + index.b * index.doc_lens[idx] / avg_len)
+            scores[idx] = scores.get(idx, 0.0) + idf * tf * (index.k1 + 1) / norm
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+
+def build_corpus(n_docs: int, seed: int = 1) -> Tuple[BM25Index, Dict[str, List[str]]]:
+    rng = random.Random(seed)
+    vocab = {
+        "common": [f"common{i}" for i in range(40)],   # her biri parçaların ~%20'sinde
+        "mid": [f"mid{i}" for i in range(400)],
+        "rare": [f"rare{i}" for i in range(20000)],
+    }
+    docs = []
+    for _ in range(n_docs):
+        words = [w for w in vocab["common"] if rng.random() < 0.2]
+        words += rng.sample(vocab["mid"], 8) + rng.sample(vocab["rare"], 20)
+        rng.shuffle(words)
+        docs.append(" ".join(words))
+
+    index = BM25Index()
+    started = time.perf_counter()
+    index.add([str(i) for i in range(n_docs)], docs)
+    print(f"İndeks: {n_docs} parça, {len(index.postings)} terim ({time.perf_counter() - started:.1f}s)")
+    return index, vocab
+
+
+def measure(index: BM25Index, name: str, make_query: Callable[[], str], n_queries: int) -> None:
+    fast, old, overlap = [], [], []
+    for _ in range(n_queries):
+        query = make_query()
+        exact = index.search(query, 10, exact=True)
+
+        started = time.perf_counter()
+        got = index.search(query, 10)
+        fast.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        legacy_search(index, query, 10)
+        old.append((time.perf_counter() - started) * 1000)
+
+        overlap.append(len({i for i, _ in exact} & {i for i, _ in got}) / max(len(exact), 1))
+
+    p95 = sorted(fast)[int(len(fast) * 0.95)]
+    within = sum(ms <= LEXICAL_BUDGET_MS for ms in fast) / len(fast)
+    print(
+        f"{name:12} eski p50 {statistics.median(old):6.1f}ms | "
+        f"yeni p50 {statistics.median(fast):5.2f}ms p95 {p95:5.2f}ms "
+        f"bütçe içinde %{within * 100:.0f} | örtüşme@10 {statistics.mean(overlap):.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    index, vocab = build_corpus(args.docs)
+    rng = random.Random(2)
+
+    # İlk sorgu terim dizilerini kurar (sonrakiler önbellekten)
+    started = time.perf_counter()
+    index.search(" ".join(vocab["common"][:5]), 10)
+    print(f"İlk (soğuk) sorgu: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    measure(index, "yaygın", lambda: " ".join(rng.sample(vocab["common"], 5)), args.queries)
+    measure(index, "karışık", lambda: " ".join(rng.sample(vocab["common"], 3) + rng.sample(vocab["mid"], 2)), args.queries)
+    measure(index, "nadir+yaygın", lambda: " ".join(rng.sample(vocab["common"], 3) + rng.sample(vocab["rare"], 1)), args.queries)
+    measure(index, "nadir", lambda: " ".join(rng.sample(vocab["rare"], 3)), args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+PDF ayrıştırma yollarının sayfa/saniye ölçümü.
+
+Her PDF için iki yol ayrı ayrı ölçülür:
+- hızlı yol: pypdfium2 ile sayfa sınıflandırma + metin katmanı çıkarma
+- docling yolu: sınıflandırmanın docling'e gönderdiği (taranmış/tablolu) sayfalar;
+  --all-docling ile eski davranış (tüm sayfalar docling) ölçülür
+
+Kullanım:
+    python benchmarks/bench_pdf.py                    # data/uploads/*.pdf
+    python benchmarks/bench_pdf.py dosya.pdf --all-docling
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ingestion.parsers.pdf_parser import PAGE_TEXT, PDFParser  # noqa: E402
+
+
+def rate(pages: int, seconds: float) -> str:
+    return f"{pages / seconds:8.1f} sayfa/s" if pages and seconds > 0 else f"{'-':>14}"
+
+
+def bench_file(parser: PDFParser, path: Path, all_docling: bool) -> dict:
+    started = time.perf_counter()
+    kinds, _ = parser.classify_pages(path)
+    fast_seconds = time.perf_counter() - started
+
+    if all_docling:
+        segments = [("scan", 1, len(kinds))]
+    else:
+        segments = [seg for seg in parser.plan_segments(kinds) if seg[0] != PAGE_TEXT]
+
+    docling_pages = sum(end - start + 1 for _, start, end in segments)
+    started = time.perf_counter()
+    for kind, start, end in segments:
+        parser.convert_segment(path, kind, start, end)
+    docling_seconds = time.perf_counter() - started
+
+    return {
+        "pages": len(kinds),
+        "text_pages": kinds.count(PAGE_TEXT),
+        "fast_seconds": fast_seconds,
+        "docling_pages": docling_pages,
+        "docling_seconds": docling_seconds,
+    }
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("files", nargs="*", help="PDF dosyaları (varsayılan: data/uploads/*.pdf)")
+    arg_parser.add_argument("--all-docling", action="store_true", help="tüm sayfaları docling'den geçir (eski davranış)")
+    args = arg_parser.parse_args()
+
+    files = [Path(f) for f in (args.files or sorted(glob.glob(os.path.join("data", "uploads", "*.pdf"))))]
+    if not files:
+        print("⚠️ PDF bulunamadı (data/uploads/*.pdf)")
+        return
+
+    parser = PDFParser()
+    totals = {"pages": 0, "fast_seconds": 0.0, "docling_pages": 0, "docling_seconds": 0.0}
+    print(f"{'dosya':40} {'sayfa':>6} {'metin':>6}  {'hızlı yol':>14}  {'docling':>14}")
+    for path in files:
+        result = bench_file(parser, path, args.all_docling)
+        for key in totals:
+            totals[key] += result[key]
+        print(
+            f"{path.name[:40]:40} {result['pages']:6d} {result['text_pages']:6d}  "
+            f"{rate(result['pages'], result['fast_seconds'])}  "
+            f"{rate(result['docling_pages'], result['docling_seconds'])}"
+        )
+    print(
+        f"{'TOPLAM':40} {totals['pages']:6d} {'':6}  "
+        f"{rate(totals['pages'], totals['fast_seconds'])}  "
+        f"{rate(totals['docling_pages'], totals['docling_seconds'])}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""MarkdownChunker: token bütçesi, tablo başlıkları, sert sınırlar ve doğrusal maliyet."""
+
+import os
+import time
+
+import pytest
+
+from backend.core.chunking import CHUNK_BOUNDARY, MarkdownChunker, approximate_token_counter
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "uploads", "ilanlardan.txt")
+MAX_TOKENS = 120
+
+
+@pytest.fixture
+def chunker():
+    return MarkdownChunker(max_tokens=MAX_TOKENS, min_tokens=24, overlap_tokens=20)
+
+
+@pytest.fixture
+def sample_text():
+    if not os.path.exists(SAMPLE_PATH):
+        pytest.skip("örnek doküman yok")
+    with open(SAMPLE_PATH, encoding="utf-8") as f:
+        return f.read()
+
+
+def synthetic_markdown(sections: int = 5) -> str:
+    parts = []
+    for s in range(sections):
+        parts.append(f"# Bölüm {s}\n")
+        parts.append(" ".join(f"Bölüm {s} paragraf cümlesi {i} biraz uzun bir açıklama içerir." for i in range(30)))
+        parts.append("\n## Tablo\n")
+        parts.append("| Ürün | Adet | Fiyat |\n|---|---|---|")
+        parts.append("\n".join(f"| ürün-{s}-{r} | {r} | {r * 10} TL |" for r in range(60)))
+        parts.append("\n- " + "\n- ".join(f"madde {s}-{i} listedeki açıklama metni" for i in range(25)))
+        parts.append("")
+    return "\n".join(parts)
+
+
+def tokens(text: str) -> int:
+    return approximate_token_counter([text])[0]
+
+
+def test_chunks_fit_token_budget_on_sample(chunker, sample_text):
+    chunks = chunker.split(sample_text)
+    assert chunks
+    assert max(tokens(chunk) for chunk in chunks) <= MAX_TOKENS
+
+
+def test_sample_content_is_preserved(chunker, sample_text):
+    chunked_words = set(" ".join(chunker.split(sample_text)).split())
+    assert set(sample_text.split()) <= chunked_words
+
+
+def test_chunks_fit_token_budget_on_markdown(chunker):
+    chunks = chunker.split(synthetic_markdown())
+    assert max(tokens(chunk) for chunk in chunks) <= MAX_TOKENS
+
+
+def test_split_tables_repeat_header(chunker):
+    chunks = [chunk for chunk in chunker.split(synthetic_markdown(1)) if "| ürün-" in chunk]
+    assert len(chunks) > 1
+    for chunk in chunks:
+        lines = chunk.split("\n")
+        first_row = next(i for i, line in enumerate(lines) if line.startswith("| ürün-"))
+        assert lines[first_row - 2:first_row] == ["| Ürün | Adet | Fiyat |", "|---|---|---|"]
+
+
+def test_nothing_merges_across_chunk_boundary(chunker):
+    parts = [f"kısa parça {i} işareti-{i}" for i in range(20)]
+    chunks = chunker.split(CHUNK_BOUNDARY.join(parts))
+    assert len(chunks) == len(parts)
+    for chunk in chunks:
+        assert chunk.count("işareti-") == 1
+
+
+def test_linear_time(chunker):
+    """Token sayacına giden metin toplamı girdiyle orantılı kalmalı (her blok sabit sayıda sayılır)."""
+    counted = []
+
+    def counting(texts):
+        counted.append(sum(len(t) for t in texts))
+        return approximate_token_counter(texts)
+
+    measuring = MarkdownChunker(counting, max_tokens=MAX_TOKENS, min_tokens=24, overlap_tokens=20)
+    ratios, seconds = [], []
+    for sections in (10, 80):
+        text = synthetic_markdown(sections)
+        counted.clear()
+        started = time.perf_counter()
+        measuring.split(text)
+        seconds.append(time.perf_counter() - started)
+        ratios.append(sum(counted) / len(text))
+
+    assert ratios[1] <= ratios[0] * 1.1
+    # 8 kat girdi: ikinci dereceden bir algoritma ~64 kat sürerdi
+    assert seconds[1] <= seconds[0] * 20
@@ -0,0 +1,34 @@
+"""StreamingDecisionParser + is_decision: hangi JSON nesneleri model kararı sayılır."""
+
+from backend.core.json_stream import StreamingDecisionParser, is_decision
+
+
+def parse(text: str, chunk_size: int = 7):
+    parser = StreamingDecisionParser()
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+    return parser.decision()
+
+
+def test_dict_inside_code_block_is_not_a_decision():
+    # Metin modunda cevap: kod bloğundaki sözlük karar sanılıp retry döngüsünü bitirmemeli
+    reply = 'Here is the code:\n```python\nimport pandas as pd\nd = {"x": [1,2,3]}\nprint(pd.DataFrame(d))\n```'
+    decision = parse(reply)
+    assert not is_decision(decision)
+
+
+def test_tool_call_is_a_decision():
+    reply = '{"thought": "plot", "tool_name": "data_analyst", "tool_args": {"code": "print(1)"}, "final_answer": null}'
+    decision = parse(reply)
+    assert is_decision(decision)
+    assert decision["tool_name"] == "data_analyst"
+
+
+def test_final_answer_is_a_decision():
+    decision = parse('{"thought": "", "tool_name": null, "final_answer": "Merhaba!"}')
+    assert is_decision(decision)
+
+
+def test_empty_decision_fields_are_rejected():
+    assert not is_decision({"thought": "hmm", "tool_name": None, "final_answer": None})
+    assert not is_decision(None)